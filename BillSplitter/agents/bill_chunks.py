@@ -0,0 +1,123 @@
+"""
+Chunked parsing helpers for very large bills.
+
+A long PDF is split into page ranges that are parsed independently (and
+concurrently) by the model; the partial BillData results are then merged back
+into one bill, with user charges joined by phone number.
+"""
+import io
+from typing import Iterator, List, Sequence
+from pypdf import PdfReader, PdfWriter
+from agents.bill_parser import BillData, LineItem, UserCharge
+from agents.contacts import normalize_phone
+
+CHUNK_PROMPT = (
+    "This is only part of a longer bill: pages {pages} of {pages_total}. "
+    "Extract only the charges shown on these pages. If the bill total or billing "
+    "period is not shown on these pages, use 0 for total_amount and an empty string for the dates."
+)
+
+def page_chunks(pages: Sequence[int], pages_per_chunk: int) -> List[List[int]]:
+    """Splits page indices into consecutive chunks of at most pages_per_chunk pages."""
+    if pages_per_chunk < 1:
+        raise ValueError("pages_per_chunk must be at least 1")
+    return [list(pages[i:i + pages_per_chunk]) for i in range(0, len(pages), pages_per_chunk)]
+
+def chunk_content_block(reader: PdfReader, texts: List[str], pages: List[int], pages_total: int) -> dict:
+    """
+    Builds the message block for one chunk: the pages' text layer when every page
+    has one, otherwise a small PDF with just those pages. Only this chunk's pages
+    are serialized, so memory stays proportional to the chunk, not the bill.
+    """
+    label = ", ".join(str(i + 1) for i in pages)
+    if all(texts[i].strip() for i in pages):
+        text = "\n".join(f"--- Page {i + 1} ---\n{texts[i]}" for i in pages)
+        return {"type": "text", "text": f"Bill text (pages {label} of {pages_total}):\n{text}"}
+
+    writer = PdfWriter()
+    for i in pages:
+        writer.add_page(reader.pages[i])
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return {"type": "media", "mime_type": "application/pdf", "data": buffer.getvalue()}
+
+def _user_key(user: UserCharge) -> str:
+    phone = normalize_phone(user.phone_number)
+    return f"phone:{phone}" if phone else f"name:{user.name.strip().lower()}"
+
+def merge_bill_parts(parts: List[BillData]) -> BillData:
+    """
+    Merges partial results (in page order) into one BillData.
+
+    - User charges with the same phone number (or, without one, the same name)
+      are combined: items are concatenated and totals summed.
+    - Shared costs are all kept. Only if they then overshoot the bill total and
+      dropping the ones repeated from an earlier chunk (e.g. an account summary
+      printed on every page) makes the bill add up are those repeats dropped;
+      the same fee legitimately charged on two pages is never lost.
+    - The bill total and period come from the first chunk that reports them.
+    """
+    if not parts:
+        raise ValueError("No bill parts to merge")
+
+    users = {}
+    shared_costs: List[LineItem] = []
+    repeats: List[LineItem] = []  # shared costs already reported by an earlier chunk
+    seen_shared = set()
+    for part in parts:
+        for user in part.user_charges:
+            key = _user_key(user)
+            if key not in users:
+                users[key] = UserCharge(
+                    name=user.name, phone_number=user.phone_number, items=list(user.items), total=user.total
+                )
+                continue
+            merged = users[key]
+            merged.items.extend(user.items)
+            merged.total = round(merged.total + user.total, 2)
+            if not merged.phone_number:
+                merged.phone_number = user.phone_number
+
+        part_shared = set()
+        for cost in part.shared_costs:
+            key = (cost.description.strip().lower(), round(cost.amount, 2))
+            if key in seen_shared and key not in part_shared:
+                repeats.append(cost)
+            part_shared.add(key)
+            shared_costs.append(cost)
+        seen_shared |= part_shared
+
+    total_amount = next((p.total_amount for p in parts if p.total_amount), 0.0)
+    period_start = next((p.period_start for p in parts if p.period_start), "")
+    period_end = next((p.period_end for p in parts if p.period_end), "")
+    usage_period = next((p.usage_period for p in parts if p.usage_period), "")
+
+    if total_amount and repeats:
+        users_total = sum(u.total for u in users.values())
+        repeated = sum(c.amount for c in repeats)
+        shared_total = sum(c.amount for c in shared_costs)
+        if (abs(users_total + shared_total - total_amount) > 0.05
+                and abs(users_total + shared_total - repeated - total_amount) <= 0.05):
+            repeat_ids = {id(c) for c in repeats}
+            shared_costs = [c for c in shared_costs if id(c) not in repeat_ids]
+
+    bill = BillData(
+        total_amount=total_amount,
+        period_start=period_start,
+        period_end=period_end,
+        usage_period=usage_period,
+        shared_costs=shared_costs,
+        user_charges=list(users.values())
+    )
+
+    components = sum(u.total for u in bill.user_charges) + sum(c.amount for c in bill.shared_costs)
+    if not total_amount:
+        bill.total_amount = round(components, 2)
+    elif abs(components - total_amount) > 0.05:
+        print(f"Warning: merged charges ({components:.2f}) don't add up to the bill total ({total_amount:.2f}).")
+    return bill
+
+def iter_chunk_blocks(reader: PdfReader, texts: List[str], chunks: List[List[int]]) -> Iterator[dict]:
+    """Yields chunk message blocks lazily, one chunk at a time."""
+    for pages in chunks:
+        yield chunk_content_block(reader, texts, pages, len(texts))
@@ -0,0 +1,315 @@
+"""
+Local history of parsed bills and their splits.
+
+Every split is recorded in a SQLite store together with its bill, so questions
+like "what has each person owed over the last 12 months" are answered from
+disk instead of re-parsing PDFs. Per-user, per-category and per-period
+aggregates are kept up to date when a bill is recorded: only the new bill's
+rows are added (or, when a bill is recorded again, its old rows subtracted
+first), so the cost of recording does not grow with the history.
+
+Usage: python -m agents.bill_history balances [--months 12]
+       python -m agents.bill_history trend USER [--months 12]
+       python -m agents.bill_history categories [--months 12]
+       python -m agents.bill_history reconcile [--period 2025-12]
+"""
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import argparse
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from agents.contacts import normalize_phone
+
+DEFAULT_HISTORY_PATH = os.path.join(".cache", "bill_history.sqlite3")
+UNKNOWN_PERIOD = "unknown"
+SHARED_KEY = ""  # user_key of account-level charges
+
+_DATE_FORMATS = ("%Y-%m-%d", "%b %d, %Y", "%B %d, %Y", "%b %d %Y", "%B %d %Y", "%m/%d/%Y", "%m/%d/%y")
+_DATE_PATTERN = re.compile(r"\d{4}-\d{2}-\d{2}|[A-Za-z]{3,9}\.? \d{1,2},? \d{4}|\d{1,2}/\d{1,2}/\d{2,4}")
+
+def _cents(amount) -> int:
+    return round((amount or 0.0) * 100)
+
+def period_of(bill_data: dict) -> str:
+    """The bill's period as YYYY-MM (month the billing period ends), or "unknown"."""
+    for text in (bill_data.get("period_end"), bill_data.get("usage_period"), bill_data.get("period_start")):
+        # usage_period reads "Nov 06 - Dec 05, 2025"; its last date is the end
+        for candidate in reversed(_DATE_PATTERN.findall(text or "")):
+            candidate = candidate.replace(".", "")
+            for fmt in _DATE_FORMATS:
+                try:
+                    return datetime.strptime(candidate, fmt).strftime("%Y-%m")
+                except ValueError:
+                    continue
+    return UNKNOWN_PERIOD
+
+def account_of(bill_data: dict) -> str:
+    """
+    Identifies the bill's account by its lines: a hash of the normalized phone
+    numbers, so two plans billed for the same period and total stay apart.
+    "" if the bill lists no phone numbers.
+    """
+    phones = sorted({p for p in (normalize_phone(u.get("phone_number")) for u in bill_data.get("user_charges", [])) if p})
+    if not phones:
+        return ""
+    return "lines-" + hashlib.sha256(",".join(phones).encode("utf-8")).hexdigest()[:12]
+
+def shift_period(period: str, months: int) -> str:
+    year, month = map(int, period.split("-"))
+    index = year * 12 + (month - 1) + months
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+class BillHistory:
+    """
+    SQLite history of bills (BillData) and their splits (SplitResult).
+
+    Bills are keyed by account, billing period and total, so recording the same
+    bill twice (a re-run or a re-parse) replaces it instead of counting it twice.
+    """
+
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path or os.environ.get("BILL_HISTORY_PATH", DEFAULT_HISTORY_PATH)
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(
+                "CREATE TABLE IF NOT EXISTS bills ("
+                " bill_id TEXT PRIMARY KEY, account TEXT, period TEXT, period_start TEXT, period_end TEXT,"
+                " total_cents INTEGER, description TEXT, source TEXT, recorded_at REAL);"
+                "CREATE INDEX IF NOT EXISTS bills_period ON bills (period);"
+                "CREATE TABLE IF NOT EXISTS shares ("
+                " bill_id TEXT, user_key TEXT, amount_cents INTEGER, individual_cents INTEGER, shared_cents INTEGER,"
+                " PRIMARY KEY (bill_id, user_key)) WITHOUT ROWID;"
+                "CREATE TABLE IF NOT EXISTS charges ("
+                " bill_id TEXT, user_key TEXT, category TEXT, description TEXT, amount_cents INTEGER);"
+                "CREATE INDEX IF NOT EXISTS charges_bill ON charges (bill_id);"
+                # Aggregates, maintained incrementally by _apply
+                "CREATE TABLE IF NOT EXISTS agg_user ("
+                " user_key TEXT PRIMARY KEY, bills INTEGER, amount_cents INTEGER) WITHOUT ROWID;"
+                "CREATE TABLE IF NOT EXISTS agg_user_period ("
+                " user_key TEXT, period TEXT, amount_cents INTEGER, PRIMARY KEY (user_key, period)) WITHOUT ROWID;"
+                "CREATE TABLE IF NOT EXISTS agg_category_period ("
+                " category TEXT, period TEXT, amount_cents INTEGER, PRIMARY KEY (category, period)) WITHOUT ROWID;"
+                "CREATE TABLE IF NOT EXISTS agg_period ("
+                " period TEXT PRIMARY KEY, bills INTEGER, total_cents INTEGER, split_cents INTEGER) WITHOUT ROWID;"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        # A connection per operation keeps the history safe to use from batch worker threads
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    @staticmethod
+    def make_bill_id(bill_data: dict, account: str = "") -> str:
+        payload = {
+            "account": account,
+            "period": [(bill_data.get("period_start") or "").strip(), (bill_data.get("period_end") or "").strip()],
+            "total_cents": _cents(bill_data.get("total_amount")),
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()[:20]
+
+    def record(self, bill_data: dict, split_result, account: str = "", source: str = "") -> str:
+        """
+        Stores a bill and its split (a SplitResult or its dict) and updates the
+        aggregates. Returns the bill id.
+        """
+        if hasattr(split_result, "model_dump"):
+            # Read the result's fields directly; dumping would copy every line item
+            split_result = {"splits": split_result.splits, "details": split_result.details,
+                            "description": split_result.description}
+        bill_id = self.make_bill_id(bill_data, account)
+        period = period_of(bill_data)
+
+        shares = []
+        charges = []
+        for key, amount in split_result["splits"].items():
+            detail = split_result.get("details", {}).get(key, {})
+            shares.append((bill_id, key, _cents(amount), _cents(detail.get("individual_charges")),
+                           _cents(detail.get("shared_portion"))))
+            for item in detail.get("items", []):
+                charges.append((bill_id, key, item.get("category") or "Other", item.get("description", ""),
+                                _cents(item.get("amount"))))
+        for item in bill_data.get("shared_costs", []):
+            charges.append((bill_id, SHARED_KEY, item.get("category") or "Other", item.get("description", ""),
+                            _cents(item.get("amount"))))
+
+        with self._connect() as conn:
+            if conn.execute("SELECT 1 FROM bills WHERE bill_id = ?", (bill_id,)).fetchone():
+                self._apply(conn, bill_id, -1)
+                for table in ("bills", "shares", "charges"):
+                    conn.execute(f"DELETE FROM {table} WHERE bill_id = ?", (bill_id,))
+            conn.execute(
+                "INSERT INTO bills VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (bill_id, account, period, bill_data.get("period_start"), bill_data.get("period_end"),
+                 _cents(bill_data.get("total_amount")), split_result.get("description", ""), source, time.time())
+            )
+            conn.executemany("INSERT INTO shares VALUES (?, ?, ?, ?, ?)", shares)
+            conn.executemany("INSERT INTO charges VALUES (?, ?, ?, ?, ?)", charges)
+            self._apply(conn, bill_id, +1)
+        return bill_id
+
+    def forget(self, bill_id: str) -> None:
+        """Removes a bill and its contribution to the aggregates."""
+        with self._connect() as conn:
+            if conn.execute("SELECT 1 FROM bills WHERE bill_id = ?", (bill_id,)).fetchone():
+                self._apply(conn, bill_id, -1)
+                for table in ("bills", "shares", "charges"):
+                    conn.execute(f"DELETE FROM {table} WHERE bill_id = ?", (bill_id,))
+
+    @staticmethod
+    def _apply(conn: sqlite3.Connection, bill_id: str, sign: int) -> None:
+        """Adds (sign=+1) or subtracts (sign=-1) one bill's rows to the aggregates."""
+        period, total_cents = conn.execute("SELECT period, total_cents FROM bills WHERE bill_id = ?", (bill_id,)).fetchone()
+        shares = conn.execute("SELECT user_key, amount_cents FROM shares WHERE bill_id = ?", (bill_id,)).fetchall()
+        categories = conn.execute(
+            "SELECT category, SUM(amount_cents) FROM charges WHERE bill_id = ? GROUP BY category", (bill_id,)
+        ).fetchall()
+
+        conn.executemany(
+            "INSERT INTO agg_user VALUES (?, ?, ?) ON CONFLICT (user_key) DO UPDATE SET"
+            " bills = bills + excluded.bills, amount_cents = amount_cents + excluded.amount_cents",
+            [(key, sign, sign * cents) for key, cents in shares]
+        )
+        conn.executemany(
+            "INSERT INTO agg_user_period VALUES (?, ?, ?) ON CONFLICT (user_key, period) DO UPDATE SET"
+            " amount_cents = amount_cents + excluded.amount_cents",
+            [(key, period, sign * cents) for key, cents in shares]
+        )
+        conn.executemany(
+            "INSERT INTO agg_category_period VALUES (?, ?, ?) ON CONFLICT (category, period) DO UPDATE SET"
+            " amount_cents = amount_cents + excluded.amount_cents",
+            [(category, period, sign * cents) for category, cents in categories]
+        )
+        conn.execute(
+            "INSERT INTO agg_period VALUES (?, ?, ?, ?) ON CONFLICT (period) DO UPDATE SET"
+            " bills = bills + excluded.bills, total_cents = total_cents + excluded.total_cents,"
+            " split_cents = split_cents + excluded.split_cents",
+            (period, sign, sign * total_cents, sign * sum(cents for _, cents in shares))
+        )
+        if sign < 0:
+            # Drop rows that only this bill contributed to
+            conn.executemany("DELETE FROM agg_user WHERE user_key = ? AND bills <= 0", [(key,) for key, _ in shares])
+            conn.execute("DELETE FROM agg_period WHERE period = ? AND bills <= 0", (period,))
+            conn.execute("DELETE FROM agg_user_period WHERE period = ? AND amount_cents = 0", (period,))
+            conn.execute("DELETE FROM agg_category_period WHERE period = ? AND amount_cents = 0", (period,))
+
+    # Queries - all read the aggregate tables or one period's rows, never the LLM or Splitwise
+
+    def periods(self) -> List[str]:
+        with self._connect() as conn:
+            return [r[0] for r in conn.execute("SELECT period FROM agg_period WHERE period != ? ORDER BY period", (UNKNOWN_PERIOD,))]
+
+    def since_months(self, months: int) -> Optional[str]:
+        """First period of the last `months` months of history (relative to the latest bill)."""
+        periods = self.periods()
+        return shift_period(periods[-1], 1 - months) if periods else None
+
+    def balances(self, since: Optional[str] = None, until: Optional[str] = None) -> Dict[str, float]:
+        """Total owed per user, optionally limited to periods in [since, until] (YYYY-MM)."""
+        with self._connect() as conn:
+            if since is None and until is None:
+                rows = conn.execute("SELECT user_key, amount_cents FROM agg_user")
+            else:
+                rows = conn.execute(
+                    "SELECT user_key, SUM(amount_cents) FROM agg_user_period"
+                    " WHERE period >= ? AND period <= ? AND period != ? GROUP BY user_key",
+                    (since or "", until or "9999-99", UNKNOWN_PERIOD)
+                )
+            return {key: cents / 100 for key, cents in sorted(rows, key=lambda r: -r[1])}
+
+    def trend(self, user_key: str, since: Optional[str] = None) -> List[Tuple[str, float]]:
+        """(period, amount) for one user, oldest first."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT period, amount_cents FROM agg_user_period WHERE user_key = ? AND period >= ? ORDER BY period",
+                (user_key, since or "")
+            )
+            return [(period, cents / 100) for period, cents in rows]
+
+    def categories(self, since: Optional[str] = None) -> Dict[str, Dict[str, float]]:
+        """Category -> {period: amount}."""
+        result: Dict[str, Dict[str, float]] = {}
+        with self._connect() as conn:
+            for category, period, cents in conn.execute(
+                "SELECT category, period, amount_cents FROM agg_category_period WHERE period >= ? ORDER BY category, period",
+                (since or "",)
+            ):
+                result.setdefault(category, {})[period] = cents / 100
+        return result
+
+    def reconcile(self, period: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Per bill: the bill total against the sum of the splits and the sum of the
+        parsed charges. Non-zero differences point at parse or split problems.
+        """
+        query = (
+            "SELECT b.bill_id, b.period, b.description, b.source, b.total_cents,"
+            " (SELECT COALESCE(SUM(amount_cents), 0) FROM shares s WHERE s.bill_id = b.bill_id),"
+            " (SELECT COALESCE(SUM(amount_cents), 0) FROM charges c WHERE c.bill_id = b.bill_id)"
+            " FROM bills b"
+        )
+        params: Tuple = ()
+        if period:
+            query += " WHERE b.period = ?"
+            params = (period,)
+        with self._connect() as conn:
+            rows = conn.execute(query + " ORDER BY b.period, b.recorded_at", params).fetchall()
+        return [
+            {
+                "bill_id": bill_id, "period": p, "description": description, "source": source,
+                "total": total / 100, "split_total": split / 100, "charges_total": charged / 100,
+                "split_difference": (total - split) / 100, "charges_difference": (total - charged) / 100,
+            }
+            for bill_id, p, description, source, total, split, charged in rows
+        ]
+
+def _print_table(headers: List[str], rows: List[List[Any]]) -> None:
+    cells = [[str(h) for h in headers]] + [[f"{c:.2f}" if isinstance(c, float) else str(c) for c in row] for row in rows]
+    widths = [max(len(row[i]) for row in cells) for i in range(len(headers))]
+    for row in cells:
+        print("  ".join(cell.ljust(width) for cell, width in zip(row, widths)))
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Query the local bill history")
+    arg_parser.add_argument("--db", help=f"History database (default {DEFAULT_HISTORY_PATH} or BILL_HISTORY_PATH)")
+    arg_parser.add_argument("--json", action="store_true", help="Print JSON instead of a table")
+    commands = arg_parser.add_subparsers(dest="command", required=True)
+    for name, help_text in (("balances", "Total owed per user"), ("categories", "Charges per category and period")):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument("--months", type=int, help="Only the last N months of history")
+    trend_cmd = commands.add_parser("trend", help="Amount owed by one user per period")
+    trend_cmd.add_argument("user", help="Split key (email, or name for unmatched lines)")
+    trend_cmd.add_argument("--months", type=int)
+    reconcile_cmd = commands.add_parser("reconcile", help="Bill totals against splits and parsed charges")
+    reconcile_cmd.add_argument("--period", help="YYYY-MM")
+    args = arg_parser.parse_args()
+
+    history = BillHistory(args.db)
+    since = history.since_months(args.months) if getattr(args, "months", None) else None
+    if args.command == "balances":
+        result = history.balances(since=since)
+        rows = [[user, amount] for user, amount in result.items()]
+        headers = ["user", "owed"]
+    elif args.command == "trend":
+        result = history.trend(args.user, since=since)
+        rows = [list(row) for row in result]
+        headers = ["period", "owed"]
+    elif args.command == "categories":
+        result = history.categories(since=since)
+        periods = sorted({p for by_period in result.values() for p in by_period})
+        rows = [[category] + [by_period.get(p, 0.0) for p in periods] for category, by_period in result.items()]
+        headers = ["category"] + periods
+    else:
+        result = history.reconcile(args.period)
+        rows = [[r["period"], r["bill_id"][:8], r["total"], r["split_difference"], r["charges_difference"], r["source"]]
+                for r in result]
+        headers = ["period", "bill", "total", "split_diff", "charges_diff", "source"]
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        _print_table(headers, rows)
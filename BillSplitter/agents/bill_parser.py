@@ -1,10 +1,25 @@
 import os
-from langchain_google_genai import ChatGoogleGenerativeAI
+import json
+import time
+import asyncio
+import mimetypes
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from contextlib import ExitStack, nullcontext
 from dotenv import load_dotenv
-from langchain_core.messages import HumanMessage
-from langchain_core.output_parsers import JsonOutputParser
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import TYPE_CHECKING, List, Optional, Tuple, Union
+from agents import resilience, telemetry
+from agents.parse_cache import ParseCache
+from agents.single_flight import SingleFlight
+from agents.pdf_preprocess import preprocess_pdf, extract_page_texts, select_pages, PreprocessResult
+from pypdf import PdfReader
+
+if TYPE_CHECKING:
+    from agents.image_preprocess import ImagePreprocessResult
+
+# langchain and the Gemini SDK are imported on first use (see BillParserAgent.llm / .parser);
+# they take seconds to import and cache hits or template parses never need them.
 
 load_dotenv()
 
@@ -27,49 +42,542 @@ class BillData(BaseModel):
     shared_costs: List[LineItem] = Field(description="Shared costs not specific to a user (e.g., account level taxes, base plan)")
     user_charges: List[UserCharge] = Field(description="Charges broken down by user/line")
 
+EXTRACTION_PROMPT = "Extract the following information from this bill. Return JSON matching the specified format. Make sure to extract only information associated with phone number & name and total amount should be the total of all charges."
+
+# The format instructions are generated from this schema, so the cache key uses it instead
+# (building them would import langchain on every cache lookup)
+BILL_SCHEMA_JSON = json.dumps(BillData.model_json_schema(), sort_keys=True)
+
+# Bumped whenever preprocessing changes what the model sees (part of the cache key)
+PREPROCESS_VERSION = "pdf-prune-v1"
+
+DEFAULT_CHUNK_PAGES = 15
+DEFAULT_CHUNK_WORKERS = 4
+
+# One Gemini client and output parser per process, shared by every agent instance
+_shared_lock = threading.Lock()
+_shared_llms = {}
+_shared_parser = None
+
+def shared_llm(model_name: str, cached_content: Optional[str] = None):
+    """
+    Returns the process-wide chat model for a model name (its HTTP connections
+    are reused), optionally bound to a context cache holding the instructions.
+    """
+    # One plain and one cached-content client per model; a renewed context cache
+    # replaces the client bound to the old one instead of adding another
+    key = (model_name, cached_content is not None)
+    with _shared_lock:
+        entry = _shared_llms.get(key)
+        if entry is None or entry[0] != cached_content:
+            from langchain_google_genai import ChatGoogleGenerativeAI
+            # Retries are handled by agents.resilience (shared backoff, breaker and deadline)
+            # Each request is bounded by the "gemini" policy's call_timeout
+            entry = _shared_llms[key] = (cached_content, ChatGoogleGenerativeAI(
+                model=model_name, temperature=0, max_retries=1, cached_content=cached_content,
+                timeout=resilience.policy_for("gemini").call_timeout))
+        return entry[1]
+
+def shared_output_parser():
+    global _shared_parser
+    with _shared_lock:
+        if _shared_parser is None:
+            from langchain_core.output_parsers import JsonOutputParser
+            _shared_parser = JsonOutputParser(pydantic_object=BillData)
+        return _shared_parser
+
+def _env_flag(name: str) -> bool:
+    return os.environ.get(name, "").lower() in ("1", "true", "yes")
+
+# Concurrent parses of identical bills (same cache key) share one in-flight parse
+_parse_flights = SingleFlight()
+
 class BillParserAgent:
-    def __init__(self, model_name="gemini-2.0-flash"):
-        self.llm = ChatGoogleGenerativeAI(model=model_name, temperature=0)
-        self.parser = JsonOutputParser(pydantic_object=BillData)
-
-    def parse_bill(self, file_path: str) -> dict:
-        """Parses a bill file (image or PDF) and returns structured data."""
-        
-        # TODO: Handle PDF to image conversion if needed, or pass PDF directly if supported
-        # For now assuming image path or text content if we extract it first.
-        # Gemini 1.5 Pro can handle PDF directly via API but LangChain integration might need specific handling.
-        # Let's assume we pass the file as a media block.
-        
-        import mimetypes
+    def __init__(self, model_name="gemini-2.0-flash", use_cache: bool = True, cache: Optional[ParseCache] = None,
+                 preprocess: bool = True, use_templates: bool = True,
+                 chunk_pages: Optional[int] = None, max_chunk_workers: Optional[int] = None,
+                 structured_output: Optional[bool] = None, context_cache: Optional[bool] = None,
+                 cascade: Optional[bool] = None, local_model=None):
+        self.model_name = model_name
+        self._llm = None
+        self._parser = None
+        self.cache = (cache or ParseCache()) if use_cache else None
+        self.preprocess = preprocess
+        self.use_templates = use_templates
+        # PDFs with more pages to send than this are parsed in page-range chunks (0 disables)
+        self.chunk_pages = chunk_pages if chunk_pages is not None else int(
+            os.environ.get("BILL_PARSER_CHUNK_PAGES", DEFAULT_CHUNK_PAGES))
+        self.max_chunk_workers = max_chunk_workers or int(
+            os.environ.get("BILL_PARSER_CHUNK_WORKERS", DEFAULT_CHUNK_WORKERS))
+        # Ask the model for BillData through its native JSON schema mode instead of
+        # format instructions in the prompt and parsing the reply text
+        self.structured_output = structured_output if structured_output is not None else _env_flag(
+            "BILL_PARSER_STRUCTURED_OUTPUT")
+        # Keep the static instructions in a Gemini context cache instead of resending them
+        self.context_cache = context_cache if context_cache is not None else _env_flag("BILL_PARSER_CONTEXT_CACHE")
+        self._structured = None
+        # Try a local model on the PDF text layer first and only send Gemini what it can't parse
+        self.cascade = cascade if cascade is not None else _env_flag("BILL_PARSER_CASCADE")
+        # Ollama model name, or any LangChain chat model (None: BILL_PARSER_LOCAL_MODEL)
+        self.local_model = local_model
+        self._local_llm = None
+        self.last_preprocess: Optional[Union[PreprocessResult, "ImagePreprocessResult"]] = None
+        # Where the last result came from: "cache", "template:<name>", "local:<model>", "llm" or "llm:chunked"
+        self.last_source: Optional[str] = None
+
+    @property
+    def llm(self):
+        # Built on first use so cache hits never construct the Gemini client
+        if self._llm is None:
+            self._llm = shared_llm(self.model_name)
+        return self._llm
+
+    @property
+    def local_llm(self):
+        """The cascade's local chat model (raises ImportError if langchain-ollama is missing)."""
+        if self._local_llm is None:
+            from agents.cascade import shared_local_llm
+            self._local_llm = shared_local_llm(self.local_model_name()) if self._local_is_named() else self.local_model
+        return self._local_llm
+
+    def _local_is_named(self) -> bool:
+        return self.local_model is None or isinstance(self.local_model, str)
+
+    def local_model_name(self) -> str:
+        from agents.cascade import DEFAULT_LOCAL_MODEL, model_label
+        if self._local_is_named():
+            return self.local_model or DEFAULT_LOCAL_MODEL
+        return model_label(self.local_model)
+
+    @property
+    def parser(self):
+        if self._parser is None:
+            self._parser = shared_output_parser()
+        return self._parser
+
+    def instructions(self) -> str:
+        """The static part of every extraction request (format instructions only without structured output)."""
+        if self.structured_output:
+            return EXTRACTION_PROMPT
+        return EXTRACTION_PROMPT + "\n" + self.parser.get_format_instructions()
+
+    def cache_key(self, file_path: str) -> str:
+        """Returns the parse cache key for a file (file bytes + model + prompt)."""
+        prompt = EXTRACTION_PROMPT + ("structured:" if self.structured_output else "format:") + BILL_SCHEMA_JSON
+        if self.preprocess:
+            prompt += PREPROCESS_VERSION
+            if (mimetypes.guess_type(file_path)[0] or "").startswith("image/"):
+                from agents.image_preprocess import IMAGE_PREPROCESS_VERSION
+                prompt += IMAGE_PREPROCESS_VERSION
+        if self.use_templates:
+            prompt += "templates"
+        if self.chunk_pages:
+            prompt += f"chunks:{self.chunk_pages}"
+        if self.cascade:
+            prompt += f"cascade:{self.local_model_name()}"
+        return ParseCache.make_key(ParseCache.hash_file(file_path), self.model_name, prompt)
+
+    @staticmethod
+    def _mime_type(file_path: str) -> str:
         mime_type, _ = mimetypes.guess_type(file_path)
-        
         if not mime_type:
             raise ValueError("Could not determine mime type of the file")
+        return mime_type
 
-        with open(file_path, "rb") as f:
-            image_data = f.read()
+    def _cached(self, key: str, bypass_cache: bool) -> Optional[BillData]:
+        if self.cache is None or bypass_cache:
+            return None
+        cached = self.cache.get(key)
+        if cached is None:
+            return None
+        self.last_source = "cache"
+        return BillData(**cached)
+
+    def _coalesced(self, result: BillData, leader: bool) -> BillData:
+        # Callers that joined another caller's parse get their own copy of its result
+        if leader:
+            return result
+        self.last_source = "coalesced"
+        return result.model_copy(deep=True)
+
+    def parse_bill(self, file_path: str, bypass_cache: bool = False) -> BillData:
+        """
+        Parses a bill file (image or PDF) and returns structured data.
+
+        Results are cached on disk by file content. With bypass_cache=True the
+        cached entry is ignored and the fresh result overwrites it. Concurrent
+        calls for the same file content (in any thread or task) share one parse.
+        """
+        mime_type = self._mime_type(file_path)
+        key = self.cache_key(file_path)
+        cached = self._cached(key, bypass_cache)
+        if cached is not None:
+            return cached
+
+        ran = []
+        def parse():
+            ran.append(True)
+            return self._parse_uncached(file_path, mime_type, key)
+        return self._coalesced(_parse_flights.do(key, parse), bool(ran))
+
+    async def aparse_bill(self, file_path: str, bypass_cache: bool = False) -> BillData:
+        """
+        Async parse_bill. The model is called with ainvoke; file reading and PDF
+        work run in worker threads so the event loop is never blocked.
+        """
+        mime_type = self._mime_type(file_path)
+        key = await asyncio.to_thread(self.cache_key, file_path)
+        cached = await asyncio.to_thread(self._cached, key, bypass_cache)
+        if cached is not None:
+            return cached
+
+        ran = []
+        async def parse():
+            ran.append(True)
+            return await self._aparse_uncached(file_path, mime_type, key)
+        return self._coalesced(await _parse_flights.ado(key, parse), bool(ran))
+
+    def _parse_local(self, pdf: Optional[Tuple[PdfReader, List[str]]]) -> Optional[BillData]:
+        """Parses a known carrier layout without the LLM, or returns None."""
+        if not self.use_templates or pdf is None:
+            return None
+        # Known carrier layouts parse locally; the LLM is only used if none matches and reconciles
+        from agents.bill_templates import parse_with_templates
+        matched = parse_with_templates(pdf[1])
+        if not matched:
+            return None
+        template_name, bill_data = matched
+        self.last_source = f"template:{template_name}"
+        print(f"Parsed with template '{template_name}' (no LLM call).")
+        return bill_data
+
+    def _wants_pdf(self, mime_type: str) -> bool:
+        return mime_type == "application/pdf" and bool(self.preprocess or self.use_templates or self.chunk_pages)
+
+    def _parse_uncached(self, file_path: str, mime_type: str, key: str) -> BillData:
+        with ExitStack() as stack:
+            pdf = None
+            if self._wants_pdf(mime_type):
+                # Read from the open file so pages are loaded on demand, not the whole PDF at once
+                pdf = self._read_pdf(stack.enter_context(open(file_path, "rb")))
+
+            bill_data = self._parse_local(pdf)
+            escalated = False
+            if bill_data is None and self.cascade:
+                bill_data = self._parse_cascade(pdf)
+                escalated = bill_data is None
+
+            with self._gemini_tier(escalated):
+                chunks = self._chunk_plan(pdf[1]) if bill_data is None and pdf is not None else None
+                if chunks:
+                    bill_data = self._parse_chunked(pdf, chunks)
+                    self.last_source = "llm:chunked"
+
+                if bill_data is None:
+                    bill_data = self._invoke_llm(self._bill_content_block(file_path, mime_type, pdf))
+                    self.last_source = "llm"
+
+        if self.cache is not None:
+            self.cache.put(key, bill_data.model_dump())
+        return bill_data
 
-        message = HumanMessage(
-            content=[
-                {"type": "text", "text": "Extract the following information from this bill. Return JSON matching the specified format. Make sure to extract only information associated with phone number & name and total amount should be the total of all charges."},
-                {"type": "text", "text": self.parser.get_format_instructions()},
-                {"type": "media", "mime_type": mime_type, "data": image_data},
-            ]
-        )
+    async def _aparse_uncached(self, file_path: str, mime_type: str, key: str) -> BillData:
+        with ExitStack() as stack:
+            pdf = None
+            if self._wants_pdf(mime_type):
+                source = stack.enter_context(open(file_path, "rb"))
+                pdf = await asyncio.to_thread(self._read_pdf, source)
 
-        response = self.llm.invoke([message])
-        json_result = self.parser.parse(response.content)
-        return BillData(**json_result)
+            bill_data = await asyncio.to_thread(self._parse_local, pdf)
+            escalated = False
+            if bill_data is None and self.cascade:
+                bill_data = await self._aparse_cascade(pdf)
+                escalated = bill_data is None
+
+            with self._gemini_tier(escalated):
+                chunks = self._chunk_plan(pdf[1]) if bill_data is None and pdf is not None else None
+                if chunks:
+                    bill_data = await self._aparse_chunked(pdf, chunks)
+                    self.last_source = "llm:chunked"
+
+                if bill_data is None:
+                    block = await asyncio.to_thread(self._bill_content_block, file_path, mime_type, pdf)
+                    bill_data = await self._ainvoke_llm(block)
+                    self.last_source = "llm"
+
+        if self.cache is not None:
+            await asyncio.to_thread(self.cache.put, key, bill_data.model_dump())
+        return bill_data
+
+    def _cascade_request(self, pdf: Optional[Tuple[PdfReader, List[str]]]) -> Tuple[Optional[list], Optional[str], Optional[str]]:
+        """The local tier's messages and the bill text they carry, or the reason to go straight to Gemini."""
+        from langchain_core.messages import HumanMessage
+        from agents.cascade import bill_text, fits_context, REASON_NO_TEXT, REASON_TOO_LONG
+        text = bill_text(pdf[1], self._pages_to_send(pdf[1])) if pdf is not None else None
+        if text is None:
+            return None, None, REASON_NO_TEXT
+        # Local models get the format instructions whatever the Gemini request uses
+        prompt = f"{EXTRACTION_PROMPT}\n{self.parser.get_format_instructions()}\n\nBill text:\n{text}"
+        if not fits_context(prompt):
+            return None, None, REASON_TOO_LONG
+        return [HumanMessage(content=prompt)], text, None
+
+    def _cascade_result(self, response, text: str, local_span, started: float) -> Optional[BillData]:
+        from agents.cascade import cascade_stats, validate_reply, TIER_LOCAL
+        usage = getattr(response, "usage_metadata", None) or {}
+        local_span.set(input_tokens=usage.get("input_tokens", 0), output_tokens=usage.get("output_tokens", 0))
+        bill_data, reason = validate_reply(response.content, text)
+        local_span.set(accepted=bill_data is not None, reason=reason)
+        cascade_stats.record(TIER_LOCAL, time.perf_counter() - started, reason)
+        if bill_data is None:
+            print(f"Local model parse rejected ({reason}); escalating to {self.model_name}.")
+            return None
+        self.last_source = f"local:{self.local_model_name()}"
+        return bill_data
+
+    def _cascade_failed(self, e: Exception, local_span, started: float) -> None:
+        from agents.cascade import cascade_stats, TIER_LOCAL, REASON_UNAVAILABLE
+        local_span.error = f"{type(e).__name__}: {e}"
+        local_span.set(accepted=False, reason=REASON_UNAVAILABLE)
+        cascade_stats.record(TIER_LOCAL, time.perf_counter() - started, REASON_UNAVAILABLE)
+        print(f"Warning: local model unavailable ({e}); escalating to {self.model_name}.")
+
+    def _parse_cascade(self, pdf: Optional[Tuple[PdfReader, List[str]]]) -> Optional[BillData]:
+        """Local tier of the cascade: the local model's parse if it validates, else None (escalate)."""
+        from agents.cascade import cascade_stats, TIER_LOCAL
+        messages, text, reason = self._cascade_request(pdf)
+        if reason is not None:
+            cascade_stats.record(TIER_LOCAL, None, reason)
+            return None
+        started = time.perf_counter()
+        with telemetry.span("local.invoke", telemetry.KIND_LOCAL_LLM, model=self.local_model_name()) as local_span:
+            try:
+                response = resilience.call("ollama", self.local_llm.invoke, messages)
+            except Exception as e:
+                self._cascade_failed(e, local_span, started)
+                return None
+            return self._cascade_result(response, text, local_span, started)
+
+    async def _aparse_cascade(self, pdf: Optional[Tuple[PdfReader, List[str]]]) -> Optional[BillData]:
+        from agents.cascade import cascade_stats, TIER_LOCAL
+        messages, text, reason = await asyncio.to_thread(self._cascade_request, pdf)
+        if reason is not None:
+            cascade_stats.record(TIER_LOCAL, None, reason)
+            return None
+        started = time.perf_counter()
+        with telemetry.span("local.invoke", telemetry.KIND_LOCAL_LLM, model=self.local_model_name()) as local_span:
+            try:
+                llm = await asyncio.to_thread(lambda: self.local_llm)
+                response = await resilience.acall("ollama", llm.ainvoke, messages)
+            except Exception as e:
+                self._cascade_failed(e, local_span, started)
+                return None
+            return self._cascade_result(response, text, local_span, started)
+
+    @staticmethod
+    def _gemini_tier(escalated: bool):
+        """Counts an escalated bill's Gemini parse in the cascade stats."""
+        if not escalated:
+            return nullcontext()
+        from agents.cascade import cascade_stats, TIER_GEMINI
+        return cascade_stats.timed(TIER_GEMINI)
+
+    def _model(self) -> Tuple[object, bool]:
+        """The runnable to call and whether the instructions are already in a context cache."""
+        llm, cached = self.llm, False
+        if self.context_cache:
+            from agents.context_cache import get_context_cache
+            name = get_context_cache().name_for(self.model_name, self.instructions())
+            if name is not None:
+                llm, cached = shared_llm(self.model_name, cached_content=name), True
+        if not self.structured_output:
+            return llm, cached
+        if self._structured is None or self._structured[0] is not llm:
+            self._structured = (llm, llm.with_structured_output(BillData, method="json_schema", include_raw=True))
+        return self._structured[1], cached
+
+    def _llm_messages(self, bill_block: dict, note: Optional[str], cached: bool = False) -> Tuple[list, int]:
+        """The request for one bill block (and an optional note), and its size in bytes."""
+        from langchain_core.messages import HumanMessage
+        content = []
+        if not cached:
+            content.append({"type": "text", "text": EXTRACTION_PROMPT})
+            if not self.structured_output:
+                content.append({"type": "text", "text": self.parser.get_format_instructions()})
+        if note:
+            content.append({"type": "text", "text": note})
+        content.append(bill_block)
+        bytes_sent = sum(len(b.get("text", "").encode("utf-8")) + len(b.get("data", b"")) for b in content)
+        return [HumanMessage(content=content)], bytes_sent
+
+    def _llm_result(self, response, llm_span) -> BillData:
+        # Structured output returns {"raw": AIMessage, "parsed": BillData, "parsing_error": ...}
+        raw = response["raw"] if isinstance(response, dict) else response
+        usage = getattr(raw, "usage_metadata", None) or {}
+        llm_span.set(input_tokens=usage.get("input_tokens", 0), output_tokens=usage.get("output_tokens", 0),
+                     cached_tokens=(usage.get("input_token_details") or {}).get("cache_read", 0))
+        if not isinstance(response, dict):
+            return BillData(**self.parser.parse(response.content))
+        parsed = response.get("parsed")
+        if parsed is None:
+            raise response.get("parsing_error") or ValueError("Model returned no structured output")
+        return parsed if isinstance(parsed, BillData) else BillData(**parsed)
+
+    def _invoke_llm(self, bill_block: dict, note: Optional[str] = None) -> BillData:
+        """Sends the extraction prompt plus one bill block (and an optional note) to the model."""
+        model, cached = self._model()
+        messages, bytes_sent = self._llm_messages(bill_block, note, cached)
+        with telemetry.span("gemini.invoke", telemetry.KIND_LLM, model=self.model_name, bytes_sent=bytes_sent,
+                            structured=self.structured_output) as llm_span:
+            response = resilience.call("gemini", model.invoke, messages)
+            return self._llm_result(response, llm_span)
+
+    async def _ainvoke_llm(self, bill_block: dict, note: Optional[str] = None) -> BillData:
+        model, cached = await asyncio.to_thread(self._model)
+        messages, bytes_sent = self._llm_messages(bill_block, note, cached)
+        with telemetry.span("gemini.invoke", telemetry.KIND_LLM, model=self.model_name, bytes_sent=bytes_sent,
+                            structured=self.structured_output) as llm_span:
+            response = await resilience.acall("gemini", model.ainvoke, messages)
+            return self._llm_result(response, llm_span)
+
+    def _chunk_plan(self, texts: List[str]) -> Optional[List[List[int]]]:
+        """Page-range chunks to parse separately, or None if the bill fits in a single call."""
+        if not self.chunk_pages:
+            return None
+        from agents.bill_chunks import page_chunks
+        pages = self._pages_to_send(texts)
+        if len(pages) <= self.chunk_pages:
+            return None
+        return page_chunks(pages, self.chunk_pages)
+
+    def _pages_to_send(self, texts: List[str]) -> List[int]:
+        pages = select_pages(texts) if self.preprocess else list(range(len(texts)))
+        if len(pages) <= 1:
+            # No charge pages recognised - send everything
+            pages = list(range(len(texts)))
+        return pages
+
+    @staticmethod
+    def _chunk_note(pages: List[int], pages_total: int) -> str:
+        from agents.bill_chunks import CHUNK_PROMPT
+        return CHUNK_PROMPT.format(pages=f"{pages[0] + 1}-{pages[-1] + 1}", pages_total=pages_total)
+
+    def _parse_chunked(self, pdf: Tuple[PdfReader, List[str]], chunks: List[List[int]]) -> BillData:
+        """
+        Parses page-range chunks concurrently and merges them into one BillData.
+
+        Chunk payloads are built one at a time on this thread (the reader is not
+        thread-safe) and at most max_chunk_workers are in flight, so only that many
+        chunks are held in memory at once.
+        """
+        from agents.bill_chunks import iter_chunk_blocks, merge_bill_parts
+        reader, texts = pdf
+        self._model()  # build the client (and any context cache) once, before the worker threads use it
+        print(f"Parsing {len(texts)}-page bill in {len(chunks)} chunks.")
+
+        parts: List[Optional[BillData]] = [None] * len(chunks)
+        pending = {}
+        with ThreadPoolExecutor(max_workers=self.max_chunk_workers) as pool:
+            for index, block in enumerate(iter_chunk_blocks(reader, texts, chunks)):
+                if len(pending) >= self.max_chunk_workers:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        parts[pending.pop(future)] = future.result()
+                note = self._chunk_note(chunks[index], len(texts))
+                pending[pool.submit(telemetry.run_in_context(self._invoke_llm), block, note)] = index
+            for future in pending:
+                parts[pending[future]] = future.result()
+        return merge_bill_parts(parts)
+
+    async def _aparse_chunked(self, pdf: Tuple[PdfReader, List[str]], chunks: List[List[int]]) -> BillData:
+        """Async _parse_chunked: the same bound of max_chunk_workers chunks in flight, as tasks."""
+        from agents.bill_chunks import iter_chunk_blocks, merge_bill_parts
+        reader, texts = pdf
+        print(f"Parsing {len(texts)}-page bill in {len(chunks)} chunks.")
+
+        slots = asyncio.Semaphore(self.max_chunk_workers)
+        blocks = iter_chunk_blocks(reader, texts, chunks)
+
+        async def parse_chunk(index: int, block: dict) -> BillData:
+            try:
+                return await self._ainvoke_llm(block, self._chunk_note(chunks[index], len(texts)))
+            finally:
+                slots.release()
+
+        tasks = []
+        try:
+            for index in range(len(chunks)):
+                # Wait for a free slot before building the next payload, so memory stays bounded
+                await slots.acquire()
+                try:
+                    block = await asyncio.to_thread(next, blocks)
+                except BaseException:
+                    slots.release()
+                    raise
+                tasks.append(asyncio.create_task(parse_chunk(index, block)))
+            parts = await asyncio.gather(*tasks)
+        finally:
+            # A failed chunk or a cancelled bill must not leave model calls running without an owner
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        return merge_bill_parts(parts)
+
+    @staticmethod
+    def _read_pdf(source) -> Optional[Tuple[PdfReader, List[str]]]:
+        """Opens a PDF (path or binary file object) and extracts its page texts once, or returns None if pypdf can't read it."""
+        try:
+            reader = PdfReader(source)
+            return reader, extract_page_texts(reader)
+        except Exception as e:
+            # Unreadable by pypdf - let the model have the original file
+            print(f"Warning: could not read PDF text layer ({e}); sending the full file.")
+            return None
+
+    def _bill_content_block(self, file_path: str, mime_type: str,
+                            pdf: Optional[Tuple[PdfReader, List[str]]] = None) -> dict:
+        """Builds the message block carrying the bill (pruned PDF pages or their text, or a normalized image)."""
+        if self.preprocess and pdf is not None:
+            try:
+                result = preprocess_pdf(file_path, reader=pdf[0], texts=pdf[1])
+            except Exception as e:
+                print(f"Warning: PDF preprocessing failed ({e}); sending the full file.")
+                result = None
+            if result is not None:
+                self.last_preprocess = result
+                print(f"PDF preprocessing: {result.summary()}")
+                if result.text is not None:
+                    pages = ", ".join(str(i + 1) for i in result.pages_kept)
+                    return {"type": "text", "text": f"Bill text (pages {pages} of {result.pages_total}):\n{result.text}"}
+                return {"type": "media", "mime_type": result.mime_type, "data": result.data}
+
+        if self.preprocess and mime_type.startswith("image/"):
+            # Phone photos are oriented, cropped to the page, grayscaled and downscaled
+            from agents.image_preprocess import preprocess_image
+            try:
+                result = preprocess_image(file_path)
+            except Exception as e:
+                print(f"Warning: image preprocessing failed ({e}); sending the original image.")
+            else:
+                self.last_preprocess = result
+                print(f"Image preprocessing: {result.summary()}")
+                return {"type": "media", "mime_type": result.mime_type, "data": result.data}
+
+        with open(file_path, "rb") as f:
+            image_data = f.read()
+        return {"type": "media", "mime_type": mime_type, "data": image_data}
 
 if __name__ == "__main__":
     # Test code
     import sys
-    if len(sys.argv) > 1:
-        agent = BillParserAgent()
+    args = [a for a in sys.argv[1:] if a not in ("--no-cache", "--structured", "--cascade")]
+    if args:
+        agent = BillParserAgent(structured_output=True if "--structured" in sys.argv else None,
+                                cascade=True if "--cascade" in sys.argv else None)
         try:
-            result = agent.parse_bill(sys.argv[1])
+            result = agent.parse_bill(args[0], bypass_cache="--no-cache" in sys.argv)
             print(result)
         except Exception as e:
             print(f"Error: {e}")
     else:
-        print("Usage: python bill_parser.py <path_to_bill>")
+        print("Usage: python bill_parser.py [--no-cache] [--structured] [--cascade] <path_to_bill>")
@@ -0,0 +1,89 @@
+"""
+Compact, immutable form of a parsed bill for the graph state.
+
+BillData (pydantic) is converted once into NamedTuple records: no per-instance
+__dict__, and nothing downstream can mutate them, so nodes and the split
+calculator share one copy by reference instead of each building its own dicts.
+Records answer .get(field, default) like the BillData dicts they replace, so
+code written against model_dump() output reads them unchanged.
+"""
+from typing import Any, Iterable, NamedTuple, Optional, Tuple, Union
+
+def _get(self, key: str, default: Any = None) -> Any:
+    return getattr(self, key) if key in self._fields else default
+
+class ItemRecord(NamedTuple):
+    description: str
+    amount: float
+    category: str
+
+    get = _get
+
+class LineRecord(NamedTuple):
+    name: str
+    phone_number: Optional[str]
+    items: Tuple[ItemRecord, ...]
+    total: float
+
+    get = _get
+
+class BillRecord(NamedTuple):
+    total_amount: float
+    period_start: str
+    period_end: str
+    usage_period: str
+    shared_costs: Tuple[ItemRecord, ...]
+    user_charges: Tuple[LineRecord, ...]
+
+    get = _get
+
+    @classmethod
+    def from_model(cls, bill) -> "BillRecord":
+        """Builds a record from a BillData (or anything with the same attributes)."""
+        return cls(
+            bill.total_amount, bill.period_start, bill.period_end, bill.usage_period,
+            tuple(ItemRecord(i.description, i.amount, i.category) for i in bill.shared_costs),
+            tuple(
+                LineRecord(u.name, u.phone_number,
+                           tuple(ItemRecord(i.description, i.amount, i.category) for i in u.items), u.total)
+                for u in bill.user_charges
+            ),
+        )
+
+    @classmethod
+    def from_dict(cls, bill: dict) -> "BillRecord":
+        """Builds a record from BillData.model_dump() output (e.g. a checkpoint written before records)."""
+        def items(raw: Iterable[dict]) -> Tuple[ItemRecord, ...]:
+            return tuple(ItemRecord(i.get("description", ""), i.get("amount", 0.0), i.get("category", "")) for i in raw)
+        return cls(
+            bill.get("total_amount", 0.0), bill.get("period_start", ""), bill.get("period_end", ""),
+            bill.get("usage_period", ""), items(bill.get("shared_costs") or []),
+            tuple(
+                LineRecord(u.get("name"), u.get("phone_number"), items(u.get("items") or []), u.get("total", 0.0))
+                for u in bill.get("user_charges") or []
+            ),
+        )
+
+    def to_dict(self) -> dict:
+        """The equivalent BillData.model_dump() output (for JSON)."""
+        return {
+            **self._asdict(),
+            "shared_costs": [i._asdict() for i in self.shared_costs],
+            "user_charges": [{**u._asdict(), "items": [i._asdict() for i in u.items]} for u in self.user_charges],
+        }
+
+def as_bill_record(bill: Union[BillRecord, dict, Any, None]) -> Optional[BillRecord]:
+    """Returns bill as a BillRecord, converting a BillData or its dict form if needed."""
+    if bill is None:
+        return None
+    if isinstance(bill, BillRecord):
+        if isinstance(bill.user_charges, tuple):
+            return bill
+        # Checkpoints store tuples as lists; restore the immutable form
+        return bill._replace(
+            shared_costs=tuple(bill.shared_costs),
+            user_charges=tuple(u._replace(items=tuple(u.items)) for u in bill.user_charges),
+        )
+    if isinstance(bill, dict):
+        return BillRecord.from_dict(bill)
+    return BillRecord.from_model(bill)
@@ -0,0 +1,118 @@
+"""
+Deterministic template parsers for known carrier layouts.
+
+Templates are tried on the PDF text layer before the LLM. A template's result
+is only used if its line and shared totals reconcile with the bill total;
+otherwise parsing falls through to the next template and finally the LLM.
+"""
+import re
+from typing import List, Optional, Tuple
+from agents.bill_parser import BillData, LineItem, UserCharge
+
+AMOUNT = r"(-?\$?\s?-?\d[\d,]*\.\d{2})"
+
+def parse_amount(text: str) -> float:
+    return float(text.replace(",", "").replace("$", "").replace(" ", ""))
+
+def reconciles(bill: BillData, tolerance: float = 0.05) -> bool:
+    """True if user totals plus shared costs add up to the bill total (and there is at least one line)."""
+    if not bill.user_charges:
+        return False
+    components = sum(u.total for u in bill.user_charges) + sum(c.amount for c in bill.shared_costs)
+    return abs(components - bill.total_amount) <= tolerance
+
+class BillTemplate:
+    """Base class: subclasses detect their layout and extract BillData from page texts."""
+    name = "base"
+
+    def matches(self, text: str) -> bool:
+        raise NotImplementedError
+
+    def parse(self, page_texts: List[str]) -> Optional[BillData]:
+        raise NotImplementedError
+
+_TEMPLATES: List[BillTemplate] = []
+
+def register_template(template: BillTemplate) -> BillTemplate:
+    """Adds a template to the registry (tried in registration order)."""
+    _TEMPLATES.append(template)
+    return template
+
+def registered_templates() -> List[BillTemplate]:
+    return list(_TEMPLATES)
+
+def parse_with_templates(page_texts: List[str]) -> Optional[Tuple[str, BillData]]:
+    """Returns (template name, BillData) from the first template that matches and reconciles, else None."""
+    full_text = "\n".join(page_texts)
+    for template in _TEMPLATES:
+        if not template.matches(full_text):
+            continue
+        try:
+            bill = template.parse(page_texts)
+        except (ValueError, IndexError):
+            bill = None
+        if bill is not None and reconciles(bill):
+            return template.name, bill
+    return None
+
+class ATTWirelessTemplate(BillTemplate):
+    """
+    AT&T wireless statements.
+
+    Expects a billing period ("Billing period: Nov 06 - Dec 05, 2025"), a
+    total ("Total due $123.45"), one summary row per line in the
+    "Charges by line" section ("SRAVYA REKAPALLI 469.882.5794 $45.22") and
+    account-level charges ("Account charges $60.00", "Taxes & fees $3.10").
+    """
+    name = "att_wireless"
+
+    PERIOD = re.compile(r"Bill(?:ing)? period:?\s*(.+?)\s*(?:-|–|to)\s*(.+?\d{4})", re.IGNORECASE)
+    TOTAL = re.compile(r"Total (?:due|amount due|charges)\s*:?\s*" + AMOUNT, re.IGNORECASE)
+    LINE = re.compile(r"^\s*([A-Z][A-Za-z .'()\-]+?)\s+(\d{3}\.\d{3}\.\d{4})\s+" + AMOUNT + r"\s*$")
+    SHARED = re.compile(
+        r"^\s*(Account charges|Group plan|Plan charges|Discounts?|Surcharges(?: & fees)?|"
+        r"Government fees(?: & taxes)?|Taxes(?: & fees| and fees)?)\s*:?\s+" + AMOUNT + r"\s*$",
+        re.IGNORECASE
+    )
+
+    def matches(self, text: str) -> bool:
+        return "AT&T" in text and bool(self.TOTAL.search(text)) and "Charges by line" in text
+
+    def parse(self, page_texts: List[str]) -> Optional[BillData]:
+        text = "\n".join(page_texts)
+        period = self.PERIOD.search(text)
+        total = self.TOTAL.search(text)
+        if not period or not total:
+            return None
+
+        user_charges = []
+        shared_costs = []
+        for line in text.splitlines():
+            line_match = self.LINE.match(line)
+            if line_match:
+                name, phone, amount = line_match.groups()
+                amount = parse_amount(amount)
+                user_charges.append(UserCharge(
+                    name=name.strip(),
+                    phone_number=phone,
+                    items=[LineItem(description="Line charges", amount=amount, category="Plan")],
+                    total=amount
+                ))
+                continue
+            shared_match = self.SHARED.match(line)
+            if shared_match:
+                description, amount = shared_match.groups()
+                category = "Tax" if re.search(r"tax|fee|surcharge", description, re.IGNORECASE) else "Plan"
+                shared_costs.append(LineItem(description=description.strip(), amount=parse_amount(amount), category=category))
+
+        start, end = period.group(1).strip(), period.group(2).strip()
+        return BillData(
+            total_amount=parse_amount(total.group(1)),
+            period_start=start,
+            period_end=end,
+            usage_period=f"{start} - {end}",
+            shared_costs=shared_costs,
+            user_charges=user_charges
+        )
+
+register_template(ATTWirelessTemplate())
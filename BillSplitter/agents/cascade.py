@@ -0,0 +1,161 @@
+"""
+Local-model-first extraction cascade.
+
+In cascade mode a bill whose PDF has a usable text layer is first parsed by a
+local chat model (Ollama by default, or any LangChain chat model). Its reply
+is only accepted if it validates as BillData, its line and shared totals
+reconcile with the bill total, and the amounts it reports appear in the bill
+text (a small model will happily invent a total that adds up). Anything else
+escalates the bill to Gemini. Every attempt is counted per tier in
+`cascade_stats`.
+"""
+import os
+import re
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+from agents.bill_parser import BillData
+
+DEFAULT_LOCAL_MODEL = os.environ.get("BILL_PARSER_LOCAL_MODEL", "llama3.2:3b-instruct-fp16")
+# Ollama's context window for the local tier; its default (2048) truncates most bills
+DEFAULT_NUM_CTX = int(os.environ.get("BILL_PARSER_LOCAL_NUM_CTX", 8192))
+# Kept pages shorter than this are a scan or a cover page, not a text layer worth trying
+MIN_TEXT_CHARS = 200
+
+TIER_LOCAL = "local"
+TIER_GEMINI = "gemini"
+
+# Why a bill left the local tier
+REASON_NO_TEXT = "no_text"            # image, or a PDF without a usable text layer
+REASON_TOO_LONG = "too_long"          # the text would not fit the local context window
+REASON_UNAVAILABLE = "unavailable"    # local model not installed, not running or failing
+REASON_INVALID = "invalid"            # reply is not BillData JSON
+REASON_UNRECONCILED = "unreconciled"  # totals don't add up
+REASON_UNGROUNDED = "ungrounded"      # totals that don't appear in the bill text
+
+_AMOUNT = re.compile(r"\d[\d,]*\.\d{2}")
+
+_shared_lock = threading.Lock()
+_shared_llms = {}
+
+def shared_local_llm(model_name: str, base_url: Optional[str] = None):
+    """Returns the process-wide Ollama chat model for a model name (needs langchain-ollama)."""
+    with _shared_lock:
+        llm = _shared_llms.get((model_name, base_url))
+        if llm is None:
+            from langchain_ollama import ChatOllama
+            # base_url None lets the client read OLLAMA_HOST (default http://localhost:11434)
+            llm = _shared_llms[(model_name, base_url)] = ChatOllama(
+                model=model_name, base_url=base_url, temperature=0, format="json", num_ctx=DEFAULT_NUM_CTX)
+        return llm
+
+def model_label(model) -> str:
+    """Name of a chat model for stats and spans."""
+    return getattr(model, "model", None) or getattr(model, "model_name", None) or type(model).__name__
+
+def bill_text(texts: List[str], pages: List[int]) -> Optional[str]:
+    """The text layer of the given pages, or None if it is too thin to parse from."""
+    kept = [texts[i] for i in pages]
+    if not all(t.strip() for t in kept) or sum(len(t) for t in kept) < MIN_TEXT_CHARS:
+        return None
+    return "\n".join(f"--- Page {i + 1} ---\n{texts[i]}" for i in pages)
+
+def fits_context(prompt: str, num_ctx: int = DEFAULT_NUM_CTX) -> bool:
+    """Whether the prompt (about 4 characters per token) leaves half the context window for the reply."""
+    return len(prompt) // 4 <= num_ctx // 2
+
+def grounded(bill: BillData, text: str) -> bool:
+    """True if the bill total and every non-zero line total appear as amounts in the text."""
+    amounts = {round(float(a.replace(",", "")) * 100) for a in _AMOUNT.findall(text)}
+    totals = [bill.total_amount] + [u.total for u in bill.user_charges if u.total]
+    return all(round(abs(t) * 100) in amounts for t in totals)
+
+def validate_reply(content: str, text: str) -> Tuple[Optional[BillData], Optional[str]]:
+    """The local model's BillData and None, or None and the reason to escalate."""
+    from agents.bill_parser import shared_output_parser
+    from agents.bill_templates import reconciles
+    try:
+        bill = BillData(**shared_output_parser().parse(content))
+    except (ValueError, TypeError):
+        # OutputParserException and pydantic's ValidationError are ValueErrors
+        return None, REASON_INVALID
+    if not reconciles(bill):
+        return None, REASON_UNRECONCILED
+    if not grounded(bill, text):
+        return None, REASON_UNGROUNDED
+    return bill, None
+
+class CascadeStats:
+    """
+    Per-tier counters for the cascade: attempts, bills served, escalations by
+    reason and the latency of recent attempts. Safe to share between threads.
+    """
+
+    def __init__(self, window: int = 1024):
+        self.window = window
+        self._lock = threading.Lock()
+        self._tiers: Dict[str, Dict] = {}
+
+    def _tier(self, tier: str) -> Dict:
+        entry = self._tiers.get(tier)
+        if entry is None:
+            entry = self._tiers[tier] = {"attempts": 0, "served": 0, "escalations": {},
+                                         "seconds": deque(maxlen=self.window)}
+        return entry
+
+    def record(self, tier: str, seconds: Optional[float], reason: Optional[str] = None) -> None:
+        """Counts one attempt: served if reason is None, else escalated for that reason."""
+        with self._lock:
+            entry = self._tier(tier)
+            entry["attempts"] += 1
+            if reason is None:
+                entry["served"] += 1
+            else:
+                entry["escalations"][reason] = entry["escalations"].get(reason, 0) + 1
+            if seconds is not None:
+                entry["seconds"].append(seconds)
+
+    @contextmanager
+    def timed(self, tier: str) -> Iterator[None]:
+        """Records the enclosed call as served by the tier, or as an error if it raises."""
+        started = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.record(tier, time.perf_counter() - started, reason="error")
+            raise
+        self.record(tier, time.perf_counter() - started)
+
+    def summary(self) -> Dict[str, Dict]:
+        """Per tier: attempts, served, hit rate, escalations by reason and p50/p95 latency in ms."""
+        with self._lock:
+            # record() mutates escalations and seconds in place, so both are copied here
+            tiers = {tier: ({**entry, "escalations": dict(entry["escalations"])}, list(entry["seconds"]))
+                     for tier, entry in self._tiers.items()}
+        summary = {}
+        for tier, (entry, seconds) in tiers.items():
+            seconds.sort()
+            summary[tier] = {
+                "attempts": entry["attempts"],
+                "served": entry["served"],
+                "hit_rate": round(entry["served"] / entry["attempts"], 4) if entry["attempts"] else None,
+                "escalations": entry["escalations"],
+                "p50_ms": _percentile_ms(seconds, 50),
+                "p95_ms": _percentile_ms(seconds, 95),
+            }
+        return summary
+
+    def reset(self) -> None:
+        with self._lock:
+            self._tiers.clear()
+
+def _percentile_ms(ordered: List[float], q: float) -> Optional[float]:
+    if not ordered:
+        return None
+    rank = max(1, -(-len(ordered) * q // 100))  # nearest rank
+    return round(ordered[int(rank) - 1] * 1000, 1)
+
+# Process-wide stats, shared by every BillParserAgent
+cascade_stats = CascadeStats()
@@ -0,0 +1,284 @@
+import os
+import re
+import json
+import sqlite3
+import difflib
+import threading
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+DEFAULT_CONTACTS_PATH = "contacts.json"
+DEFAULT_CONTACTS_DB_PATH = os.path.join(".cache", "contacts.sqlite3")
+# Country calling code assumed for numbers written without one (e.g. 469.882.5794)
+DEFAULT_COUNTRY_CODE = os.environ.get("CONTACTS_DEFAULT_COUNTRY_CODE", "1")
+# Bumped whenever the index layout or the normalization rules change
+SCHEMA_VERSION = 1
+FUZZY_CUTOFF = 0.85
+
+class Contact(NamedTuple):
+    name: str
+    phone: Optional[str]  # E.164, e.g. +14698825794
+    email: Optional[str]
+
+def normalize_phone(raw: Optional[str], country_code: str = DEFAULT_COUNTRY_CODE) -> Optional[str]:
+    """
+    Normalizes a phone number to E.164 ("+<country><number>").
+
+    Accepts the formats seen in bills and contacts.json: 469.882.5794,
+    (469) 882-5794, 1-469-882-5794, +1 469 882 5794, 00 44 20 7946 0958.
+    Returns None if the input does not look like a phone number.
+    """
+    if not raw:
+        return None
+    raw = raw.strip()
+    digits = re.sub(r"\D", "", raw)
+    if raw.startswith("+"):
+        pass
+    elif digits.startswith("00"):
+        digits = digits[2:]
+    elif len(digits) == 10 and country_code == "1":
+        digits = "1" + digits
+    elif len(digits) == 11 and country_code == "1" and digits.startswith("1"):
+        pass
+    elif digits.startswith("0"):
+        # National format with a trunk prefix
+        digits = country_code + digits[1:]
+    else:
+        digits = country_code + digits
+    if not 8 <= len(digits) <= 15:
+        return None
+    return "+" + digits
+
+def name_keys(name: Optional[str]) -> List[str]:
+    """
+    Lookup keys for a name: the normalized name, the name without any
+    parenthesized note ("Jayashree (NEW LINE)" -> "JAYASHREE") and the sorted
+    tokens, so "RAVI ANANDRAJ" finds "Anandraj Ravi".
+    """
+    if not name:
+        return []
+    keys = []
+    for variant in (name, re.sub(r"\(.*?\)", " ", name)):
+        tokens = re.findall(r"[A-Z0-9]+", variant.upper())
+        if tokens:
+            keys.append(" ".join(tokens))
+            keys.append(" ".join(sorted(tokens)))
+    return list(dict.fromkeys(keys))
+
+def _tokens(name: str) -> List[str]:
+    return list(dict.fromkeys(re.findall(r"[A-Z0-9]+", name.upper())))
+
+class ContactsStore:
+    """
+    Indexed view of contacts.json (a list of {name, phone, email_id}).
+
+    The JSON is compiled into a SQLite index with phones normalized to E.164,
+    emails lower-cased and several name keys per contact. The index is rebuilt
+    only when the JSON's mtime or size changes, so startup costs one stat() and
+    each lookup is a primary-key probe, even for very large address books.
+    """
+
+    def __init__(self, json_path: Optional[str] = None, db_path: Optional[str] = None):
+        self.json_path = os.path.abspath(json_path or os.environ.get("CONTACTS_PATH", DEFAULT_CONTACTS_PATH))
+        self.db_path = os.path.abspath(db_path or os.environ.get("CONTACTS_DB_PATH", DEFAULT_CONTACTS_DB_PATH))
+        self._lock = threading.Lock()
+        self._stamp = None
+
+    def _connect(self) -> sqlite3.Connection:
+        # A connection per operation keeps the store safe to use from batch worker threads
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def _source_stamp(self) -> Optional[str]:
+        try:
+            st = os.stat(self.json_path)
+        except FileNotFoundError:
+            return None
+        return f"{SCHEMA_VERSION}:{self.json_path}:{st.st_mtime_ns}:{st.st_size}"
+
+    def _compiled_stamp(self) -> Optional[str]:
+        if not os.path.exists(self.db_path):
+            return None
+        try:
+            with self._connect() as conn:
+                row = conn.execute("SELECT value FROM meta WHERE key = 'source'").fetchone()
+        except sqlite3.DatabaseError:
+            return None
+        return row[0] if row else None
+
+    def refresh(self) -> bool:
+        """Rebuilds the index if contacts.json changed. Returns True if it was rebuilt."""
+        stamp = self._source_stamp()
+        if stamp is not None and stamp == self._stamp:
+            return False
+        with self._lock:
+            if stamp is None:
+                self._stamp = None
+                return False
+            if stamp == self._compiled_stamp():
+                self._stamp = stamp
+                return False
+            self._compile(stamp)
+            self._stamp = stamp
+            return True
+
+    def _compile(self, stamp: str) -> None:
+        with open(self.json_path, "r") as f:
+            raw_contacts = json.load(f)
+        if not isinstance(raw_contacts, list):
+            # Legacy formats are not indexed
+            print(f"Warning: {self.json_path} is not a list of contacts.")
+            raw_contacts = []
+
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Build next to the live index and swap it in, so readers never see a half-built one
+        tmp_path = f"{self.db_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        conn = sqlite3.connect(tmp_path)
+        try:
+            conn.executescript(
+                "CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);"
+                "CREATE TABLE contacts (id INTEGER PRIMARY KEY, name TEXT, phone TEXT, email TEXT);"
+                "CREATE TABLE phones (phone TEXT PRIMARY KEY, contact_id INTEGER) WITHOUT ROWID;"
+                "CREATE TABLE emails (email TEXT PRIMARY KEY, contact_id INTEGER) WITHOUT ROWID;"
+                "CREATE TABLE names (name_key TEXT, contact_id INTEGER, PRIMARY KEY (name_key, contact_id)) WITHOUT ROWID;"
+                "CREATE TABLE tokens (token TEXT, contact_id INTEGER, PRIMARY KEY (token, contact_id)) WITHOUT ROWID;"
+            )
+            rows, phones, emails, names, tokens = [], [], [], [], []
+            for i, c in enumerate(raw_contacts):
+                if not isinstance(c, dict):
+                    continue
+                name = c.get("name") or ""
+                phone = normalize_phone(c.get("phone"))
+                email = (c.get("email_id") or "").strip() or None
+                rows.append((i, name, phone, email))
+                if phone:
+                    phones.append((phone, i))
+                if email:
+                    emails.append((email.lower(), i))
+                names.extend((key, i) for key in name_keys(name))
+                tokens.extend((token, i) for token in _tokens(name))
+            conn.executemany("INSERT INTO contacts VALUES (?, ?, ?, ?)", rows)
+            # First entry wins when a phone or email is listed twice
+            conn.executemany("INSERT OR IGNORE INTO phones VALUES (?, ?)", phones)
+            conn.executemany("INSERT OR IGNORE INTO emails VALUES (?, ?)", emails)
+            conn.executemany("INSERT OR IGNORE INTO names VALUES (?, ?)", names)
+            conn.executemany("INSERT OR IGNORE INTO tokens VALUES (?, ?)", tokens)
+            conn.execute("INSERT INTO meta VALUES ('source', ?)", (stamp,))
+            conn.commit()
+        finally:
+            conn.close()
+        os.replace(tmp_path, self.db_path)
+
+    def count(self) -> int:
+        self.refresh()
+        if self._stamp is None:
+            return 0
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM contacts").fetchone()[0]
+
+    @staticmethod
+    def _contact(conn: sqlite3.Connection, contact_id: Optional[int]) -> Optional[Contact]:
+        if contact_id is None:
+            return None
+        row = conn.execute("SELECT name, phone, email FROM contacts WHERE id = ?", (contact_id,)).fetchone()
+        return Contact(*row) if row else None
+
+    def _by_phone(self, conn: sqlite3.Connection, phone: Optional[str]) -> Optional[Contact]:
+        e164 = normalize_phone(phone)
+        if not e164:
+            return None
+        row = conn.execute("SELECT contact_id FROM phones WHERE phone = ?", (e164,)).fetchone()
+        return self._contact(conn, row[0] if row else None)
+
+    def _by_email(self, conn: sqlite3.Connection, email: Optional[str]) -> Optional[Contact]:
+        if not email:
+            return None
+        row = conn.execute("SELECT contact_id FROM emails WHERE email = ?", (email.strip().lower(),)).fetchone()
+        return self._contact(conn, row[0] if row else None)
+
+    def _by_name(self, conn: sqlite3.Connection, name: Optional[str], fuzzy: bool = True) -> Optional[Contact]:
+        keys = name_keys(name)
+        for key in keys:
+            ids = [r[0] for r in conn.execute("SELECT contact_id FROM names WHERE name_key = ? LIMIT 2", (key,))]
+            if len(ids) == 1:
+                return self._contact(conn, ids[0])
+            if ids:
+                return None  # ambiguous
+        if not fuzzy or not keys:
+            return None
+
+        # Score only the contacts that share a name token with the query
+        query_tokens = _tokens(name)
+        marks = ",".join("?" * len(query_tokens))
+        candidates = conn.execute(
+            f"SELECT DISTINCT c.id, c.name FROM tokens t JOIN contacts c ON c.id = t.contact_id WHERE t.token IN ({marks})",
+            query_tokens
+        ).fetchall()
+        query = " ".join(sorted(query_tokens))
+        scored = sorted(
+            ((difflib.SequenceMatcher(None, query, " ".join(sorted(_tokens(candidate)))).ratio(), contact_id)
+             for contact_id, candidate in candidates),
+            reverse=True
+        )
+        if not scored or scored[0][0] < FUZZY_CUTOFF:
+            return None
+        if len(scored) > 1 and scored[1][0] == scored[0][0]:
+            return None  # ambiguous
+        return self._contact(conn, scored[0][1])
+
+    def lookup(self, phone: Optional[str] = None, email: Optional[str] = None, name: Optional[str] = None,
+               fuzzy: bool = True) -> Optional[Contact]:
+        """Finds a contact by phone, then email, then (fuzzy) name."""
+        self.refresh()
+        if self._stamp is None:
+            return None
+        with self._connect() as conn:
+            return (self._by_phone(conn, phone) or self._by_email(conn, email)
+                    or self._by_name(conn, name, fuzzy))
+
+    def user_map(self, user_charges: Iterable[dict]) -> Dict[str, str]:
+        """
+        Maps each bill line to an email for SplitCalculatorAgent: keyed by the
+        line's phone number exactly as the parser wrote it, or by its name for
+        lines that only matched by name.
+        """
+        self.refresh()
+        result: Dict[str, str] = {}
+        if self._stamp is None:
+            return result
+        with self._connect() as conn:
+            for user in user_charges:
+                phone, name = user.get("phone_number"), user.get("name")
+                contact = self._by_phone(conn, phone)
+                if contact and contact.email:
+                    result[phone] = contact.email
+                    continue
+                contact = self._by_name(conn, name)
+                if contact and contact.email and name:
+                    result[name] = contact.email
+        return result
+
+    def phones_for(self, emails: Iterable[str]) -> Dict[str, str]:
+        """Maps emails (split keys) to E.164 phone numbers for the notifier."""
+        self.refresh()
+        result: Dict[str, str] = {}
+        if self._stamp is None:
+            return result
+        with self._connect() as conn:
+            for email in emails:
+                contact = self._by_email(conn, email)
+                if contact and contact.phone:
+                    result[email] = contact.phone
+        return result
+
+_stores_lock = threading.Lock()
+_stores: Dict[tuple, ContactsStore] = {}
+
+def get_contacts_store(json_path: Optional[str] = None, db_path: Optional[str] = None) -> ContactsStore:
+    """Returns the process-wide store for a contacts file."""
+    store = ContactsStore(json_path, db_path)
+    key = (store.json_path, store.db_path)
+    with _stores_lock:
+        return _stores.setdefault(key, store)
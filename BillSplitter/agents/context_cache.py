@@ -0,0 +1,74 @@
+import os
+import time
+import hashlib
+import threading
+from typing import Dict, Optional, Tuple
+from agents import resilience
+
+DEFAULT_TTL_SECONDS = int(os.environ.get("BILL_PARSER_CONTEXT_CACHE_TTL", 3600))
+# Caches are recreated this long before they expire, so no request races the expiry
+RENEW_MARGIN_SECONDS = 60
+
+class ContextCache:
+    """
+    Gemini context caches for the static part of a prompt.
+
+    The first request for a (model, instructions) pair creates an explicit
+    cache holding the instructions as its system instruction; later requests
+    reference it by name and are billed the cached rate for those tokens.
+    Caches are renewed shortly before their TTL runs out. If the model or the
+    account can't cache the prefix (e.g. it is below the model's minimum
+    cacheable size), that is remembered for one TTL and callers send the
+    instructions inline as usual.
+    """
+
+    def __init__(self, ttl_seconds: int = DEFAULT_TTL_SECONDS, client=None):
+        self.ttl_seconds = ttl_seconds
+        self._client = client
+        self._lock = threading.Lock()
+        # (model, instructions hash) -> (cache name or None if unavailable, valid until)
+        self._entries: Dict[Tuple[str, str], Tuple[Optional[str], float]] = {}
+
+    @property
+    def client(self):
+        if self._client is None:
+            from google import genai
+            self._client = genai.Client()
+        return self._client
+
+    def name_for(self, model_name: str, instructions: str) -> Optional[str]:
+        """Name of a live cache holding `instructions` for the model, or None to send them inline."""
+        key = (model_name, hashlib.sha256(instructions.encode("utf-8")).hexdigest())
+        with self._lock:
+            now = time.time()
+            entry = self._entries.get(key)
+            if entry is not None and now < entry[1] - (RENEW_MARGIN_SECONDS if entry[0] else 0):
+                return entry[0]
+            name = self._create(model_name, instructions)
+            self._entries[key] = (name, now + self.ttl_seconds)
+            return name
+
+    def _create(self, model_name: str, instructions: str) -> Optional[str]:
+        from google.genai import types
+        config = types.CreateCachedContentConfig(
+            display_name="bill-splitter-instructions",
+            system_instruction=instructions,
+            ttl=f"{self.ttl_seconds}s",
+        )
+        try:
+            cache = resilience.call("gemini", self.client.caches.create, model=model_name, config=config)
+        except Exception as e:
+            print(f"Warning: context caching unavailable for {model_name} ({e}); sending instructions inline.")
+            return None
+        return cache.name
+
+_shared_lock = threading.Lock()
+_shared: Optional[ContextCache] = None
+
+def get_context_cache() -> ContextCache:
+    """Returns the process-wide context cache registry."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = ContextCache()
+        return _shared
@@ -0,0 +1,67 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+from typing import Dict, Optional
+
+DEFAULT_LEDGER_PATH = os.path.join(".cache", "expense_ledger.sqlite3")
+
+class ExpenseLedger:
+    """
+    Local SQLite record of expenses already created in Splitwise.
+
+    Each expense is stored under an idempotency key derived from the bill
+    period, group, total and splits, so re-running a bill can detect that it
+    was already posted without calling Splitwise.
+    """
+
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path or os.environ.get("SPLITWISE_LEDGER_PATH", DEFAULT_LEDGER_PATH)
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS expenses ("
+                " idempotency_key TEXT PRIMARY KEY,"
+                " expense_id TEXT NOT NULL,"
+                " description TEXT,"
+                " created_at REAL NOT NULL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        # A connection per operation keeps the ledger safe to use from batch worker threads
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    @staticmethod
+    def make_key(period: str, group_name_filter: str, total_amount: float, splits: Dict[str, float]) -> str:
+        """Builds a stable key; amounts are compared in cents and emails case-insensitively."""
+        payload = {
+            "period": (period or "").strip(),
+            "group": group_name_filter.strip().lower(),
+            "total_cents": round(total_amount * 100),
+            "splits": sorted((email.strip().lower(), round(amount * 100)) for email, amount in splits.items()),
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Returns the recorded expense id for a key, or None."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT expense_id FROM expenses WHERE idempotency_key = ?", (key,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def record(self, key: str, expense_id, description: str = "") -> None:
+        """Stores the expense id created for a key."""
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO expenses (idempotency_key, expense_id, description, created_at) VALUES (?, ?, ?, ?)",
+                (key, str(expense_id), description, time.time())
+            )
+
+    def forget(self, key: str) -> None:
+        """Removes a key, e.g. after the expense was deleted in Splitwise."""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM expenses WHERE idempotency_key = ?", (key,))
@@ -0,0 +1,142 @@
+import io
+import os
+from typing import Optional, Tuple
+from pydantic import BaseModel
+from PIL import Image, ImageOps
+
+# Longest side of the image sent to the model. 1600 px is ~145 DPI across a
+# letter-size page, enough for the small print of per-line charge tables.
+DEFAULT_LONG_EDGE = int(os.environ.get("BILL_PARSER_IMAGE_LONG_EDGE", 1600))
+DEFAULT_JPEG_QUALITY = int(os.environ.get("BILL_PARSER_IMAGE_QUALITY", 80))
+# Part of the parse cache key for images; bump when the stage changes what the model sees
+IMAGE_PREPROCESS_VERSION = f"image-norm-v1:{DEFAULT_LONG_EDGE}:{DEFAULT_JPEG_QUALITY}"
+
+# The document is located on a thumbnail; this is its longest side
+_DETECT_EDGE = 512
+
+try:
+    # HEIC photos from iPhones need the optional pillow-heif plugin
+    from pillow_heif import register_heif_opener
+    register_heif_opener()
+except ImportError:
+    pass
+
+class ImagePreprocessResult(BaseModel):
+    """Normalized image to send to the model, plus what the stage saved."""
+    mime_type: str
+    data: bytes
+    original_size: Tuple[int, int]  # (width, height) as stored, before orientation
+    size: Tuple[int, int]
+    cropped: bool
+    scale: float  # output pixels per pixel of the photo (1.0 when not downscaled)
+    original_bytes: int
+    payload_bytes: int
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.original_bytes - self.payload_bytes
+
+    def summary(self) -> str:
+        width, height = self.size
+        crop = ", cropped" if self.cropped else ""
+        return (
+            f"sent {width}x{height} {self.mime_type}{crop}, "
+            f"{self.payload_bytes} bytes (saved {self.bytes_saved} bytes)"
+        )
+
+def _otsu_threshold(histogram) -> int:
+    """Gray level that best separates a 256-bin histogram into two classes."""
+    total = sum(histogram)
+    weighted_total = sum(i * count for i, count in enumerate(histogram))
+    weight = weighted = 0
+    best, best_level = -1.0, 127
+    for level, count in enumerate(histogram):
+        weight += count
+        if weight == 0 or weight == total:
+            continue
+        weighted += level * count
+        mean_low = weighted / weight
+        mean_high = (weighted_total - weighted) / (total - weight)
+        between = weight * (total - weight) * (mean_low - mean_high) ** 2
+        if between > best:
+            best, best_level = between, level
+    return best_level
+
+def find_document(image: Image.Image, min_fraction: float = 0.15, max_fraction: float = 0.92,
+                  margin: float = 0.01) -> Optional[Tuple[int, int, int, int]]:
+    """
+    Bounding box (left, top, right, bottom) of the paper in a grayscale photo,
+    or None if there is nothing worth cropping.
+
+    The paper is taken to be the bright region: pixels above the Otsu threshold,
+    bounded by the first and last rows and columns that are mostly bright. Boxes
+    covering less than `min_fraction` of the photo (probably not a page) or more
+    than `max_fraction` (already filled by the page) are ignored.
+    """
+    import numpy as np
+    thumb = image.copy()
+    thumb.thumbnail((_DETECT_EDGE, _DETECT_EDGE))
+    pixels = np.asarray(thumb)
+    bright = pixels > _otsu_threshold(thumb.histogram())
+
+    rows = np.flatnonzero(bright.mean(axis=1) > 0.5)
+    cols = np.flatnonzero(bright.mean(axis=0) > 0.5)
+    if not len(rows) or not len(cols):
+        return None
+    top, bottom, left, right = rows[0], rows[-1] + 1, cols[0], cols[-1] + 1
+    fraction = (bottom - top) * (right - left) / bright.size
+    if not min_fraction <= fraction <= max_fraction:
+        return None
+
+    scale_x, scale_y = image.width / thumb.width, image.height / thumb.height
+    pad_x, pad_y = margin * image.width, margin * image.height
+    return (
+        max(0, int(left * scale_x - pad_x)),
+        max(0, int(top * scale_y - pad_y)),
+        min(image.width, int(right * scale_x + pad_x + 0.5)),
+        min(image.height, int(bottom * scale_y + pad_y + 0.5)),
+    )
+
+def preprocess_image(file_path: str, long_edge: int = DEFAULT_LONG_EDGE, quality: int = DEFAULT_JPEG_QUALITY,
+                     crop: bool = True) -> ImagePreprocessResult:
+    """
+    Normalizes a photographed or scanned bill before it is sent to the model.
+
+    Applies the EXIF orientation, converts to grayscale, crops to the page,
+    stretches the contrast, downscales so the longest side is at most
+    `long_edge` and re-encodes as JPEG. If that comes out larger than the
+    original file (small screenshots), the original is sent unchanged.
+    """
+    original_bytes = os.path.getsize(file_path)
+    with Image.open(file_path) as source:
+        original_size = source.size
+        original_format = source.format
+        # JPEG can decode the luma channel alone, which is all we keep
+        source.draft("L", source.size)
+        image = ImageOps.exif_transpose(source).convert("L")
+
+    box = find_document(image) if crop else None
+    if box is not None:
+        image = image.crop(box)
+    image = ImageOps.autocontrast(image, cutoff=1)
+    scale = 1.0
+    if max(image.size) > long_edge:
+        scale = long_edge / max(image.size)
+        image = image.resize((max(1, round(image.width * scale)), max(1, round(image.height * scale))),
+                             Image.Resampling.LANCZOS)
+
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=quality, optimize=True)
+    data = buffer.getvalue()
+    if len(data) >= original_bytes:
+        with open(file_path, "rb") as f:
+            data = f.read()
+        mime_type = Image.MIME.get(original_format, "application/octet-stream")
+        return ImagePreprocessResult(
+            mime_type=mime_type, data=data, original_size=original_size, size=original_size,
+            cropped=False, scale=1.0, original_bytes=original_bytes, payload_bytes=len(data)
+        )
+    return ImagePreprocessResult(
+        mime_type="image/jpeg", data=data, original_size=original_size, size=image.size,
+        cropped=box is not None, scale=scale, original_bytes=original_bytes, payload_bytes=len(data)
+    )
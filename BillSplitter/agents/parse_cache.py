@@ -0,0 +1,132 @@
+import os
+import json
+import time
+import hashlib
+from typing import Optional
+
+DEFAULT_CACHE_DIR = os.path.join(".cache", "bill_parser")
+
+class ParseCache:
+    """
+    Content-addressed on-disk cache for parsed bills.
+
+    Entries are keyed by the SHA-256 of the bill file bytes, the model name and
+    the prompt/format instructions, and store the validated BillData as JSON.
+    Old entries are evicted by age, then by total size / entry count (oldest first).
+    """
+
+    def __init__(self,
+                 cache_dir: Optional[str] = None,
+                 max_entries: int = 512,
+                 max_bytes: int = 64 * 1024 * 1024,
+                 max_age_seconds: Optional[float] = 90 * 24 * 3600):
+        self.cache_dir = cache_dir or os.environ.get("BILL_PARSER_CACHE_DIR", DEFAULT_CACHE_DIR)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+
+    @staticmethod
+    def hash_file(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+        """Returns the SHA-256 hex digest of a file, read in chunks."""
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    @staticmethod
+    def make_key(file_digest: str, model_name: str, prompt: str) -> str:
+        """Combines the file digest, model name and prompt text into a cache key."""
+        prompt_digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        return hashlib.sha256(f"{file_digest}:{model_name}:{prompt_digest}".encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key: str) -> Optional[dict]:
+        """Returns the cached BillData dict for a key, or None on a miss / expired entry."""
+        path = self._path(key)
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return None
+
+        if self.max_age_seconds is not None and time.time() - mtime > self.max_age_seconds:
+            self._remove(path)
+            return None
+
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            # Corrupt or partially written entry - treat as a miss
+            self._remove(path)
+            return None
+
+        # Touch so eviction drops the least recently used entries first
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        return data
+
+    def put(self, key: str, data: dict) -> None:
+        """Stores a BillData dict under a key and evicts old entries if over budget."""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+        self.evict()
+
+    def evict(self) -> int:
+        """Removes expired entries, then the oldest ones until within size limits. Returns count removed."""
+        if not os.path.isdir(self.cache_dir):
+            return 0
+
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        removed = 0
+        now = time.time()
+        if self.max_age_seconds is not None:
+            fresh = []
+            for entry in entries:
+                if now - entry[0] > self.max_age_seconds:
+                    removed += self._remove(entry[2])
+                else:
+                    fresh.append(entry)
+            entries = fresh
+
+        entries.sort()  # Oldest first
+        total_bytes = sum(size for _, size, _ in entries)
+        while entries and (len(entries) > self.max_entries or total_bytes > self.max_bytes):
+            _, size, path = entries.pop(0)
+            total_bytes -= size
+            removed += self._remove(path)
+        return removed
+
+    def clear(self) -> None:
+        """Removes every cached entry."""
+        if not os.path.isdir(self.cache_dir):
+            return
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".json"):
+                self._remove(os.path.join(self.cache_dir, name))
+
+    @staticmethod
+    def _remove(path: str) -> int:
+        try:
+            os.remove(path)
+            return 1
+        except OSError:
+            return 0
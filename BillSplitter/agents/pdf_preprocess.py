@@ -0,0 +1,106 @@
+import io
+import os
+import re
+from typing import List, Optional
+from pydantic import BaseModel
+from pypdf import PdfReader, PdfWriter
+
+# e.g. 469.882.5794, (469) 882-5794, +1 469 882 5794
+PHONE_PATTERN = re.compile(r"(?:\+?1[\s.\-]?)?\(?\b\d{3}\)?[\s.\-]?\d{3}[\s.\-]\d{4}\b")
+AMOUNT_PATTERN = re.compile(r"-?\$\s?-?\d[\d,]*\.\d{2}")
+
+class PreprocessResult(BaseModel):
+    """Payload to send to the model, plus what the pruning saved."""
+    mime_type: str
+    data: Optional[bytes] = None  # Pruned PDF bytes (None when sending text only)
+    text: Optional[str] = None    # Extracted text layer of the kept pages
+    pages_total: int
+    pages_kept: List[int]         # 0-based page indices
+    original_bytes: int
+    payload_bytes: int
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.original_bytes - self.payload_bytes
+
+    @property
+    def pages_saved(self) -> int:
+        return self.pages_total - len(self.pages_kept)
+
+    def summary(self) -> str:
+        mode = "text" if self.text is not None else "pdf"
+        return (
+            f"sent {len(self.pages_kept)}/{self.pages_total} pages as {mode}, "
+            f"{self.payload_bytes} bytes (saved {self.bytes_saved} bytes, {self.pages_saved} pages)"
+        )
+
+def is_charge_page(text: str, min_amounts: int = 2) -> bool:
+    """A page with at least one phone number and a few dollar amounts (per-line charge tables)."""
+    return bool(PHONE_PATTERN.search(text)) and len(AMOUNT_PATTERN.findall(text)) >= min_amounts
+
+def select_pages(texts: List[str]) -> List[int]:
+    """Indices of the pages worth sending: the first (summary) page and every charge page."""
+    return [i for i, text in enumerate(texts) if i == 0 or is_charge_page(text)]
+
+def extract_page_texts(reader: PdfReader) -> List[str]:
+    texts = []
+    for page in reader.pages:
+        try:
+            texts.append(page.extract_text() or "")
+        except Exception:
+            # Broken content streams shouldn't stop the bill from being parsed
+            texts.append("")
+    return texts
+
+def preprocess_pdf(file_path: str, prefer_text: bool = True, min_text_chars: int = 200,
+                   reader: Optional[PdfReader] = None, texts: Optional[List[str]] = None) -> PreprocessResult:
+    """
+    Prunes a PDF bill down to the pages that matter before it is sent to the model.
+
+    Keeps the first page (account summary: totals and billing period) and every
+    page that looks like a per-line charge table. When the text layer of the kept
+    pages is good enough (every kept page has text, enough characters overall),
+    only that text is sent; otherwise a smaller PDF with just those pages is built.
+    If no charge pages are found the original file is sent unchanged.
+    An already opened reader and its page texts can be passed to avoid re-reading.
+    """
+    original_bytes = os.path.getsize(file_path)
+    if reader is None:
+        reader = PdfReader(file_path)
+    if texts is None:
+        texts = extract_page_texts(reader)
+    pages_total = len(texts)
+
+    kept = select_pages(texts)
+    if pages_total == 0 or len(kept) <= 1:
+        with open(file_path, "rb") as f:
+            data = f.read()
+        return PreprocessResult(
+            mime_type="application/pdf", data=data, pages_total=pages_total,
+            pages_kept=list(range(pages_total)), original_bytes=original_bytes, payload_bytes=len(data)
+        )
+
+    kept_texts = [texts[i] for i in kept]
+    text_is_good = all(t.strip() for t in kept_texts) and sum(len(t) for t in kept_texts) >= min_text_chars
+    if prefer_text and text_is_good:
+        text = "\n".join(f"--- Page {i + 1} ---\n{texts[i]}" for i in kept)
+        return PreprocessResult(
+            mime_type="text/plain", text=text, pages_total=pages_total, pages_kept=kept,
+            original_bytes=original_bytes, payload_bytes=len(text.encode("utf-8"))
+        )
+
+    writer = PdfWriter()
+    for i in kept:
+        writer.add_page(reader.pages[i])
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    data = buffer.getvalue()
+    if len(data) >= original_bytes:
+        # Re-serializing can outweigh the pruning for small files
+        with open(file_path, "rb") as f:
+            data = f.read()
+        kept = list(range(pages_total))
+    return PreprocessResult(
+        mime_type="application/pdf", data=data, pages_total=pages_total, pages_kept=kept,
+        original_bytes=original_bytes, payload_bytes=len(data)
+    )
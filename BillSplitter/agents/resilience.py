@@ -0,0 +1,356 @@
+"""
+Retries, backoff, circuit breakers and deadlines for outbound calls.
+
+Every call to Gemini, the local model, Splitwise and Twilio goes through
+`call(service, fn)` (or `await acall(service, fn)` from async code):
+
+- transient failures (429, 408, 5xx, connection errors and timeouts) are
+  retried with exponential backoff and full jitter. A Retry-After header, in
+  seconds or as an HTTP date, overrides the computed delay;
+- each service has a circuit breaker. After `failure_threshold` calls in a
+  row fail with transient errors, further calls fail fast with
+  CircuitOpenError for `reset_timeout` seconds. Then one trial call is let
+  through, and it closes the breaker again if it succeeds;
+- retries never sleep past a deadline. A deadline is either the service
+  policy's per-call budget or one set around a whole bill with `deadline()`,
+  whichever comes first.
+
+Policies can be tuned per service with environment variables, e.g.
+RESILIENCE_SPLITWISE_MAX_ATTEMPTS=6 or RESILIENCE_TWILIO_FAILURE_THRESHOLD=10.
+"""
+import os
+import time
+import asyncio
+import random
+import threading
+import contextvars
+from contextlib import contextmanager
+from dataclasses import dataclass, replace
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Dict, Iterator, Optional
+from agents import telemetry
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a service whose circuit breaker is open."""
+
+    def __init__(self, service: str, retry_in: float):
+        super().__init__(f"{service} circuit open (retry in {retry_in:.1f}s)")
+        self.service = service
+        self.retry_in = retry_in
+
+class DeadlineExceeded(Exception):
+    """Raised when a call is attempted after its deadline has passed."""
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    max_attempts: int = 4
+    base_delay: float = 0.5  # seconds before the first retry (before jitter)
+    max_delay: float = 30.0
+    max_retry_after: float = 120.0  # cap on a server supplied Retry-After
+    call_timeout: Optional[float] = None  # budget for one call including its retries (see request_timeout)
+    failure_threshold: int = 5  # consecutive failed calls that open the breaker
+    reset_timeout: float = 30.0  # seconds the breaker stays open
+
+    def backoff(self, attempt: int) -> float:
+        """Delay before retry number `attempt` (0-based): exponential with full jitter."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+DEFAULT_POLICY = RetryPolicy()
+
+# Gemini parses are slow and paid, Splitwise rate limits per user, Twilio paces per sender
+SERVICE_POLICIES: Dict[str, RetryPolicy] = {
+    "gemini": RetryPolicy(max_attempts=3, base_delay=2.0, max_delay=30.0, call_timeout=300.0),
+    "splitwise": RetryPolicy(max_attempts=5, base_delay=0.5, max_delay=30.0, call_timeout=120.0),
+    "twilio": RetryPolicy(max_attempts=4, base_delay=0.5, max_delay=8.0, call_timeout=60.0),
+    "mcp": RetryPolicy(max_attempts=3, base_delay=0.5, max_delay=5.0),
+    # The local model of the extraction cascade is not retried: a failure escalates to Gemini
+    "ollama": RetryPolicy(max_attempts=1, call_timeout=120.0, failure_threshold=3, reset_timeout=60.0),
+}
+
+def policy_for(service: str) -> RetryPolicy:
+    """The service's policy with RESILIENCE_<SERVICE>_<FIELD> environment overrides applied."""
+    policy = SERVICE_POLICIES.get(service, DEFAULT_POLICY)
+    overrides = {}
+    for field, kind in (("max_attempts", int), ("base_delay", float), ("max_delay", float),
+                        ("call_timeout", float), ("failure_threshold", int), ("reset_timeout", float)):
+        value = os.environ.get(f"RESILIENCE_{service.upper()}_{field.upper()}")
+        if value:
+            overrides[field] = kind(value)
+    return replace(policy, **overrides) if overrides else policy
+
+def status_code(e: BaseException) -> Optional[int]:
+    """HTTP status of an SDK exception (or of the exception it wraps), if it has one."""
+    seen = 0
+    while e is not None and seen < 5:
+        for attr in ("status_code", "http_status", "status", "code"):
+            value = getattr(e, attr, None)
+            # The Splitwise SDK stores the status as a 1-tuple
+            if isinstance(value, tuple):
+                value = value[0] if value else None
+            if isinstance(value, int) and 100 <= value < 600:
+                return value
+        response = getattr(e, "response", None)
+        value = getattr(response, "status_code", None)
+        if isinstance(value, int):
+            return value
+        e = e.__cause__
+        seen += 1
+    return None
+
+def retry_after(e: BaseException) -> Optional[float]:
+    """Seconds requested by a Retry-After header on the exception (or its response), if any."""
+    for source in (e, getattr(e, "response", None), e.__cause__):
+        headers = getattr(source, "http_headers", None) or getattr(source, "headers", None)
+        value = headers.get("Retry-After") if hasattr(headers, "get") else None
+        if not value:
+            continue
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            pass
+    return None
+
+def is_transient(e: BaseException) -> bool:
+    """Whether another attempt could succeed: rate limits, server errors, timeouts, dropped connections."""
+    status = status_code(e)
+    if status is not None:
+        return status in (408, 429) or status >= 500
+    from requests.exceptions import ConnectionError as RequestsConnectionError, Timeout
+    return isinstance(e, (ConnectionError, TimeoutError, RequestsConnectionError, Timeout))
+
+def _causes(e: BaseException):
+    """The exception and those it wraps (cause, context, urllib3's MaxRetryError.reason, first arg)."""
+    seen = []
+    while e is not None and len(seen) < 8 and all(e is not x for x in seen):
+        seen.append(e)
+        yield e
+        nxt = e.__cause__ or e.__context__ or getattr(e, "reason", None)
+        if nxt is None and e.args and isinstance(e.args[0], BaseException):
+            nxt = e.args[0]
+        e = nxt if isinstance(nxt, BaseException) else None
+
+def not_delivered(e: BaseException) -> bool:
+    """
+    Whether a non-idempotent request (e.g. a POST that creates something) can
+    be retried safely: it was rate limited (429) or never reached the server.
+    Timeouts, dropped connections and 5xx replies are not retried, because
+    the server may already have acted on the request.
+    """
+    if status_code(e) == 429:
+        return True
+    import httpx
+    from requests.exceptions import ConnectTimeout
+    from urllib3.exceptions import NewConnectionError
+    for cause in _causes(e):
+        if isinstance(cause, (ConnectionRefusedError, ConnectTimeout, NewConnectionError,
+                              httpx.ConnectError, httpx.ConnectTimeout)):
+            return True
+    return False
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker (closed -> open -> half-open -> closed)."""
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state(time.monotonic())
+
+    def _state(self, now: float) -> str:
+        if self._opened_at is None:
+            return self.CLOSED
+        if now - self._opened_at < self.reset_timeout:
+            return self.OPEN
+        return self.HALF_OPEN
+
+    def before_call(self) -> bool:
+        """
+        Raises CircuitOpenError unless a call may go ahead. Returns True if the
+        call is the half-open trial.
+        """
+        with self._lock:
+            now = time.monotonic()
+            state = self._state(now)
+            if state == self.CLOSED:
+                return False
+            if state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            retry_in = max(0.0, self.reset_timeout - (now - self._opened_at))
+        raise CircuitOpenError(self.name, retry_in)
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._trial_in_flight or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+    def release(self) -> None:
+        """Ends a call that neither succeeded nor failed transiently (e.g. a 400)."""
+        with self._lock:
+            self._trial_in_flight = False
+
+_breakers_lock = threading.Lock()
+_breakers: Dict[str, CircuitBreaker] = {}
+
+def get_breaker(service: str, policy: Optional[RetryPolicy] = None) -> CircuitBreaker:
+    """Returns the process-wide breaker for a service (created with the policy's thresholds)."""
+    with _breakers_lock:
+        breaker = _breakers.get(service)
+        if breaker is None:
+            policy = policy or policy_for(service)
+            breaker = _breakers[service] = CircuitBreaker(service, policy.failure_threshold, policy.reset_timeout)
+        return breaker
+
+def reset_breakers() -> None:
+    with _breakers_lock:
+        _breakers.clear()
+
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("bill_splitter_deadline", default=None)
+
+@contextmanager
+def deadline(seconds: Optional[float]) -> Iterator[None]:
+    """Bounds every call made inside the block (including retries) to `seconds` from now."""
+    if seconds is None:
+        yield
+        return
+    current = _deadline.get()
+    until = time.monotonic() + seconds
+    token = _deadline.set(until if current is None else min(current, until))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+def remaining() -> Optional[float]:
+    """Seconds left before the current deadline, or None if there is none."""
+    until = _deadline.get()
+    return None if until is None else until - time.monotonic()
+
+def request_timeout(default: Optional[float] = None) -> Optional[float]:
+    """
+    Timeout for one outbound request: the time left before the deadline, or
+    `default` outside any deadline. Inside call()/acall() the deadline
+    includes the service policy's call_timeout, so a hung socket can't
+    outlive the call's budget.
+    """
+    left = remaining()
+    if left is None:
+        return default
+    return max(0.001, left)
+
+class _Attempts:
+    """Deadline, breaker and backoff bookkeeping shared by call() and acall()."""
+
+    def __init__(self, service: str, policy: Optional[RetryPolicy], classify: Callable[[BaseException], bool]):
+        self.service = service
+        self.policy = policy or policy_for(service)
+        self.classify = classify
+        self.breaker = get_breaker(service, self.policy)
+        self.until = _deadline.get()
+        if self.policy.call_timeout is not None:
+            call_until = time.monotonic() + self.policy.call_timeout
+            self.until = call_until if self.until is None else min(self.until, call_until)
+        self.span = telemetry.current_span()
+        self.trial = False
+
+    def begin(self, attempt: int) -> None:
+        if self.until is not None and time.monotonic() >= self.until:
+            raise DeadlineExceeded(f"{self.service} deadline exceeded after {attempt} attempt(s)")
+        self.trial = self.breaker.before_call()
+        if self.span is not None:
+            self.span.set(retries=attempt)
+
+    def succeeded(self) -> None:
+        self.breaker.record_success()
+
+    def failed(self, e: BaseException, attempt: int) -> Optional[float]:
+        """Seconds to wait before the next attempt, or None if the error should be raised."""
+        if not self.classify(e):
+            # classify only decides retries; a service that is failing still trips the breaker
+            if is_transient(e):
+                self.breaker.record_failure()
+            else:
+                self.breaker.release()
+            return None
+        delay = retry_after(e)
+        delay = min(delay, self.policy.max_retry_after) if delay is not None else self.policy.backoff(attempt)
+        last_attempt = attempt == self.policy.max_attempts - 1
+        # A failed half-open trial reopens the breaker straight away
+        if self.trial or last_attempt or (self.until is not None and time.monotonic() + delay >= self.until):
+            self.breaker.record_failure()
+            return None
+        # Retries of one call only count against the breaker once the call gives up
+        return delay
+
+def call(service: str, fn: Callable[..., Any], *args,
+         policy: Optional[RetryPolicy] = None,
+         classify: Callable[[BaseException], bool] = is_transient,
+         sleep: Callable[[float], None] = time.sleep,
+         **kwargs) -> Any:
+    """
+    Calls fn(*args, **kwargs) under the service's breaker, retrying transient
+    failures. Raises the last error, CircuitOpenError or DeadlineExceeded.
+    The number of retries is recorded on the current telemetry span.
+    """
+    attempts = _Attempts(service, policy, classify)
+    for attempt in range(attempts.policy.max_attempts):
+        attempts.begin(attempt)
+        token = _deadline.set(attempts.until)
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            delay = attempts.failed(e, attempt)
+            if delay is None:
+                raise
+            sleep(delay)
+            continue
+        finally:
+            _deadline.reset(token)
+        attempts.succeeded()
+        return result
+
+async def acall(service: str, fn: Callable[..., Awaitable[Any]], *args,
+                policy: Optional[RetryPolicy] = None,
+                classify: Callable[[BaseException], bool] = is_transient,
+                **kwargs) -> Any:
+    """Async call(): awaits fn(*args, **kwargs) and backs off with asyncio.sleep."""
+    attempts = _Attempts(service, policy, classify)
+    for attempt in range(attempts.policy.max_attempts):
+        attempts.begin(attempt)
+        token = _deadline.set(attempts.until)
+        try:
+            result = await fn(*args, **kwargs)
+        except Exception as e:
+            delay = attempts.failed(e, attempt)
+            if delay is None:
+                raise
+            await asyncio.sleep(delay)
+            continue
+        finally:
+            _deadline.reset(token)
+        attempts.succeeded()
+        return result
@@ -0,0 +1,92 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+# Result of a flight whose leader was cancelled
+_ABANDONED = object()
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key into one execution.
+
+    The first caller for a key (the leader) runs the work; callers that arrive
+    while it is in flight wait for the leader's result (or exception) instead
+    of repeating the work. Sync callers (threads) and async callers (tasks)
+    share the same flights, so a graph run on an event loop and one in a
+    worker thread can coalesce with each other. Nothing is cached once a
+    flight lands; the next call for the key starts a new one. A leader's
+    cancellation (e.g. a per-bill timeout) is not passed on: its followers
+    start a new flight instead.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights: Dict[Hashable, Future] = {}
+
+    def _join(self, key: Hashable):
+        """Returns (future, is_leader)."""
+        with self._lock:
+            future = self._flights.get(key)
+            if future is not None:
+                return future, False
+            future = self._flights[key] = Future()
+            return future, True
+
+    def _land(self, key: Hashable, future: Future) -> None:
+        with self._lock:
+            if self._flights.get(key) is future:
+                del self._flights[key]
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._flights)
+
+    def _abandon(self, key: Hashable, future: Future) -> None:
+        # The leader was cancelled: its followers were not, so they start a new flight
+        self._land(key, future)
+        future.set_result(_ABANDONED)
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """Runs fn() unless a call for key is already in flight, and returns its result."""
+        while True:
+            future, leader = self._join(key)
+            if not leader:
+                result = future.result()
+                if result is _ABANDONED:
+                    continue
+                return result
+            try:
+                result = fn()
+            except asyncio.CancelledError:
+                self._abandon(key, future)
+                raise
+            except BaseException as e:
+                self._land(key, future)
+                future.set_exception(e)
+                raise
+            self._land(key, future)
+            future.set_result(result)
+            return result
+
+    async def ado(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Async do(): awaits fn() unless a call for key is already in flight."""
+        while True:
+            future, leader = self._join(key)
+            if not leader:
+                result = await asyncio.wrap_future(future)
+                if result is _ABANDONED:
+                    continue
+                return result
+            try:
+                result = await fn()
+            except asyncio.CancelledError:
+                self._abandon(key, future)
+                raise
+            except BaseException as e:
+                self._land(key, future)
+                future.set_exception(e)
+                raise
+            self._land(key, future)
+            future.set_result(result)
+            return result
@@ -1,25 +1,131 @@
-from typing import Dict, List, Any
-from pydantic import BaseModel
+import math
+from fractions import Fraction
+from typing import Any, Callable, Dict, List, Optional
+from pydantic import BaseModel, PrivateAttr, computed_field, model_validator
 
 class SplitResult(BaseModel):
+    """
+    Shares per user. `details` (each user's individual charges, shared portion
+    and line items) is only built when it is first read or the result is
+    serialized; results built with `lazy()` carry a function that builds it.
+    """
     splits: Dict[str, float]
     total_bill: float
-    details: Dict[str, Any]
     description: str
+    _details: Optional[Dict[str, Any]] = PrivateAttr(default=None)
+    _build_details: Optional[Callable[[], Dict[str, Any]]] = PrivateAttr(default=None)
+
+    @model_validator(mode="wrap")
+    @classmethod
+    def _keep_details(cls, data, handler):
+        # details is computed, so it is taken out of the input and stored as given
+        details = None
+        if isinstance(data, dict) and "details" in data:
+            data = dict(data)  # the caller's dict keeps its details
+            details = data.pop("details")
+        result = handler(data)
+        if details is not None:
+            result._details = details
+        return result
+
+    @classmethod
+    def lazy(cls, build_details: Callable[[], Dict[str, Any]], **fields) -> "SplitResult":
+        result = cls(**fields)
+        result._build_details = build_details
+        return result
+
+    @computed_field
+    @property
+    def details(self) -> Dict[str, Any]:
+        if self._details is None:
+            self._details = self._build_details() if self._build_details else {}
+            self._build_details = None
+        return self._details
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, SplitResult):
+            return NotImplemented
+        return (self.splits, self.total_bill, self.description, self.details) == \
+               (other.splits, other.total_bill, other.description, other.details)
+
+ALLOCATION_ROUND = "round"
+ALLOCATION_LARGEST_REMAINDER = "largest_remainder"
+
+# Max difference (in cents) between the bill total and its line items that
+# largest-remainder allocation will absorb; matches the Splitwise MCP check.
+RECONCILE_TOLERANCE_CENTS = 5
+
+def allocate_cents(total_cents: int, weights: List[float]) -> List[int]:
+    """
+    Splits total_cents across weights with the largest-remainder method.
+
+    Each share gets the floor of its exact quota; the leftover cents go to the
+    largest fractional remainders, ties broken by position. The result always
+    sums to total_cents. Quotas are computed with exact fractions.
+    """
+    if not weights:
+        if total_cents:
+            raise ValueError("Cannot allocate a non-zero amount to no one.")
+        return []
+
+    fractions = [Fraction(w) for w in weights]
+    weight_sum = sum(fractions)
+    if weight_sum == 0:
+        raise ValueError("Allocation weights must not sum to zero.")
+
+    quotas = [Fraction(total_cents) * w / weight_sum for w in fractions]
+    shares = [math.floor(q) for q in quotas]
+    leftover = total_cents - sum(shares)
+    order = sorted(range(len(quotas)), key=lambda i: (shares[i] - quotas[i], i))
+    for i in order[:leftover]:
+        shares[i] += 1
+    return shares
 
 class SplitCalculatorAgent:
     def __init__(self):
         pass
 
-    def calculate_split(self, bill_data: dict, user_map: Dict[str, str] = None) -> SplitResult:
+    @staticmethod
+    def _key_for(user: dict, user_map: Dict[str, str] = None) -> str:
+        # Determine key (Email if map provided, else Name)
+        key = user.get("name")
+        if user_map:
+            phone = user.get("phone_number")
+            # Lines matched only by name (see ContactsStore.user_map) are keyed by name
+            email = (user_map.get(phone) if phone else None) or (user_map.get(key) if key else None)
+            if email:
+                key = email
+            # Otherwise keep the name, which is safer than dropping the line
+        return key
+
+    @staticmethod
+    def _weight_for(user: dict, key: str, shared_weights: Dict[str, float] = None) -> float:
+        if not shared_weights:
+            return 1.0
+        return shared_weights.get(key, shared_weights.get(user.get("name"), 1.0))
+
+    def calculate_split(self,
+                        bill_data: dict,
+                        user_map: Dict[str, str] = None,
+                        allocation: str = ALLOCATION_ROUND,
+                        shared_weights: Dict[str, float] = None) -> SplitResult:
         """
         Calculates the split based on bill data.
         
         Args:
             bill_data: The JSON output from BillParserAgent.
-            user_map: Optional mapping of User Name -> Email. 
+            user_map: Optional mapping of Phone (as written on the bill) or User Name -> Email.
                       If None, uses names found in bill.
+            allocation: "round" rounds each share to cents independently.
+                        "largest_remainder" allocates in integer cents so the
+                        splits sum exactly to total_amount.
+            shared_weights: Optional Key (email or name) -> weight for shared costs.
+                            Users not listed get weight 1 (equal division by default).
         """
+        if allocation == ALLOCATION_LARGEST_REMAINDER:
+            return self._calculate_largest_remainder(bill_data, user_map, shared_weights)
+        if allocation != ALLOCATION_ROUND:
+            raise ValueError(f"Unknown allocation mode: {allocation}")
         
         total_amount = bill_data.get("total_amount", 0.0)
         shared_costs = bill_data.get("shared_costs", [])
@@ -34,45 +140,104 @@ class SplitCalculatorAgent:
 
         num_users = len(active_users)
         shared_per_user = total_shared / num_users if num_users > 0 else 0
+        if shared_weights:
+            weights = [self._weight_for(u, self._key_for(u, user_map), shared_weights) for u in user_charges]
+            weight_sum = sum(weights)
         
         splits = {}
-        details = {}
+        rows = []
         
-        for user in user_charges:
-            name = user.get("name")
+        for i, user in enumerate(user_charges):
             user_total = user.get("total", 0.0)
+            key = self._key_for(user, user_map)
+
+            user_shared = shared_per_user
+            if shared_weights:
+                user_shared = total_shared * weights[i] / weight_sum if weight_sum else 0
             
             # Add shared portion
-            final_amount = user_total + shared_per_user
-            
-            # Determine key (Email if map provided, else Name)
-            key = name
-            if user_map:
-                phone = user.get("phone_number")
-                if phone:
-                    email = user_map.get(phone)
-                    if email:
-                        key = email
-                else:
-                    # Fallback or warning?
-                    # User requested using email_id. If missing, we might want to keep name or skip?
-                    # Keeping name is safer to avoid data loss.
-                    pass
+            final_amount = user_total + user_shared
 
             splits[key] = round(final_amount, 2)
-            details[key] = {
-                "individual_charges": user_total,
-                "shared_portion": round(shared_per_user, 2),
-                "items": user.get("items", [])
+            rows.append((key, user_total, user_shared, user))
+
+        def build_details():
+            # A later line with the same key replaces an earlier one, as splits does
+            return {
+                key: {"individual_charges": user_total, "shared_portion": round(user_shared, 2),
+                      "items": user.get("items", [])}
+                for key, user_total, user_shared, user in rows
             }
             
-        return SplitResult(
+        return SplitResult.lazy(
+            build_details,
             splits=splits,
             total_bill=total_amount,
-            details=details,
             description=f"Bill for {bill_data.get('period_start', '')} to {bill_data.get('period_end', '')}"
         )
 
+    def _calculate_largest_remainder(self, bill_data: dict, user_map: Dict[str, str] = None,
+                                     shared_weights: Dict[str, float] = None) -> SplitResult:
+        """
+        Integer-cent allocation. Individual charges are kept as-is (in cents);
+        the shared pool is whatever remains of total_amount and is divided by
+        weight with allocate_cents, so the splits sum exactly to the total.
+        Lines that map to the same key are added together.
+        """
+        total_amount = bill_data.get("total_amount", 0.0)
+        shared_costs = bill_data.get("shared_costs", [])
+        user_charges = bill_data.get("user_charges", [])
+
+        shared_cents = round(sum(item.get("amount", 0.0) for item in shared_costs) * 100)
+        individual_cents = [round(u.get("total", 0.0) * 100) for u in user_charges]
+        if total_amount:
+            total_cents = round(total_amount * 100)
+        else:
+            total_cents = sum(individual_cents) + shared_cents
+
+        # Shared pool absorbs sub-cent rounding between the total and its line items
+        pool_cents = total_cents - sum(individual_cents)
+        if abs(pool_cents - shared_cents) > RECONCILE_TOLERANCE_CENTS:
+            raise ValueError(
+                f"Bill total ({total_cents / 100:.2f}) does not reconcile with line items "
+                f"({(sum(individual_cents) + shared_cents) / 100:.2f})."
+            )
+
+        keys = [self._key_for(u, user_map) for u in user_charges]
+        weights = [self._weight_for(u, k, shared_weights) for u, k in zip(user_charges, keys)]
+        pool_shares = allocate_cents(pool_cents, weights)
+
+        split_cents = {}
+        for key, own, pooled in zip(keys, individual_cents, pool_shares):
+            split_cents[key] = split_cents.get(key, 0) + own + pooled
+
+        def build_details():
+            cents = {}
+            for user, key, own, pooled in zip(user_charges, keys, individual_cents, pool_shares):
+                entry = cents.setdefault(key, [0, 0, []])
+                entry[0] += own
+                entry[1] += pooled
+                entry[2].extend(user.get("items", []))
+            return {
+                key: {"individual_charges": own / 100, "shared_portion": pooled / 100, "items": items}
+                for key, (own, pooled, items) in cents.items()
+            }
+
+        return SplitResult.lazy(
+            build_details,
+            splits={key: cents / 100 for key, cents in split_cents.items()},
+            total_bill=total_amount,
+            description=f"Bill for {bill_data.get('period_start', '')} to {bill_data.get('period_end', '')}"
+        )
+
+    def calculate_splits_bulk(self, bills: List[dict], user_map: Dict[str, str] = None) -> List[SplitResult]:
+        """
+        Calculates splits for many bills in one columnar pass (see agents.split_engine).
+        Results are identical to calling calculate_split on each bill.
+        """
+        from agents.split_engine import calculate_splits_bulk
+        return calculate_splits_bulk(bills, user_map)
+
 if __name__ == "__main__":
     # Test stub
     sample_data = {
@@ -0,0 +1,123 @@
+"""
+Columnar split engine for large multi-line accounts.
+
+Computes the same shares as SplitCalculatorAgent.calculate_split, to the cent,
+for many bills at once: per-line arithmetic and rounding run as NumPy array
+operations over every line of every bill instead of a Python loop per user.
+"""
+from typing import Dict, List, Optional
+import numpy as np
+import pandas as pd
+from agents.split_calculator import SplitResult
+
+def round_2dp(values: np.ndarray) -> np.ndarray:
+    """
+    Vectorized equivalent of the builtin round(x, 2).
+
+    np.round(x, 2) computes rint(x * 100) / 100, which agrees with round()
+    except where x * 100 lands next to a .5 boundary (the multiplication can
+    nudge it across). Those few values are re-rounded with the builtin.
+    """
+    scaled = values * 100
+    rounded = np.round(values, 2)
+    near_tie = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    if near_tie.any():
+        rounded[near_tie] = [round(v, 2) for v in values[near_tie].tolist()]
+    return rounded
+
+def bills_to_frame(bills: List[dict]) -> pd.DataFrame:
+    """Flattens the user_charges of many bills into one DataFrame (one row per line)."""
+    bill_idx, names, phones, totals = [], [], [], []
+    for i, bill in enumerate(bills):
+        for user in bill.get("user_charges", []):
+            bill_idx.append(i)
+            names.append(user.get("name"))
+            phones.append(user.get("phone_number"))
+            totals.append(user.get("total", 0.0))
+    return pd.DataFrame({
+        "bill": np.asarray(bill_idx, dtype=np.int64),
+        "name": pd.Series(names, dtype=object),
+        "phone_number": pd.Series(phones, dtype=object),
+        "individual_charges": np.asarray(totals, dtype=np.float64),
+    })
+
+def compute_shares(bills: List[dict], user_map: Optional[Dict[str, str]] = None,
+                   lines: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    """
+    Computes every line's share for many bills in one pass.
+
+    Args:
+        bills: BillData dicts (only total/shared costs are read if `lines` is given).
+        user_map: Optional mapping of Phone (or Name) -> Email.
+        lines: Optional pre-built line frame (see bills_to_frame).
+
+    Returns:
+        DataFrame with one row per line: bill, key, amount, individual_charges, shared_portion.
+    """
+    if lines is None:
+        lines = bills_to_frame(bills)
+    bill_idx = lines["bill"].to_numpy()
+
+    # Shared totals use the builtin sum so float accumulation order matches calculate_split exactly
+    total_shared = np.array(
+        [sum(item.get("amount", 0.0) for item in bill.get("shared_costs", [])) for bill in bills],
+        dtype=np.float64
+    )
+    num_users = np.bincount(bill_idx, minlength=len(bills)).astype(np.float64)
+    shared_per_user = np.divide(total_shared, num_users, out=np.zeros_like(total_shared), where=num_users > 0)
+
+    line_shared = shared_per_user[bill_idx]
+    amounts = round_2dp(lines["individual_charges"].to_numpy() + line_shared)
+
+    # Key is the mapped email when the line has a known phone number (or name), else the name
+    keys = lines["name"]
+    if user_map:
+        phones = lines["phone_number"]
+        emails = phones.map(user_map)
+        has_email = phones.map(bool) & emails.map(bool, na_action="ignore").fillna(False).astype(bool)
+        by_name = keys.map(user_map)
+        has_name_email = ~has_email & by_name.map(bool, na_action="ignore").fillna(False).astype(bool)
+        keys = emails.where(has_email, by_name.where(has_name_email, keys))
+
+    return pd.DataFrame({
+        "bill": bill_idx,
+        "key": keys.to_numpy(),
+        "amount": amounts,
+        "individual_charges": lines["individual_charges"].to_numpy(),
+        "shared_portion": round_2dp(line_shared),
+    })
+
+def calculate_splits_bulk(bills: List[dict], user_map: Optional[Dict[str, str]] = None) -> List[SplitResult]:
+    """Returns one SplitResult per bill, identical to calling calculate_split on each."""
+    shares = compute_shares(bills, user_map)
+    bill_idx = shares["bill"].to_numpy()
+    # Row offsets of each bill's lines (rows are grouped by bill, in input order)
+    bounds = np.searchsorted(bill_idx, np.arange(len(bills) + 1))
+
+    keys = shares["key"].tolist()
+    amounts = shares["amount"].tolist()
+    individual = shares["individual_charges"].tolist()
+    shared_portion = shares["shared_portion"].tolist()
+
+    results = []
+    for i, bill in enumerate(bills):
+        start, end = bounds[i], bounds[i + 1]
+        users = bill.get("user_charges", [])
+        splits = dict(zip(keys[start:end], amounts[start:end]))
+
+        def build_details(start=start, end=end, users=users):
+            return {
+                keys[j]: {
+                    "individual_charges": individual[j],
+                    "shared_portion": shared_portion[j],
+                    "items": users[j - start].get("items", [])
+                }
+                for j in range(start, end)
+            }
+        results.append(SplitResult.lazy(
+            build_details,
+            splits=splits,
+            total_bill=bill.get("total_amount", 0.0),
+            description=f"Bill for {bill.get('period_start', '')} to {bill.get('period_end', '')}"
+        ))
+    return results
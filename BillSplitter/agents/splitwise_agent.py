@@ -1,19 +1,44 @@
+import os
 from typing import Dict, Any, Optional
 from splitwise_mcp.model import AddExpenseRequest, AddExpenseResponse
 from dotenv import load_dotenv
-# We import the function directly for now as per plan, 
+from agents import resilience
+from agents.expense_ledger import ExpenseLedger
+
+# We call the server function directly for now as per plan,
 # but in a real MCP setup this might be an RPC call.
-from splitwise_mcp.mcpServer import _add_expense_to_splitwise_logic as add_expense_to_splitwise
+def add_expense_to_splitwise(request: AddExpenseRequest) -> AddExpenseResponse:
+    # Imported on first use: the MCP server pulls in fastmcp and the Splitwise SDK
+    from splitwise_mcp.mcpServer import _add_expense_to_splitwise_logic
+    return _add_expense_to_splitwise_logic(request)
 
 class SplitwiseAgent:
-    def __init__(self):
-        pass
+    def __init__(self, ledger: Optional[ExpenseLedger] = None, use_ledger: bool = True,
+                 server_url: Optional[str] = None, remote=None):
+        self.ledger = (ledger or ExpenseLedger()) if use_ledger else None
+        # With a server URL (or SPLITWISE_MCP_URL) expenses are posted through a running
+        # MCP server over HTTP, which keeps its Splitwise client and group cache warm.
+        self.server_url = server_url or os.environ.get("SPLITWISE_MCP_URL")
+        self.remote = remote
+
+    def _post(self, req: AddExpenseRequest) -> AddExpenseResponse:
+        remote = self.remote
+        if remote is None and self.server_url:
+            from splitwise_mcp.remote import get_remote
+            remote = get_remote(self.server_url)
+        if remote is None:
+            return add_expense_to_splitwise(req)
+        # Only retried when the request never reached the server, so an expense can't be created twice
+        result = resilience.call("mcp", remote.call_tool, "add_expense_to_splitwise", {"request": req.model_dump()},
+                                 classify=resilience.not_delivered)
+        return AddExpenseResponse(**result)
 
     def add_expense(self, 
                     total_amount: float, 
                     description: str, 
                     splits: Dict[str, float], 
-                    group_name_filter: str = "at&t") -> Dict[str, Any]:
+                    group_name_filter: str = "at&t",
+                    period: Optional[str] = None) -> Dict[str, Any]:
         """
         Adds an expense to Splitwise using the MCP tool.
 
@@ -22,14 +47,24 @@ class SplitwiseAgent:
             description: Description for the expense.
             splits: Dictionary of Email -> Amount.
             group_name_filter: Group name to search for (default: "at&t").
+            period: Bill period used for the idempotency key (defaults to the description).
 
         Returns:
             Dict containing 'expense_id' on success, or 'error' on failure.
+            'duplicate' is True when the expense was already posted on a previous run.
         """
         
         # Validate inputs
         if not splits:
             return {"error": "No splits provided."}
+
+        # Skip the network entirely if this exact expense was already created
+        key = None
+        if self.ledger is not None:
+            key = ExpenseLedger.make_key(period or description, group_name_filter, total_amount, splits)
+            existing_id = self.ledger.get(key)
+            if existing_id:
+                return {"expense_id": existing_id, "duplicate": True}
             
         req = AddExpenseRequest(
             total_amount=total_amount,
@@ -39,8 +74,10 @@ class SplitwiseAgent:
         )
 
         try:
-            response: AddExpenseResponse = add_expense_to_splitwise(req)
+            response: AddExpenseResponse = self._post(req)
             if response.success:
+                if self.ledger is not None:
+                    self.ledger.record(key, response.expense_id, description)
                 return {"expense_id": response.expense_id}
             else:
                 return {"error": response.message}
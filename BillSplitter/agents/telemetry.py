@@ -0,0 +1,254 @@
+"""
+Lightweight tracing for the bill pipeline.
+
+Every graph node and external call (Gemini, each Splitwise SDK request, each
+Twilio message) runs inside a span that records wall time, bytes sent, LLM
+tokens and retries. Spans nest through a context variable, so everything that
+happens while a bill is processed shares the bill's trace id.
+
+Finished spans are kept in memory (bounded) by the module-level `tracer` and
+can be exported as JSON lines (one span per line, for log pipelines) or as an
+OTLP/JSON file that OpenTelemetry collectors and viewers can import.
+`bill_cost()` rolls a trace up into time, tokens and estimated cost.
+"""
+import os
+import json
+import time
+import inspect
+import secrets
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+# USD per million tokens for gemini-2.0-flash, and per WhatsApp message; override per contract
+LLM_INPUT_PRICE_PER_MTOK = float(os.environ.get("GEMINI_INPUT_PRICE_PER_MTOK", 0.10))
+LLM_OUTPUT_PRICE_PER_MTOK = float(os.environ.get("GEMINI_OUTPUT_PRICE_PER_MTOK", 0.40))
+# Input tokens served from a context cache (storage is billed separately per hour)
+LLM_CACHED_INPUT_PRICE_PER_MTOK = float(os.environ.get("GEMINI_CACHED_INPUT_PRICE_PER_MTOK", 0.025))
+TWILIO_PRICE_PER_MESSAGE = float(os.environ.get("TWILIO_PRICE_PER_MESSAGE", 0.005))
+
+KIND_NODE = "node"
+KIND_LLM = "llm"
+KIND_LOCAL_LLM = "local_llm"  # local model of the extraction cascade (not billed)
+KIND_SPLITWISE = "splitwise"
+KIND_TWILIO = "twilio"
+KIND_RUN = "run"
+
+class Span:
+    """One timed operation. Attributes are plain JSON values."""
+    __slots__ = ("name", "kind", "trace_id", "span_id", "parent_id", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, name: str, kind: str, trace_id: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.name = name
+        self.kind = kind
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = attributes
+        self.error: Optional[str] = None
+
+    def set(self, **attributes) -> None:
+        self.attributes.update(attributes)
+
+    def add(self, key: str, amount: float) -> None:
+        self.attributes[key] = self.attributes.get(key, 0) + amount
+
+    @property
+    def duration_seconds(self) -> float:
+        end_ns = self.end_ns if self.end_ns is not None else time.time_ns()
+        return (end_ns - self.start_ns) / 1e9
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "kind": self.kind,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_ms": round(self.duration_seconds * 1000, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+_current: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("bill_splitter_span", default=None)
+
+class Tracer:
+    """Collects finished spans (the most recent `max_spans`)."""
+
+    def __init__(self, max_spans: int = 50000):
+        self._lock = threading.Lock()
+        self._spans = deque(maxlen=max_spans)
+
+    def record(self, span: Span) -> None:
+        with self._lock:
+            self._spans.append(span)
+
+    def spans(self, trace_id: Optional[str] = None) -> List[Span]:
+        with self._lock:
+            spans = list(self._spans)
+        return [s for s in spans if trace_id is None or s.trace_id == trace_id]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._spans.clear()
+
+tracer = Tracer()
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+@contextmanager
+def span(name: str, kind: str = KIND_NODE, **attributes) -> Iterator[Span]:
+    """Times the enclosed block as a child of the current span (or as a new trace)."""
+    parent = _current.get()
+    trace_id = parent.trace_id if parent else secrets.token_hex(16)
+    current = Span(name, kind, trace_id, parent.span_id if parent else None, attributes)
+    token = _current.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current.reset(token)
+        current.end_ns = time.time_ns()
+        tracer.record(current)
+
+def _node_errors(node_span: Span, update) -> None:
+    errors = (update or {}).get("errors")
+    if errors:
+        node_span.error = "; ".join(errors)
+
+def traced_node(name: str, fn):
+    """Wraps a graph node (sync or async) so each call is recorded as a node span."""
+    if inspect.iscoroutinefunction(fn):
+        async def async_node(state):
+            with span(name, KIND_NODE) as node_span:
+                update = await fn(state)
+                _node_errors(node_span, update)
+                return update
+        async_node.__name__ = getattr(fn, "__name__", name)
+        async_node.__doc__ = fn.__doc__
+        return async_node
+
+    def node(state):
+        with span(name, KIND_NODE) as node_span:
+            update = fn(state)
+            _node_errors(node_span, update)
+            return update
+    node.__name__ = getattr(fn, "__name__", name)
+    node.__doc__ = fn.__doc__
+    return node
+
+def run_in_context(fn):
+    """Binds fn to the caller's context so spans in pool threads nest under the current span."""
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.run(fn, *args, **kwargs)
+
+def bill_cost(spans: List[Span]) -> Dict[str, Any]:
+    """Rolls the spans of one trace up into time, tokens, calls and estimated cost."""
+    llm = [s for s in spans if s.kind == KIND_LLM]
+    local_llm = [s for s in spans if s.kind == KIND_LOCAL_LLM]
+    splitwise = [s for s in spans if s.kind == KIND_SPLITWISE and s.name.startswith("splitwise.http")]
+    twilio = [s for s in spans if s.kind == KIND_TWILIO]
+    roots = [s for s in spans if s.parent_id is None]
+
+    input_tokens = sum(s.attributes.get("input_tokens", 0) for s in llm)
+    output_tokens = sum(s.attributes.get("output_tokens", 0) for s in llm)
+    # input_tokens includes the cached ones
+    cached_tokens = sum(s.attributes.get("cached_tokens", 0) for s in llm)
+    messages_sent = sum(1 for s in twilio if s.error is None and s.attributes.get("status") == "sent")
+    llm_cost = ((input_tokens - cached_tokens) * LLM_INPUT_PRICE_PER_MTOK + cached_tokens * LLM_CACHED_INPUT_PRICE_PER_MTOK
+                + output_tokens * LLM_OUTPUT_PRICE_PER_MTOK) / 1e6
+    twilio_cost = messages_sent * TWILIO_PRICE_PER_MESSAGE
+
+    return {
+        "wall_seconds": round(max((s.duration_seconds for s in roots), default=0.0), 3),
+        "llm_calls": len(llm),
+        "llm_seconds": round(sum(s.duration_seconds for s in llm), 3),
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "cached_tokens": cached_tokens,
+        "local_llm_calls": len(local_llm),
+        "local_llm_seconds": round(sum(s.duration_seconds for s in local_llm), 3),
+        "splitwise_calls": len(splitwise),
+        "splitwise_seconds": round(sum(s.duration_seconds for s in splitwise), 3),
+        "twilio_messages": messages_sent,
+        "twilio_seconds": round(sum(s.duration_seconds for s in twilio), 3),
+        "bytes_sent": sum(s.attributes.get("bytes_sent", 0) for s in spans),
+        "retries": sum(s.attributes.get("retries", 0) for s in spans),
+        "llm_cost_usd": round(llm_cost, 6),
+        "twilio_cost_usd": round(twilio_cost, 6),
+        "total_cost_usd": round(llm_cost + twilio_cost, 6),
+    }
+
+def format_cost(cost: Dict[str, Any]) -> str:
+    return (
+        f"${cost['total_cost_usd']:.4f} in {cost['wall_seconds']:.2f}s | "
+        f"LLM {cost['llm_calls']} calls, {cost['llm_seconds']:.2f}s, "
+        f"{cost['input_tokens']} in / {cost['output_tokens']} out tokens | "
+        f"Splitwise {cost['splitwise_calls']} calls, {cost['splitwise_seconds']:.2f}s | "
+        f"Twilio {cost['twilio_messages']} messages, {cost['twilio_seconds']:.2f}s | "
+        f"{cost['bytes_sent']} bytes sent, {cost['retries']} retries"
+    )
+
+def write_json_lines(path: str, spans: List[Span]) -> None:
+    """Appends one JSON object per span (structured logs)."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a") as f:
+        for s in spans:
+            f.write(json.dumps(s.to_dict()) + "\n")
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+# OTLP SpanKind: internal for nodes, client for calls to external services
+_OTLP_KIND = {KIND_LLM: 3, KIND_LOCAL_LLM: 3, KIND_SPLITWISE: 3, KIND_TWILIO: 3}
+
+def to_otlp(spans: List[Span], service_name: str = "bill-splitter") -> Dict[str, Any]:
+    """Builds an OTLP/JSON ExportTraceServiceRequest for the spans."""
+    otlp_spans = []
+    for s in spans:
+        attributes = [{"key": "bill_splitter.kind", "value": {"stringValue": s.kind}}]
+        attributes += [{"key": key, "value": _otlp_value(value)} for key, value in s.attributes.items() if value is not None]
+        otlp_span = {
+            "traceId": s.trace_id,
+            "spanId": s.span_id,
+            "name": s.name,
+            "kind": _OTLP_KIND.get(s.kind, 1),
+            "startTimeUnixNano": str(s.start_ns),
+            "endTimeUnixNano": str(s.end_ns or s.start_ns),
+            "attributes": attributes,
+            "status": {"code": 2, "message": s.error} if s.error else {"code": 1},
+        }
+        if s.parent_id:
+            otlp_span["parentSpanId"] = s.parent_id
+        otlp_spans.append(otlp_span)
+    return {"resourceSpans": [{
+        "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": service_name}}]},
+        "scopeSpans": [{"scope": {"name": "bill_splitter.telemetry"}, "spans": otlp_spans}],
+    }]}
+
+def write_otlp(path: str, spans: List[Span]) -> None:
+    """Appends the spans as one OTLP/JSON line (the OpenTelemetry collector file format)."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a") as f:
+        f.write(json.dumps(to_otlp(spans)) + "\n")
+
+def export_trace(trace_id: str, prefix: str) -> None:
+    """Writes one trace to <prefix>.jsonl and <prefix>.otlp.json."""
+    spans = tracer.spans(trace_id)
+    write_json_lines(f"{prefix}.jsonl", spans)
+    write_otlp(f"{prefix}.otlp.json", spans)
@@ -1,63 +1,150 @@
 import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
 load_dotenv()
 
-from twilio.rest import Client
-from typing import Dict, List
+from dataclasses import replace
+from typing import TYPE_CHECKING, Dict, List, Optional
+from agents import resilience, telemetry
+
+if TYPE_CHECKING:
+    # The Twilio SDK is imported when a client is actually built
+    from twilio.rest import Client
+
+def deadline_http_client():
+    """A Twilio HTTP client whose requests time out at the current resilience deadline."""
+    from twilio.http.http_client import TwilioHttpClient
+
+    class DeadlineHttpClient(TwilioHttpClient):
+        def request(self, *args, timeout=None, **kwargs):
+            if timeout is None:
+                timeout = resilience.request_timeout(resilience.policy_for("twilio").call_timeout)
+            return super().request(*args, timeout=timeout, **kwargs)
+
+    return DeadlineHttpClient()
+
+class TokenBucket:
+    """
+    Thread-safe token bucket. acquire() blocks until a token is available.
+
+    rate_per_second tokens are added continuously, up to `capacity` (the burst size).
+    """
+
+    def __init__(self, rate_per_second: float, capacity: Optional[float] = None):
+        self.rate = rate_per_second
+        self.capacity = capacity if capacity is not None else max(1.0, rate_per_second)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
 
 class WhatsAppNotifierAgent:
-    def __init__(self):
+    def __init__(self,
+                 client: Optional["Client"] = None,
+                 max_in_flight: Optional[int] = None,
+                 messages_per_second: Optional[float] = None,
+                 max_retries: Optional[int] = None):
         self.account_sid = os.environ.get("TWILIO_ACCOUNT_SID")
         self.auth_token = os.environ.get("TWILIO_AUTH_TOKEN")
         self.from_number = os.environ.get("TWILIO_FROM_NUMBER")
-        
-        if self.account_sid and self.auth_token:
-            self.client = Client(self.account_sid, self.auth_token)
+
+        if client is not None:
+            self.client = client
+        elif self.account_sid and self.auth_token:
+            from twilio.rest import Client
+            self.client = Client(self.account_sid, self.auth_token, http_client=deadline_http_client())
         else:
             self.client = None
             print("Warning: Twilio credentials not found. Messages will not be sent.")
 
+        # Twilio queues messages beyond a sender's throughput (1 MPS for SMS long codes,
+        # higher for WhatsApp senders), so pace requests to the sender's limit.
+        self.max_in_flight = max_in_flight or int(os.environ.get("TWILIO_MAX_IN_FLIGHT", 8))
+        rate = messages_per_second or float(os.environ.get("TWILIO_MESSAGES_PER_SECOND", 20))
+        self.rate_limiter = TokenBucket(rate)
+        # Retries, backoff and the circuit breaker come from the shared "twilio" policy
+        self.retry_policy = resilience.policy_for("twilio")
+        if max_retries is not None:
+            self.retry_policy = replace(self.retry_policy, max_attempts=max_retries + 1)
+
+    def _send_one(self, user: str, amount: float, phone: str) -> str:
+        message_body = (
+            f"Hello {user}, your share of the wireless bill this month is ${amount:.2f}. "
+            "Please pay at your earliest convenience."
+        )
+
+        if not self.client:
+            print(f"[Mock Send] To: {phone}, Body: {message_body}")
+            return "mock_sent"
+
+        with telemetry.span("twilio.messages.create", telemetry.KIND_TWILIO,
+                            bytes_sent=len(message_body.encode("utf-8"))) as message_span:
+            def create():
+                # Every attempt, retries included, waits for its turn at the sender's rate
+                waited = time.perf_counter()
+                self.rate_limiter.acquire()
+                message_span.add("throttled_seconds", round(time.perf_counter() - waited, 6))
+                return self.client.messages.create(
+                    from_=f"whatsapp:{self.from_number}",
+                    body=message_body,
+                    to=f"whatsapp:{phone}"
+                )
+
+            try:
+                # Only retried if Twilio never accepted it (429 or no connection), so nobody gets a message twice
+                message = resilience.call("twilio", create, policy=self.retry_policy,
+                                          classify=resilience.not_delivered)
+            except Exception as e:
+                message_span.set(status="failed")
+                message_span.error = str(e)
+                return f"failed ({str(e)})"
+            message_span.set(status="sent")
+            return f"sent (sid: {message.sid})"
+
     def send_notifications(self, splits: dict, user_contacts: Dict[str, str]) -> Dict[str, str]:
         """
-        Sends WhatsApp notifications to users.
-        
+        Sends WhatsApp notifications to users concurrently.
+
         Args:
-            splits: Dictionary of User -> Amount (from SplitResult.user_splits)
+            splits: Dictionary of User -> Amount (from SplitResult.splits)
             user_contacts: Dictionary of User -> Phone Number (e.g., "+1234567890")
-            
+
         Returns:
             Dictionary of User -> Status ("sent", "failed", "skipped")
         """
         results = {}
-        
+        to_send = []
+
         for user, amount in splits.items():
             phone = user_contacts.get(user)
-            
+
             if not phone:
                 results[user] = "skipped (no phone number)"
                 continue
-                
-            message_body = (
-                f"Hello {user}, your share of the wireless bill this month is ${amount:.2f}. "
-                "Please pay at your earliest convenience."
-            )
-            
-            try:
-                if self.client:
-                    message = self.client.messages.create(
-                        from_=f"whatsapp:{self.from_number}",
-                        body=message_body,
-                        to=f"whatsapp:{phone}"
-                    )
-                    results[user] = f"sent (sid: {message.sid})"
-                else:
-                    print(f"[Mock Send] To: {phone}, Body: {message_body}")
-                    results[user] = "mock_sent"
-            except Exception as e:
-                results[user] = f"failed ({str(e)})"
-                
-        return results
+            to_send.append((user, amount, phone))
+
+        if to_send:
+            with ThreadPoolExecutor(max_workers=min(self.max_in_flight, len(to_send))) as executor:
+                futures = {user: executor.submit(telemetry.run_in_context(self._send_one), user, amount, phone) for user, amount, phone in to_send}
+                for user, future in futures.items():
+                    results[user] = future.result()
+
+        # Preserve the input order of splits
+        return {user: results[user] for user in splits}
 
 if __name__ == "__main__":
     # Test stub
@@ -0,0 +1,121 @@
+import os
+import csv
+import glob
+import json
+import time
+import asyncio
+from typing import Any, Callable, Dict, List, Optional
+from agents import resilience, telemetry
+
+BILL_EXTENSIONS = (".pdf", ".png", ".jpg", ".jpeg", ".webp", ".heic")
+
+def collect_bill_paths(pattern: str) -> List[str]:
+    """
+    Resolves a directory or glob pattern to a sorted list of bill files.
+    Directories are scanned (non-recursively) for known bill extensions.
+    """
+    if os.path.isdir(pattern):
+        paths = [
+            os.path.join(pattern, name) for name in os.listdir(pattern)
+            if name.lower().endswith(BILL_EXTENSIONS)
+        ]
+    else:
+        paths = glob.glob(pattern, recursive=True)
+    return sorted(p for p in paths if os.path.isfile(p))
+
+async def _invoke(app, bill_path: str, config_for: Optional[Callable], input_for: Optional[Callable]):
+    if config_for is None:
+        return await app.ainvoke({"bill_file_path": bill_path, "errors": []})
+    config = config_for(bill_path)
+    snapshot = await app.aget_state(config)
+    initial_state = input_for(snapshot, bill_path) if input_for else {"bill_file_path": bill_path, "errors": []}
+    return await app.ainvoke(initial_state, config)
+
+async def _run_one(app, bill_path: str, semaphore: asyncio.Semaphore, timeout: Optional[float],
+                   config_for: Optional[Callable], input_for: Optional[Callable]) -> Dict[str, Any]:
+    async with semaphore:
+        print(f"[batch] Starting {bill_path}")
+        started = time.perf_counter()
+        record = {
+            "bill": bill_path,
+            "status": "ok",
+            "splits": {},
+            "splitwise_expense_id": None,
+            "errors": [],
+        }
+        # The deadline stops retries inside the bill from backing off past its timeout
+        with telemetry.span("bill", telemetry.KIND_RUN, bill_path=bill_path) as bill_span, resilience.deadline(timeout):
+            try:
+                # Note: on timeout the coroutine is cancelled, but a sync node already
+                # running in the executor thread finishes in the background.
+                final_state = await asyncio.wait_for(
+                    _invoke(app, bill_path, config_for, input_for),
+                    timeout=timeout
+                )
+                record["splits"] = final_state.get("splits") or {}
+                record["splitwise_expense_id"] = final_state.get("splitwise_expense_id")
+                record["errors"] = list(final_state.get("errors") or [])
+                if record["errors"]:
+                    record["status"] = "error"
+            except asyncio.TimeoutError:
+                record["status"] = "timeout"
+                record["errors"] = [f"Timed out after {timeout}s"]
+            except Exception as e:
+                record["status"] = "error"
+                record["errors"] = [f"{type(e).__name__}: {str(e)}"]
+
+        record["elapsed_seconds"] = round(time.perf_counter() - started, 3)
+        record["trace_id"] = bill_span.trace_id
+        record["cost"] = telemetry.bill_cost(telemetry.tracer.spans(bill_span.trace_id))
+        print(f"[batch] Finished {bill_path}: {record['status']} ({record['elapsed_seconds']}s)")
+        return record
+
+async def run_batch(app, bill_paths: List[str], concurrency: int = 4, timeout: Optional[float] = 300.0,
+                    config_for: Optional[Callable] = None, input_for: Optional[Callable] = None) -> List[Dict[str, Any]]:
+    """
+    Runs the compiled graph over many bills concurrently.
+
+    At most `concurrency` bills are in flight at once, each bounded by `timeout`
+    seconds. A failure or timeout in one bill never affects the others.
+    For checkpointed apps, `config_for(bill_path)` gives the run config and
+    `input_for(snapshot, bill_path)` the input (None to resume a stopped run).
+    Returns one report record per bill, in input order.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    return await asyncio.gather(*(_run_one(app, p, semaphore, timeout, config_for, input_for) for p in bill_paths))
+
+def write_report(records: List[Dict[str, Any]], report_path: str) -> None:
+    """Writes batch results as CSV (if the path ends with .csv) or JSON."""
+    if report_path.lower().endswith(".csv"):
+        with open(report_path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["bill", "status", "splitwise_expense_id", "elapsed_seconds", "cost_usd", "llm_tokens",
+                             "splits", "errors"])
+            for r in records:
+                cost = r.get("cost") or {}
+                writer.writerow([
+                    r["bill"],
+                    r["status"],
+                    r["splitwise_expense_id"] or "",
+                    r.get("elapsed_seconds", ""),
+                    cost.get("total_cost_usd", ""),
+                    cost.get("input_tokens", 0) + cost.get("output_tokens", 0) if cost else "",
+                    json.dumps(r["splits"]),
+                    "; ".join(r["errors"]),
+                ])
+    else:
+        with open(report_path, "w") as f:
+            json.dump(records, f, indent=2)
+
+def summarize(records: List[Dict[str, Any]], wall_seconds: float) -> Dict[str, Any]:
+    """Aggregates batch records into counts and timing totals."""
+    statuses = [r["status"] for r in records]
+    return {
+        "bills": len(records),
+        "ok": statuses.count("ok"),
+        "error": statuses.count("error"),
+        "timeout": statuses.count("timeout"),
+        "wall_seconds": round(wall_seconds, 3),
+        "sum_bill_seconds": round(sum(r.get("elapsed_seconds", 0.0) for r in records), 3),
+        "cost_usd": round(sum((r.get("cost") or {}).get("total_cost_usd", 0.0) for r in records), 6),
+    }
@@ -0,0 +1,114 @@
+"""
+Gemini calls, latency and accuracy of the local-model-first extraction cascade.
+
+Usage: python -m benchmarks.bench_cascade [--lines 10 60] [--bills 20] [--wrong-rates 0 0.2 0.5]
+                                          [--local-latency 0.3] [--llm-latency 1.0]
+                                          [--ollama-url URL] [--local-model NAME] [--out results.json]
+
+Each fixture bill (a text PDF) is parsed once per mode:
+
+    gemini    the usual parse: every bill goes to Gemini
+    cascade   the local model first, Gemini only for bills it fails
+
+Gemini is the fake chat model of bench_e2e (canned BillData after
+--llm-latency seconds). The local tier is a fake Ollama server answering after
+--local-latency seconds, with a fraction --wrong-rate of its replies carrying a
+wrong line total, talked to through langchain-ollama's ChatOllama (or an
+in-process fake when langchain-ollama is not installed). With --ollama-url the
+local tier is a real Ollama server running --local-model, and the report's
+accuracy shows how well that model reads the bills.
+
+The report gives, per mode: Gemini calls, p50/p95 latency per bill, field
+accuracy against the fixture and the cascade's per-tier stats (hit rate,
+escalations by reason, tier latency).
+"""
+import json
+import time
+import argparse
+import tempfile
+import importlib.util
+from typing import Dict, List, Optional
+from unittest import mock
+from agents import cascade
+from agents.bill_parser import BillParserAgent
+from agents.cascade import CascadeStats, DEFAULT_LOCAL_MODEL
+from benchmarks.bench_e2e import make_fixture, write_bills, percentile, metadata as run_metadata
+from benchmarks.bench_image import field_accuracy
+from benchmarks.fakes import FakeChatModel, FakeOllamaServer
+
+def local_model(base_url: Optional[str], model_name: str, payload: dict, wrong_rate: float, latency: float):
+    """Returns (chat model, fake server or None) for the local tier."""
+    if base_url is not None or importlib.util.find_spec("langchain_ollama"):
+        from langchain_ollama import ChatOllama
+        server = None
+        if base_url is None:
+            server = FakeOllamaServer(payload, model=model_name, latency_seconds=latency, wrong_rate=wrong_rate)
+            base_url = server.__enter__().base_url
+        return ChatOllama(model=model_name, base_url=base_url, temperature=0, format="json",
+                          num_ctx=cascade.DEFAULT_NUM_CTX), server
+    return FakeChatModel(payload, latency_seconds=latency, wrong_rate=wrong_rate), None
+
+def run_mode(mode: str, paths: List[str], payload: dict, gemini: FakeChatModel, local) -> Dict:
+    stats = CascadeStats()
+    seconds, accuracy = [], []
+    calls_before = gemini.calls
+    with mock.patch.object(cascade, "cascade_stats", stats):
+        for path in paths:
+            agent = BillParserAgent(use_cache=False, use_templates=False, cascade=mode == "cascade",
+                                    local_model=local)
+            agent._llm = gemini
+            started = time.perf_counter()
+            result = agent.parse_bill(path)
+            seconds.append(time.perf_counter() - started)
+            accuracy.append(field_accuracy(payload, result.model_dump())["accuracy"])
+    return {
+        "gemini_calls": gemini.calls - calls_before,
+        "p50_ms": round(percentile(seconds, 50) * 1000, 1),
+        "p95_ms": round(percentile(seconds, 95) * 1000, 1),
+        "accuracy": round(sum(accuracy) / len(accuracy), 4),
+        "tiers": stats.summary(),
+    }
+
+def run(lines: int, bills: int, wrong_rate: Optional[float], args, directory: str) -> List[Dict]:
+    payload, _ = make_fixture(lines)
+    paths = write_bills(directory, payload, bills)
+    gemini = FakeChatModel(payload, latency_seconds=args.llm_latency)
+    local, server = local_model(args.ollama_url, args.local_model, payload, wrong_rate, args.local_latency)
+    try:
+        return [{"lines": lines, "wrong_rate": wrong_rate, "mode": mode, "bills": bills,
+                 **run_mode(mode, paths, payload, gemini, local)}
+                for mode in ("gemini", "cascade")]
+    finally:
+        if server is not None:
+            server.__exit__(None, None, None)
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("--lines", type=int, nargs="+", default=[10, 60], help="Lines per fixture bill")
+    arg_parser.add_argument("--bills", type=int, default=20, help="Bills per scenario")
+    arg_parser.add_argument("--wrong-rates", type=float, nargs="+", default=[0.0, 0.2, 0.5],
+                            help="Fraction of fake local replies with a wrong line total")
+    arg_parser.add_argument("--local-latency", type=float, default=0.3)
+    arg_parser.add_argument("--llm-latency", type=float, default=1.0)
+    arg_parser.add_argument("--ollama-url", help="Use a real Ollama server for the local tier")
+    arg_parser.add_argument("--local-model", default=DEFAULT_LOCAL_MODEL)
+    arg_parser.add_argument("--out", help="Also write the JSON report to this file")
+    args = arg_parser.parse_args()
+
+    # A real local model decides its own error rate
+    wrong_rates = [None] if args.ollama_url else args.wrong_rates
+    with tempfile.TemporaryDirectory() as tmp:
+        results = [row for lines in args.lines for rate in wrong_rates
+                   for row in run(lines, args.bills, rate, args, tmp)]
+
+    meta = run_metadata(argparse.Namespace(bills=args.bills, llm_latency=args.llm_latency, service_latency=None))
+    meta = {key: value for key, value in meta.items() if key != "service_latency_seconds"}
+    meta.update(local_latency_seconds=args.local_latency, local_model=args.local_model,
+                local_server=args.ollama_url or "fake",
+                local_client="ChatOllama" if args.ollama_url or importlib.util.find_spec("langchain_ollama")
+                else "in-process fake")
+    report = json.dumps({"meta": meta, "results": results}, indent=2)
+    print(report)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(report)
@@ -0,0 +1,251 @@
+"""
+End-to-end benchmark of the bill pipeline against local fakes.
+
+Usage: python -m benchmarks.bench_e2e [--targets graph main mcp] [--lines 10 200]
+                                      [--concurrency 1 4] [--bills 8] [--llm-latency 0.5]
+                                      [--service-latency 0.05] [--out results.json]
+
+Gemini is replaced by a fake chat model returning canned BillData after
+--llm-latency seconds; Splitwise and Twilio are local HTTP servers answering
+after --service-latency seconds. Everything else (PDF reading, preprocessing,
+parse cache, split calculation, Splitwise SDK, Twilio SDK, MCP tools) is real.
+
+Targets:
+    graph  graph.app via batch.run_batch (parse -> split -> Splitwise + WhatsApp)
+    main   main.run (parse -> split -> WhatsApp), bills in a thread pool
+    mcp    parse_bill, calculate_split and add_expense_to_splitwise MCP tools (in-memory client)
+
+Each (target, lines, concurrency) runs in a fresh interpreter so peak RSS is
+per scenario. Prints one JSON document (also written to --out) with p50/p99
+latency per bill, throughput and peak RSS, plus run metadata for comparisons.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import platform
+import argparse
+import resource
+import tempfile
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+from unittest import mock
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile (q in 0..100)."""
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * q // 100))  # ceil
+    return ordered[int(rank) - 1]
+
+def make_fixture(lines: int):
+    """Canned BillData for a bill with `lines` lines, its contacts and the Splitwise members."""
+    user_charges = [
+        {"name": f"LINE {i}", "phone_number": f"555.{i // 10000:03d}.{i % 10000:04d}",
+         "items": [{"description": "Plan", "amount": 25.0 + i % 7, "category": "Plan"}], "total": 25.0 + i % 7}
+        for i in range(lines)
+    ]
+    shared = [{"description": "Account charges", "amount": 60.0, "category": "Plan"},
+              {"description": "Taxes & fees", "amount": 7.31, "category": "Tax"}]
+    total = round(sum(u["total"] for u in user_charges) + sum(c["amount"] for c in shared), 2)
+    payload = {
+        "total_amount": total, "period_start": "Nov 06", "period_end": "Dec 05, 2025",
+        "usage_period": "Nov 06 - Dec 05, 2025", "shared_costs": shared, "user_charges": user_charges,
+    }
+    contacts = [
+        {"name": u["name"], "phone": u["phone_number"], "email_id": f"line{i}@example.com"}
+        for i, u in enumerate(user_charges)
+    ]
+    return payload, contacts
+
+def write_bills(directory: str, payload: dict, count: int) -> List[str]:
+    """Writes `count` distinct text PDFs (so each one misses the parse cache)."""
+    from benchmarks.fakes import make_text_pdf
+    rows = [f"{u['name']} {u['phone_number']} Plan ${u['total']:.2f} Device $0.00" for u in payload["user_charges"]]
+    paths = []
+    for b in range(count):
+        pages = [["Wireless statement", f"Bill #{b}", f"Total due ${payload['total_amount']:.2f}"]]
+        pages += [rows[i:i + 40] for i in range(0, len(rows), 40)]
+        path = os.path.join(directory, f"bill_{b:04d}.pdf")
+        with open(path, "wb") as f:
+            f.write(make_text_pdf(pages))
+        paths.append(path)
+    return paths
+
+def _timed(fn, *args) -> Dict:
+    started = time.perf_counter()
+    try:
+        ok = fn(*args)
+        error = None if ok else "failed"
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    return {"seconds": time.perf_counter() - started, "error": error}
+
+# Each runner does its one-off setup (imports, graph compile, MCP session) and then
+# returns (per-bill timings, wall seconds) for the bills only.
+
+def run_graph(paths: List[str], concurrency: int):
+    import graph
+    from batch import run_batch
+    app = graph.get_app()
+    started = time.perf_counter()
+    records = asyncio.run(run_batch(app, paths, concurrency=concurrency, timeout=600))
+    wall = time.perf_counter() - started
+    return [{"seconds": r["elapsed_seconds"], "error": "; ".join(r["errors"]) or None} for r in records], wall
+
+def run_main(paths: List[str], concurrency: int):
+    import main
+
+    def one(path):
+        result = main.run(path, notify=True)
+        return result is not None and all(s.startswith("sent") for s in result["notifications"].values())
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        timings = list(pool.map(lambda p: _timed(one, p), paths))
+    return timings, time.perf_counter() - started
+
+def run_mcp(paths: List[str], concurrency: int, contacts: List[dict]):
+    from splitwise_mcp import mcpServer
+    from splitwise_mcp.remote import MCPRemote
+    user_map = {c["phone"]: c["email_id"] for c in contacts}
+    remote = MCPRemote(mcpServer.mcp)
+    remote.call_tool("add", {"a": 1, "b": 1})  # open the session before timing
+
+    def one(path):
+        bill = remote.call_tool("parse_bill", {"request": {"file_path": path}})
+        split = remote.call_tool("calculate_split", {"request": {
+            "bill_data": bill, "user_map": user_map, "allocation": "largest_remainder"}})
+        posted = remote.call_tool("add_expense_to_splitwise", {"request": {
+            "total_amount": bill["total_amount"], "description": os.path.basename(path), "splits": split["splits"]}})
+        return posted["success"]
+
+    try:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            timings = list(pool.map(lambda p: _timed(one, p), paths))
+        return timings, time.perf_counter() - started
+    finally:
+        remote.close()
+
+def run_scenario(target: str, lines: int, concurrency: int, bills: int,
+                 llm_latency: float, service_latency: float) -> Dict:
+    """Runs one scenario in this process (call from a fresh interpreter)."""
+    from benchmarks.fakes import FakeChatModel, FakeSplitwiseServer, FakeTwilioServer
+    from agents.bill_parser import BillParserAgent
+
+    payload, contacts = make_fixture(lines)
+    emails = ["owner@example.com"] + [c["email_id"] for c in contacts]
+    fake_llm = FakeChatModel(payload, latency_seconds=llm_latency)
+
+    with tempfile.TemporaryDirectory() as tmp, \
+            FakeSplitwiseServer(emails, latency_seconds=service_latency) as splitwise, \
+            FakeTwilioServer(latency_seconds=service_latency) as twilio:
+        os.chdir(tmp)  # graph/main read contacts.json from the working directory
+        with open("contacts.json", "w") as f:
+            json.dump(contacts, f)
+        os.environ.update({
+            "BILL_PARSER_CACHE_DIR": os.path.join(tmp, "parse_cache"),
+            "BILL_SPLITTER_BILLS_DIR": tmp,
+            "SPLITWISE_LEDGER_PATH": os.path.join(tmp, "ledger.sqlite3"),
+            "SPLITWISE_BASE_URL": splitwise.base_url + "/",
+            "SPLITWISE_CONSUMER_KEY": "bench", "SPLITWISE_CONSUMER_SECRET": "bench", "SPLITWISE_API_KEY": "bench",
+            "TWILIO_ACCOUNT_SID": "ACbench", "TWILIO_AUTH_TOKEN": "bench", "TWILIO_FROM_NUMBER": "+15550000000",
+        })
+        os.environ.pop("SPLITWISE_MCP_URL", None)
+        paths = write_bills(tmp, payload, bills)
+
+        with mock.patch.object(BillParserAgent, "llm", new=property(lambda self: fake_llm)), \
+                mock.patch("agents.whatsapp_notifier.deadline_http_client", twilio.http_client):
+            if target == "graph":
+                timings, wall = run_graph(paths, concurrency)
+            elif target == "main":
+                timings, wall = run_main(paths, concurrency)
+            elif target == "mcp":
+                timings, wall = run_mcp(paths, concurrency, contacts)
+            else:
+                raise ValueError(f"Unknown target: {target}")
+        expenses = splitwise.expenses_created()
+        messages = len(twilio.requests)
+        os.chdir(ROOT)
+
+    seconds = [t["seconds"] for t in timings]
+    errors = [t["error"] for t in timings if t["error"]]
+    return {
+        "target": target,
+        "lines": lines,
+        "concurrency": concurrency,
+        "bills": len(timings),
+        "ok": len(timings) - len(errors),
+        "p50_ms": round(percentile(seconds, 50) * 1000, 1),
+        "p99_ms": round(percentile(seconds, 99) * 1000, 1),
+        "mean_ms": round(sum(seconds) / len(seconds) * 1000, 1),
+        "wall_seconds": round(wall, 3),
+        "throughput_bills_per_s": round(len(timings) / wall, 2),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "llm_calls": fake_llm.calls,
+        "splitwise_expenses": expenses,
+        "twilio_messages": messages,
+        "errors": errors[:5],
+    }
+
+def run_in_child(target: str, lines: int, concurrency: int, args) -> Dict:
+    command = [
+        sys.executable, "-m", "benchmarks.bench_e2e", "--child",
+        "--targets", target, "--lines", str(lines), "--concurrency", str(concurrency),
+        "--bills", str(args.bills), "--llm-latency", str(args.llm_latency),
+        "--service-latency", str(args.service_latency),
+    ]
+    result = subprocess.run(command, cwd=ROOT, capture_output=True, text=True)
+    if result.returncode != 0:
+        return {"target": target, "lines": lines, "concurrency": concurrency, "failed": result.stderr[-2000:]}
+    # The agents print progress; the result is the last line
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def metadata(args) -> Dict:
+    try:
+        revision = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                  capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        revision = None
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "git_revision": revision,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "bills_per_run": args.bills,
+        "llm_latency_seconds": args.llm_latency,
+        "service_latency_seconds": args.service_latency,
+    }
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("--targets", nargs="+", default=["graph", "main", "mcp"], choices=["graph", "main", "mcp"])
+    arg_parser.add_argument("--lines", type=int, nargs="+", default=[10, 200], help="Lines per bill")
+    arg_parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4])
+    arg_parser.add_argument("--bills", type=int, default=8, help="Bills per scenario")
+    arg_parser.add_argument("--llm-latency", type=float, default=0.5)
+    arg_parser.add_argument("--service-latency", type=float, default=0.05)
+    arg_parser.add_argument("--out", help="Also write the JSON report to this file")
+    arg_parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = arg_parser.parse_args()
+
+    if args.child:
+        result = run_scenario(args.targets[0], args.lines[0], args.concurrency[0], args.bills,
+                              args.llm_latency, args.service_latency)
+        print(json.dumps(result))
+        sys.exit(0)
+
+    results = [
+        run_in_child(target, lines, concurrency, args)
+        for target in args.targets for lines in args.lines for concurrency in args.concurrency
+    ]
+    report = json.dumps({"meta": metadata(args), "results": results}, indent=2)
+    print(report)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(report)
@@ -0,0 +1,178 @@
+"""
+Payload size, latency and extraction accuracy of the image preprocessing stage.
+
+Usage: python -m benchmarks.bench_image [--photos 4] [--lines 12] [--long-edges 1024 1600 2048]
+                                        [--fixtures DIR] [--live] [--out results.json]
+
+Each fixture photo is sent raw and normalized at every --long-edge. The
+report gives, per variant: payload bytes, preprocessing time, output size,
+estimated Gemini image tokens and the rendered text height in output pixels
+(a legibility floor: Gemini reads bill print reliably down to about 12 px).
+
+Fixtures are synthetic phone photos (a bill sheet on a noisy desk, stored
+sideways with an EXIF orientation tag) unless --fixtures points to a folder
+of real photos, each with a <name>.json ground truth in BillData format.
+
+With --live (needs GOOGLE_API_KEY) every variant is also parsed by Gemini and
+scored field by field against the ground truth: total, billing period and each
+line's total, matched by phone number. The parse latency and the input tokens
+Gemini reports are added to the variant.
+"""
+import os
+import glob
+import json
+import math
+import time
+import argparse
+import tempfile
+from typing import Dict, List, Optional, Tuple
+from agents.contacts import normalize_phone
+from agents.image_preprocess import preprocess_image
+from benchmarks.bench_e2e import make_fixture, metadata as run_metadata
+
+# Font size of the synthetic fixtures, in photo pixels
+FIXTURE_FONT_PX = 28
+
+def estimate_image_tokens(size: Tuple[int, int]) -> int:
+    """Gemini 2.0 image tokens: 258 for images within 384x384, else 258 per 768x768 tile."""
+    width, height = size
+    if width <= 384 and height <= 384:
+        return 258
+    return 258 * math.ceil(width / 768) * math.ceil(height / 768)
+
+def field_accuracy(expected: dict, actual: dict) -> Dict:
+    """Fraction of ground-truth fields the parse got right (amounts to the cent)."""
+    checks = {
+        "total_amount": abs(float(actual.get("total_amount") or 0) - expected["total_amount"]) < 0.005,
+        "period_start": (actual.get("period_start") or "").strip().lower() == expected["period_start"].strip().lower(),
+        "period_end": (actual.get("period_end") or "").strip().lower() == expected["period_end"].strip().lower(),
+    }
+    parsed = {normalize_phone(u.get("phone_number")): u for u in actual.get("user_charges") or []}
+    for user in expected["user_charges"]:
+        phone = normalize_phone(user["phone_number"])
+        match = parsed.get(phone)
+        checks[f"line {phone}"] = match is not None and abs(float(match.get("total") or 0) - user["total"]) < 0.005
+    right = sum(checks.values())
+    return {"accuracy": round(right / len(checks), 4), "fields": len(checks),
+            "wrong": [field for field, ok in checks.items() if not ok]}
+
+def synthetic_fixtures(directory: str, photos: int, lines: int) -> List[Tuple[str, dict, Optional[int]]]:
+    """Writes `photos` bill photos; returns (path, ground truth, font px) for each."""
+    from benchmarks.fakes import make_bill_photo
+    payload, _ = make_fixture(lines)
+    rows = [f"{u['name']}   {u['phone_number']}   Plan ${u['total']:.2f}" for u in payload["user_charges"]]
+    page = ["Wireless statement", f"Billing period {payload['usage_period']}",
+            f"Total due ${payload['total_amount']:.2f}", ""] + rows + [""] + [
+            f"{c['description']} ${c['amount']:.2f}" for c in payload["shared_costs"]]
+    fixtures = []
+    for i in range(photos):
+        path = os.path.join(directory, f"photo_{i:02d}.jpg")
+        with open(path, "wb") as f:
+            f.write(make_bill_photo([page], font_px=FIXTURE_FONT_PX, seed=i))
+        fixtures.append((path, payload, FIXTURE_FONT_PX))
+    return fixtures
+
+def folder_fixtures(directory: str) -> List[Tuple[str, dict, Optional[int]]]:
+    fixtures = []
+    for truth_path in sorted(glob.glob(os.path.join(directory, "*.json"))):
+        stem = os.path.splitext(truth_path)[0]
+        photos = [p for p in glob.glob(stem + ".*") if not p.endswith(".json")]
+        if photos:
+            with open(truth_path) as f:
+                fixtures.append((photos[0], json.load(f), None))
+    return fixtures
+
+def live_parse(agent, block: dict, expected: dict) -> Dict:
+    from agents import telemetry
+    started = time.perf_counter()
+    with telemetry.span("bench_image", telemetry.KIND_RUN) as root:
+        try:
+            result = agent._invoke_llm(block).model_dump()
+            error = None
+        except Exception as e:
+            result, error = {}, f"{type(e).__name__}: {e}"
+    seconds = time.perf_counter() - started
+    llm = [s for s in telemetry.tracer.spans(root.trace_id) if s.kind == telemetry.KIND_LLM]
+    scored = field_accuracy(expected, result)
+    scored.update(parse_ms=round(seconds * 1000, 1), error=error,
+                  input_tokens=sum(s.attributes.get("input_tokens", 0) for s in llm))
+    return scored
+
+def run_fixture(path: str, expected: dict, font_px: Optional[int], long_edges: List[int], agent=None) -> List[Dict]:
+    import mimetypes
+    from PIL import Image
+    with Image.open(path) as image:
+        raw_size = image.size
+    with open(path, "rb") as f:
+        raw = f.read()
+    mime_type = mimetypes.guess_type(path)[0] or "image/jpeg"
+
+    variants = [{
+        "fixture": os.path.basename(path), "variant": "raw", "payload_bytes": len(raw), "preprocess_ms": 0.0,
+        "size": list(raw_size), "est_image_tokens": estimate_image_tokens(raw_size), "text_px": font_px,
+        "_block": {"type": "media", "mime_type": mime_type, "data": raw},
+    }]
+    for long_edge in long_edges:
+        timings = []
+        for _ in range(3):
+            started = time.perf_counter()
+            result = preprocess_image(path, long_edge=long_edge)
+            timings.append(time.perf_counter() - started)
+        variants.append({
+            "fixture": os.path.basename(path), "variant": f"normalized@{long_edge}",
+            "payload_bytes": result.payload_bytes, "preprocess_ms": round(min(timings) * 1000, 1),
+            "size": list(result.size), "est_image_tokens": estimate_image_tokens(result.size),
+            "text_px": round(font_px * result.scale, 1) if font_px else None,
+            "_block": {"type": "media", "mime_type": result.mime_type, "data": result.data},
+        })
+
+    for variant in variants:
+        block = variant.pop("_block")
+        variant["payload_ratio"] = round(variant["payload_bytes"] / len(raw), 4)
+        if agent is not None:
+            variant.update(live_parse(agent, block, expected))
+    return variants
+
+def summarize(rows: List[Dict]) -> List[Dict]:
+    """Mean of each numeric column per variant, across fixtures."""
+    summary = []
+    for variant in dict.fromkeys(r["variant"] for r in rows):
+        group = [r for r in rows if r["variant"] == variant]
+        entry = {"variant": variant, "fixtures": len(group)}
+        for column in ("payload_bytes", "payload_ratio", "preprocess_ms", "est_image_tokens", "text_px",
+                       "accuracy", "parse_ms", "input_tokens"):
+            values = [r[column] for r in group if r.get(column) is not None]
+            if values:
+                entry[column] = round(sum(values) / len(values), 4)
+        summary.append(entry)
+    return summary
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("--photos", type=int, default=4, help="Synthetic fixture photos")
+    arg_parser.add_argument("--lines", type=int, default=12, help="Lines per synthetic bill")
+    arg_parser.add_argument("--long-edges", type=int, nargs="+", default=[1024, 1600, 2048])
+    arg_parser.add_argument("--fixtures", help="Folder of real photos with <name>.json ground truth")
+    arg_parser.add_argument("--live", action="store_true", help="Parse every variant with Gemini and score it")
+    arg_parser.add_argument("--out", help="Also write the JSON report to this file")
+    args = arg_parser.parse_args()
+
+    agent = None
+    if args.live:
+        from agents.bill_parser import BillParserAgent
+        agent = BillParserAgent(use_cache=False)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        fixtures = folder_fixtures(args.fixtures) if args.fixtures else synthetic_fixtures(tmp, args.photos, args.lines)
+        rows = [row for path, expected, font_px in fixtures
+                for row in run_fixture(path, expected, font_px, args.long_edges, agent)]
+
+    # The e2e run metadata, minus its bill and fake-latency settings
+    meta = run_metadata(argparse.Namespace(bills=len(fixtures), llm_latency=None, service_latency=None))
+    meta = {key: value for key, value in meta.items() if key not in ("bills_per_run",) and not key.endswith("_seconds")}
+    meta.update(live=args.live, fixtures=args.fixtures or "synthetic", photos=len(fixtures))
+    report = json.dumps({"meta": meta, "summary": summarize(rows), "results": rows}, indent=2)
+    print(report)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(report)
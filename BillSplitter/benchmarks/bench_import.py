@@ -0,0 +1,97 @@
+"""
+Import-time benchmark for the CLI entry points, based on `python -X importtime`.
+
+Usage: python -m benchmarks.bench_import [--repeat 5] [--top 8]
+
+Each module is imported in a fresh interpreter `--repeat` times. The median
+cumulative import time is compared with its budget, and the heavy SDKs
+(langchain, langgraph, Gemini, Twilio, Splitwise, fastmcp) must not be
+imported at all; those are loaded on first use. Exits with status 1 when a
+budget or a lazy-import rule is broken, so it can gate CI.
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+from typing import Dict, List, Tuple
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+HEAVY_MODULES = ("langchain_core", "langchain_google_genai", "langgraph", "google.genai", "twilio", "splitwise", "fastmcp")
+
+# Cumulative import time budgets in milliseconds (roughly 2x the measured time, for noisy machines)
+BUDGETS_MS = {
+    "agents.split_calculator": 300,
+    "graph": 800,
+    "main": 800,
+    "verify_splits": 800,
+}
+
+# Modules that may not be imported (a prefix matches submodules too)
+FORBIDDEN = {
+    "agents.split_calculator": HEAVY_MODULES + ("pypdf", "numpy", "pandas"),
+    "graph": HEAVY_MODULES,
+    "main": HEAVY_MODULES,
+    "verify_splits": HEAVY_MODULES,
+}
+
+def import_profile(module: str) -> List[Tuple[str, int, int]]:
+    """
+    Imports a module in a fresh interpreter with -X importtime.
+    Returns (name, self_us, cumulative_us) for every module it imported.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+def matching(names, prefixes) -> List[str]:
+    """Names equal to one of the module prefixes or inside one of those packages."""
+    return sorted({name for name in names if any(name == p or name.startswith(p + ".") for p in prefixes)})
+
+def forbidden_imports(module: str) -> List[str]:
+    """Names of forbidden modules that importing `module` pulls in."""
+    return matching((name for name, _, _ in import_profile(module)), FORBIDDEN.get(module, HEAVY_MODULES))
+
+def run(module: str, repeat: int, top: int) -> Dict:
+    timings_ms = []
+    profile = []
+    for _ in range(repeat):
+        profile = import_profile(module)
+        total_us = next(cumulative for name, _, cumulative in profile if name == module)
+        timings_ms.append(total_us / 1000)
+
+    median_ms = statistics.median(timings_ms)
+    budget_ms = BUDGETS_MS.get(module)
+    forbidden = matching((name for name, _, _ in profile), FORBIDDEN.get(module, HEAVY_MODULES))
+    heaviest = sorted(profile, key=lambda row: row[1], reverse=True)[:top]
+    return {
+        "module": module,
+        "median_ms": round(median_ms, 1),
+        "min_ms": round(min(timings_ms), 1),
+        "budget_ms": budget_ms,
+        "within_budget": budget_ms is None or median_ms <= budget_ms,
+        "forbidden_imports": forbidden,
+        "heaviest_self_ms": {name: round(self_us / 1000, 1) for name, self_us, _ in heaviest},
+    }
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("--modules", nargs="+", default=list(BUDGETS_MS))
+    arg_parser.add_argument("--repeat", type=int, default=5)
+    arg_parser.add_argument("--top", type=int, default=8, help="Slowest imports (self time) to list per module")
+    args = arg_parser.parse_args()
+
+    results = [run(module, args.repeat, args.top) for module in args.modules]
+    print(json.dumps(results, indent=2))
+    if any(not r["within_budget"] or r["forbidden_imports"] for r in results):
+        sys.exit(1)
@@ -0,0 +1,79 @@
+"""
+Compares the per-user calculate_split loop with the columnar split engine.
+
+Usage: python -m benchmarks.bench_split_engine [--sizes 10 1000 100000] [--bills 12]
+
+Each size is the total number of lines, spread over --bills billing periods.
+The engine's output is checked to match the loop exactly before timing is reported.
+"""
+import json
+import time
+import random
+import argparse
+from agents.split_calculator import SplitCalculatorAgent
+from agents.split_engine import compute_shares, calculate_splits_bulk
+
+def make_bills(total_lines: int, num_bills: int, seed: int = 0):
+    rnd = random.Random(seed)
+    per_bill = max(1, total_lines // num_bills)
+    bills = []
+    for b in range(num_bills):
+        bills.append({
+            "total_amount": 0.0,
+            "period_start": f"2025-{b % 12 + 1:02d}-01",
+            "period_end": f"2025-{b % 12 + 1:02d}-28",
+            "shared_costs": [
+                {"description": "Base Plan", "amount": round(rnd.uniform(50, 500), 2), "category": "Plan"},
+                {"description": "Taxes", "amount": round(rnd.uniform(5, 50), 2), "category": "Tax"},
+            ],
+            "user_charges": [
+                {
+                    "name": f"Line {i}",
+                    "phone_number": f"555.{i // 10000:03d}.{i % 10000:04d}",
+                    "total": round(rnd.uniform(0, 120), 2),
+                    "items": [],
+                }
+                for i in range(per_bill)
+            ],
+        })
+    user_map = {f"555.{i // 10000:03d}.{i % 10000:04d}": f"line{i}@example.com" for i in range(0, per_bill, 2)}
+    return bills, user_map
+
+def best_of(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+def run(total_lines: int, num_bills: int, repeat: int) -> dict:
+    bills, user_map = make_bills(total_lines, min(num_bills, total_lines))
+    agent = SplitCalculatorAgent()
+
+    loop_results = [agent.calculate_split(bill, user_map) for bill in bills]
+    engine_results = calculate_splits_bulk(bills, user_map)
+    assert loop_results == engine_results, "Engine results differ from calculate_split"
+
+    loop_seconds = best_of(lambda: [agent.calculate_split(bill, user_map) for bill in bills], repeat)
+    shares_seconds = best_of(lambda: compute_shares(bills, user_map), repeat)
+    bulk_seconds = best_of(lambda: calculate_splits_bulk(bills, user_map), repeat)
+
+    return {
+        "lines": sum(len(b["user_charges"]) for b in bills),
+        "bills": len(bills),
+        "loop_seconds": round(loop_seconds, 5),
+        "engine_shares_seconds": round(shares_seconds, 5),
+        "engine_split_results_seconds": round(bulk_seconds, 5),
+        "speedup_shares": round(loop_seconds / shares_seconds, 2) if shares_seconds else None,
+        "identical": True,
+    }
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1000, 100000])
+    arg_parser.add_argument("--bills", type=int, default=12, help="Billing periods the lines are spread over")
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args()
+
+    print(json.dumps([run(size, args.bills, args.repeat) for size in args.sizes], indent=2))
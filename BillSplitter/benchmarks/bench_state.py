@@ -0,0 +1,100 @@
+"""
+Memory and allocations of the graph state for one large bill.
+
+Usage: python -m benchmarks.bench_state [--lines 1000] [--writes 200] [--repeat 5] [--out results.json]
+
+Runs the state handling of parse_bill -> calculate_splits -> record_history
+on a canned --lines bill, with the parse itself excluded. It runs once the
+way the graph did before bill records and once the way it does now:
+
+    dicts    bill_data = BillData.model_dump(); the SplitResult is dumped for the history
+    records  bill_data = BillRecord.from_model(); details are built only when read
+
+Each variant also folds --writes node updates into the errors channel, five
+in six of them empty. `dicts` uses the old reducer, which copied the list on
+every write; `records` uses graph.merge_errors.
+
+Measured with tracemalloc, best of --repeat: peak bytes, blocks allocated,
+bytes still held by the state afterwards, and the size of the checkpoint the
+state serializes to.
+"""
+import gc
+import json
+import time
+import operator
+import argparse
+import tracemalloc
+from typing import Callable, Dict
+from agents.bill_parser import BillData
+from agents.bill_record import BillRecord
+from agents.split_calculator import SplitCalculatorAgent, ALLOCATION_LARGEST_REMAINDER
+from benchmarks.bench_e2e import make_fixture, metadata as run_metadata
+import graph
+
+def _old_merge_errors(existing, new):
+    if new is None:
+        return []
+    return operator.add(existing or [], new)
+
+def run_dicts(bill: BillData, user_map: Dict[str, str], writes: int) -> Dict:
+    bill_data = bill.model_dump()
+    result = SplitCalculatorAgent().calculate_split(bill_data, user_map, allocation=ALLOCATION_LARGEST_REMAINDER)
+    history_input = result.model_dump()
+    errors = []
+    for i in range(writes):
+        errors = _old_merge_errors(errors, [f"error {i}"] if i % 6 == 0 else [])
+    return {"bill_data": bill_data, "splits": result.splits, "history": history_input, "errors": errors}
+
+def run_records(bill: BillData, user_map: Dict[str, str], writes: int) -> Dict:
+    bill_data = BillRecord.from_model(bill)
+    result = SplitCalculatorAgent().calculate_split(bill_data, user_map, allocation=ALLOCATION_LARGEST_REMAINDER)
+    history_input = {"splits": result.splits, "details": result.details, "description": result.description}
+    errors = []
+    for i in range(writes):
+        errors = graph.merge_errors(errors, [f"error {i}"] if i % 6 == 0 else [])
+    return {"bill_data": bill_data, "splits": result.splits, "history": history_input, "errors": errors}
+
+def measure(fn: Callable, bill: BillData, user_map: Dict[str, str], writes: int, repeat: int) -> Dict:
+    from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+    best = None
+    for _ in range(repeat):
+        gc.collect()
+        tracemalloc.start()
+        started = time.perf_counter()
+        state = fn(bill, user_map, writes)
+        seconds = time.perf_counter() - started
+        retained, peak = tracemalloc.get_traced_memory()
+        blocks = sum(stat.count for stat in tracemalloc.take_snapshot().statistics("filename"))
+        tracemalloc.stop()
+        run = {"peak_bytes": peak, "retained_bytes": retained, "live_blocks": blocks,
+               "ms": round(seconds * 1000, 2)}
+        if best is None or run["peak_bytes"] < best["peak_bytes"]:
+            best = run
+    checkpoint = {key: state[key] for key in ("bill_data", "splits", "errors")}
+    best["checkpoint_bytes"] = len(JsonPlusSerializer().dumps_typed(checkpoint)[1])
+    return best
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("--lines", type=int, default=1000, help="Lines on the bill")
+    arg_parser.add_argument("--writes", type=int, default=200, help="Node updates folded into the errors channel")
+    arg_parser.add_argument("--repeat", type=int, default=5)
+    arg_parser.add_argument("--out", help="Also write the JSON report to this file")
+    args = arg_parser.parse_args()
+
+    payload, contacts = make_fixture(args.lines)
+    bill = BillData(**payload)
+    user_map = {c["phone"]: c["email_id"] for c in contacts}
+    results = {name: measure(fn, bill, user_map, args.writes, args.repeat)
+               for name, fn in (("dicts", run_dicts), ("records", run_records))}
+    results["ratio"] = {key: round(results["records"][key] / results["dicts"][key], 3)
+                        for key in results["dicts"] if results["dicts"][key]}
+
+    meta = run_metadata(argparse.Namespace(bills=1, llm_latency=None, service_latency=None))
+    meta = {key: value for key, value in meta.items() if key not in ("bills_per_run",) and not key.endswith("_seconds")}
+    meta.update(lines=args.lines, writes=args.writes, repeat=args.repeat)
+    report = json.dumps({"meta": meta, "results": results}, indent=2)
+    print(report)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(report)
@@ -0,0 +1,111 @@
+"""
+Token and latency comparison of the three ways the extraction request can be built.
+
+Usage: python -m benchmarks.bench_structured [--lines 10 60] [--repeat 3] [--live] [--out results.json]
+
+Modes:
+    instructions       the prompt carries JsonOutputParser format instructions; the reply text is parsed
+    structured         BillData is passed as the model's response schema (native JSON mode)
+    structured+cache   as structured, with the static instructions in a Gemini context cache
+
+Without --live the requests are only built, not sent. The report gives each
+mode's request size: prompt text bytes, response schema bytes, and an estimate
+of the input tokens (4 bytes per token) billed at the full and at the cached
+rate. With --live (needs GOOGLE_API_KEY) each fixture bill is parsed --repeat
+times per mode. The report then gives the input, cached and output tokens
+Gemini reports, the p50 latency, how many replies could not be parsed, and
+field-level accuracy against the fixture.
+"""
+import json
+import time
+import argparse
+import tempfile
+from typing import Dict, List
+from agents import telemetry
+from agents.bill_parser import BillParserAgent, BillData
+from benchmarks.bench_e2e import make_fixture, write_bills, percentile, metadata as run_metadata
+from benchmarks.bench_image import field_accuracy
+
+MODES = {
+    "instructions": {"structured_output": False, "context_cache": False},
+    "structured": {"structured_output": True, "context_cache": False},
+    "structured+cache": {"structured_output": True, "context_cache": True},
+}
+
+def make_agent(mode: str) -> BillParserAgent:
+    return BillParserAgent(use_cache=False, use_templates=False, chunk_pages=0, **MODES[mode])
+
+def request_size(mode: str, path: str) -> Dict:
+    """Size of the request a mode would send for a bill (assuming any context cache is available)."""
+    agent = make_agent(mode)
+    pdf = agent._read_pdf(path)
+    block = agent._bill_content_block(path, "application/pdf", pdf)
+    messages, bytes_sent = agent._llm_messages(block, None, cached=agent.context_cache)
+    prompt_bytes = sum(len(b["text"].encode("utf-8")) for b in messages[0].content if b["type"] == "text")
+    schema_bytes = len(json.dumps(BillData.model_json_schema()).encode("utf-8")) if agent.structured_output else 0
+    instruction_bytes = len(agent.instructions().encode("utf-8"))
+    return {
+        "request_bytes": bytes_sent,
+        "instruction_bytes": instruction_bytes,
+        "schema_bytes": schema_bytes,
+        "est_input_tokens": (prompt_bytes + schema_bytes) // 4,
+        "est_cached_tokens": instruction_bytes // 4 if agent.context_cache else 0,
+    }
+
+def live_runs(mode: str, path: str, expected: dict, repeat: int) -> Dict:
+    agent = make_agent(mode)
+    seconds, failures, accuracy = [], [], []
+    tokens = {"input_tokens": 0, "cached_tokens": 0, "output_tokens": 0}
+    for _ in range(repeat):
+        started = time.perf_counter()
+        with telemetry.span("bench_structured", telemetry.KIND_RUN) as root:
+            try:
+                result = agent.parse_bill(path).model_dump()
+            except Exception as e:
+                result = None
+                failures.append(f"{type(e).__name__}: {e}"[:200])
+        seconds.append(time.perf_counter() - started)
+        for s in telemetry.tracer.spans(root.trace_id):
+            if s.kind == telemetry.KIND_LLM:
+                for key in tokens:
+                    tokens[key] += s.attributes.get(key, 0)
+        if result is not None:
+            accuracy.append(field_accuracy(expected, result)["accuracy"])
+    return {
+        **{f"mean_{key}": round(value / repeat, 1) for key, value in tokens.items()},
+        "p50_ms": round(percentile(seconds, 50) * 1000, 1),
+        "failures": len(failures),
+        "accuracy": round(sum(accuracy) / len(accuracy), 4) if accuracy else None,
+        "errors": failures[:3],
+    }
+
+def run(lines: int, repeat: int, live: bool, directory: str) -> List[Dict]:
+    payload, _ = make_fixture(lines)
+    path = write_bills(directory, payload, 1)[0]
+    rows = []
+    for mode in MODES:
+        row = {"lines": lines, "mode": mode, **request_size(mode, path)}
+        if live:
+            row.update(live_runs(mode, path, payload, repeat))
+        rows.append(row)
+    return rows
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("--lines", type=int, nargs="+", default=[10, 60], help="Lines per fixture bill")
+    arg_parser.add_argument("--repeat", type=int, default=3, help="Parses per mode and bill with --live")
+    arg_parser.add_argument("--live", action="store_true", help="Send the requests to Gemini")
+    arg_parser.add_argument("--out", help="Also write the JSON report to this file")
+    args = arg_parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = [row for lines in args.lines for row in run(lines, args.repeat, args.live, tmp)]
+
+    meta = run_metadata(argparse.Namespace(bills=1, llm_latency=None, service_latency=None))
+    meta = {key: value for key, value in meta.items() if key not in ("bills_per_run",) and not key.endswith("_seconds")}
+    meta.update(live=args.live, repeat=args.repeat, model=make_agent("structured").model_name)
+    report = json.dumps({"meta": meta, "results": results}, indent=2)
+    print(report)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(report)
@@ -0,0 +1,46 @@
+"""
+Benchmarks WhatsAppNotifierAgent.send_notifications against a local fake Twilio API.
+
+Usage: python -m benchmarks.bench_whatsapp [--lines 12] [--latency 0.2] [--error-rate 0.1]
+"""
+import json
+import time
+import argparse
+from twilio.rest import Client
+from agents.whatsapp_notifier import WhatsAppNotifierAgent
+from benchmarks.fakes import FakeTwilioServer
+
+def run(lines: int, latency: float, error_rate: float, max_in_flight: int, rate: float) -> dict:
+    splits = {f"user{i}@example.com": 10.0 + i for i in range(lines)}
+    contacts = {email: f"+1555000{i:04d}" for i, email in enumerate(splits)}
+
+    with FakeTwilioServer(latency_seconds=latency, error_rate=error_rate) as server:
+        client = Client("ACfake", "token", http_client=server.http_client())
+        agent = WhatsAppNotifierAgent(client=client, max_in_flight=max_in_flight, messages_per_second=rate)
+        started = time.perf_counter()
+        results = agent.send_notifications(splits, contacts)
+        elapsed = time.perf_counter() - started
+
+    return {
+        "lines": lines,
+        "max_in_flight": max_in_flight,
+        "messages_per_second": rate,
+        "seconds": round(elapsed, 3),
+        "sent": sum(1 for status in results.values() if status.startswith("sent")),
+        "failed": sum(1 for status in results.values() if status.startswith("failed")),
+        "http_requests": len(server.requests),
+    }
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("--lines", type=int, default=12)
+    arg_parser.add_argument("--latency", type=float, default=0.2, help="Fake Twilio latency per request (seconds)")
+    arg_parser.add_argument("--error-rate", type=float, default=0.1, help="Fraction of requests answered with 429")
+    arg_parser.add_argument("--rate", type=float, default=20.0, help="Token bucket messages per second")
+    args = arg_parser.parse_args()
+
+    report = [
+        run(args.lines, args.latency, args.error_rate, max_in_flight=1, rate=args.rate),
+        run(args.lines, args.latency, args.error_rate, max_in_flight=8, rate=args.rate),
+    ]
+    print(json.dumps(report, indent=2))
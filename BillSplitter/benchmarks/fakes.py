@@ -0,0 +1,347 @@
+"""
+Deterministic local stand-ins for the external services used by the agents.
+"""
+import json
+import asyncio
+import time
+import random
+import threading
+from types import SimpleNamespace
+from typing import List
+from urllib.parse import parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from twilio.http.http_client import TwilioHttpClient
+
+class _FakeServer:
+    """Runs a ThreadingHTTPServer on a free localhost port in a background thread."""
+
+    handler_class = None
+
+    def __init__(self, latency_seconds: float = 0.05, seed: int = 0):
+        self.latency_seconds = latency_seconds
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = []
+        handler = type("Handler", (self.handler_class,), {"fake": self})
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+class _JsonHandler(BaseHTTPRequestHandler):
+    fake = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_body(self) -> bytes:
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _reply(self, status: int, payload: dict, headers: dict = None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+class _TwilioHandler(_JsonHandler):
+    def do_POST(self):
+        fake = self.fake
+        body = self._read_body()
+        time.sleep(fake.latency_seconds)
+        with fake.lock:
+            fake.requests.append((self.path, body))
+            rate_limited = fake.random.random() < fake.error_rate
+            count = len(fake.requests)
+        if rate_limited:
+            self._reply(429, {"code": 20429, "message": "Too Many Requests", "status": 429})
+            return
+        self._reply(201, {"sid": f"SM{count:032d}", "status": "queued"})
+
+class FakeTwilioServer(_FakeServer):
+    """
+    Fake Twilio Messages API. Each POST sleeps `latency_seconds` and returns a
+    queued message; a fraction `error_rate` of requests get a 429 instead.
+    """
+    handler_class = _TwilioHandler
+
+    def __init__(self, latency_seconds: float = 0.05, error_rate: float = 0.0, seed: int = 0):
+        self.error_rate = error_rate
+        super().__init__(latency_seconds=latency_seconds, seed=seed)
+
+    def http_client(self) -> TwilioHttpClient:
+        """Returns a Twilio HTTP client that sends API requests to this server."""
+        return LocalTwilioHttpClient(self.base_url)
+
+class LocalTwilioHttpClient(TwilioHttpClient):
+    """TwilioHttpClient that rewrites https://*.twilio.com URLs to a local base URL."""
+
+    def __init__(self, base_url: str, **kwargs):
+        super().__init__(**kwargs)
+        self.base_url = base_url
+        self.session.mount("http://", self.session.get_adapter("https://"))
+
+    def request(self, method, url, *args, **kwargs):
+        path = url.split(".twilio.com", 1)[-1]
+        return super().request(method, self.base_url + path, *args, **kwargs)
+
+def _splitwise_user(user_id: int, email: str) -> dict:
+    return {
+        "id": user_id, "first_name": email.split("@")[0], "last_name": None, "email": email,
+        "registration_status": "confirmed", "balance": [{"currency_code": "USD", "amount": "0.0"}],
+    }
+
+class _SplitwiseHandler(_JsonHandler):
+    def do_GET(self):
+        fake = self.fake
+        time.sleep(fake.latency_seconds)
+        with fake.lock:
+            fake.requests.append((self.path, b""))
+        if self.path.endswith("/get_current_user"):
+            user = dict(_splitwise_user(1, fake.emails[0]), default_currency="USD", locale="en",
+                        date_format="MM/DD/YYYY", default_group_id=fake.group_id)
+            self._reply(200, {"user": user})
+        elif self.path.endswith("/get_groups"):
+            members = [_splitwise_user(i + 1, email) for i, email in enumerate(fake.emails)]
+            group = {
+                "id": fake.group_id, "name": fake.group_name, "updated_at": "", "created_at": "",
+                "simplify_by_default": False, "original_debts": [], "simplified_debts": [], "members": members,
+            }
+            self._reply(200, {"groups": [group]})
+        else:
+            self._reply(404, {"errors": {"base": ["Not found"]}})
+
+    def do_POST(self):
+        fake = self.fake
+        body = self._read_body()
+        time.sleep(fake.latency_seconds)
+        with fake.lock:
+            fake.requests.append((self.path, body))
+            rate_limited = fake.random.random() < fake.error_rate
+            expense_id = 1000 + len(fake.requests)
+        if not self.path.endswith("/create_expense"):
+            self._reply(404, {"errors": {"base": ["Not found"]}})
+            return
+        if rate_limited:
+            self._reply(429, {"errors": {"base": ["Too many requests"]}}, headers={"Retry-After": "0"})
+            return
+        form = {key: values[0] for key, values in parse_qs(body.decode("utf-8")).items()}
+        self._reply(200, {"expenses": [{
+            "id": expense_id, "group_id": int(form.get("group_id", fake.group_id)),
+            "description": form.get("description", ""), "repeats": False, "repeat_interval": None,
+            "email_reminder": False, "email_reminder_in_advance": None, "next_repeat": None,
+            "details": None, "comments_count": 0, "payment": False, "creation_method": None,
+            "transaction_method": "offline", "transaction_confirmed": False,
+            "cost": form.get("cost", "0"), "currency_code": form.get("currency_code", "USD"),
+            "created_by": _splitwise_user(1, fake.emails[0]), "date": "", "created_at": "", "updated_at": "",
+            "deleted_at": None, "receipt": {"large": None, "original": None},
+            "category": {"id": 15, "name": "General"}, "updated_by": None, "deleted_by": None,
+            "repayments": [], "users": [],
+        }], "errors": {}})
+
+class FakeSplitwiseServer(_FakeServer):
+    """
+    Fake Splitwise API with one group whose members are `emails` (the first one
+    is the current user). Serves get_current_user, get_groups and create_expense;
+    a fraction `error_rate` of expense posts get a 429 instead.
+    Point the pooled client at it with SPLITWISE_BASE_URL=<base_url>/.
+    """
+    handler_class = _SplitwiseHandler
+
+    def __init__(self, emails: List[str], group_name: str = "AT&T Family", latency_seconds: float = 0.05,
+                 error_rate: float = 0.0, seed: int = 0):
+        self.emails = list(emails)
+        self.group_name = group_name
+        self.group_id = 99
+        self.error_rate = error_rate
+        super().__init__(latency_seconds=latency_seconds, seed=seed)
+
+    def expenses_created(self) -> int:
+        with self.lock:
+            return sum(1 for path, _ in self.requests if path.endswith("/create_expense"))
+
+def wrong_bill(payload: dict) -> dict:
+    """A copy of canned BillData with the first line total $10 off, so it no longer reconciles."""
+    wrong = json.loads(json.dumps(payload))
+    if wrong["user_charges"]:
+        wrong["user_charges"][0]["total"] = round(wrong["user_charges"][0]["total"] + 10, 2)
+    return wrong
+
+class FakeChatModel:
+    """
+    Stand-in for ChatGoogleGenerativeAI (or a local model): sleeps
+    `latency_seconds` per call and returns `payload` (canned BillData) as JSON
+    content. A fraction `wrong_rate` of replies carry a wrong line total.
+    """
+
+    def __init__(self, payload: dict, latency_seconds: float = 0.5, wrong_rate: float = 0.0, seed: int = 0):
+        self.payload = payload
+        self.latency_seconds = latency_seconds
+        self.wrong_rate = wrong_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls = 0
+
+    def _reply(self):
+        with self.lock:
+            self.calls += 1
+            wrong = self.random.random() < self.wrong_rate
+        return SimpleNamespace(content=json.dumps(wrong_bill(self.payload) if wrong else self.payload))
+
+    def invoke(self, messages, **kwargs):
+        time.sleep(self.latency_seconds)
+        return self._reply()
+
+    async def ainvoke(self, messages, **kwargs):
+        await asyncio.sleep(self.latency_seconds)
+        return self._reply()
+
+class _OllamaHandler(_JsonHandler):
+    def do_GET(self):
+        if self.path == "/api/tags":
+            self._reply(200, {"models": [{"name": self.fake.model, "model": self.fake.model}]})
+        elif self.path == "/api/version":
+            self._reply(200, {"version": "0.5.0"})
+        else:
+            self._reply(404, {"error": "not found"})
+
+    def do_POST(self):
+        fake = self.fake
+        body = self._read_body()
+        if self.path != "/api/chat":
+            self._reply(404, {"error": "not found"})
+            return
+        request = json.loads(body or b"{}")
+        time.sleep(fake.latency_seconds)
+        with fake.lock:
+            fake.requests.append((self.path, body))
+            wrong = fake.random.random() < fake.wrong_rate
+        content = json.dumps(wrong_bill(fake.payload) if wrong else fake.payload)
+        prompt = "".join(str(m.get("content", "")) for m in request.get("messages", []))
+        head = {"model": request.get("model", fake.model), "created_at": "2025-01-01T00:00:00Z"}
+        message = {"role": "assistant", "content": content}
+        done = dict(head, message=message, done=True, done_reason="stop",
+                    total_duration=int(fake.latency_seconds * 1e9),
+                    prompt_eval_count=len(prompt) // 4, eval_count=len(content) // 4)
+        if not request.get("stream", True):
+            self._reply(200, done)
+            return
+        # Streamed replies are newline-delimited JSON: the content, then a closing chunk with the counts
+        chunks = [dict(head, message=message, done=False), dict(done, message={"role": "assistant", "content": ""})]
+        data = b"".join(json.dumps(c).encode("utf-8") + b"\n" for c in chunks)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+class FakeOllamaServer(_FakeServer):
+    """
+    Fake Ollama server for the extraction cascade's local tier. /api/chat
+    sleeps `latency_seconds` and answers with `payload` (canned BillData) as
+    JSON; a fraction `wrong_rate` of replies carry a wrong line total.
+    Point ChatOllama at it with base_url=<base_url> (or OLLAMA_HOST).
+    """
+    handler_class = _OllamaHandler
+
+    def __init__(self, payload: dict, model: str = "llama3.2:3b-instruct-fp16", latency_seconds: float = 0.2,
+                 wrong_rate: float = 0.0, seed: int = 0):
+        self.payload = payload
+        self.model = model
+        self.wrong_rate = wrong_rate
+        super().__init__(latency_seconds=latency_seconds, seed=seed)
+
+    def chats(self) -> int:
+        with self.lock:
+            return len(self.requests)
+
+def make_text_pdf(pages) -> bytes:
+    """
+    Builds a minimal PDF with a real text layer. `pages` is a list of pages,
+    each a list of text lines. Used as fixture bills for the parser stages.
+    """
+    def escape(text: str) -> str:
+        return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+    objects = []  # object bodies; object number = index + 1
+    objects.append(b"<< /Type /Catalog /Pages 2 0 R >>")
+    objects.append(None)  # Pages, filled in below
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    page_refs = []
+    for lines in pages:
+        stream = "BT /F1 10 Tf 12 TL 50 750 Td " + " ".join(f"({escape(line)}) Tj T*" for line in lines) + " ET"
+        stream_bytes = stream.encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream_bytes), stream_bytes))
+        content_ref = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_ref
+        )
+        page_refs.append(len(objects))
+
+    kids = " ".join(f"{ref} 0 R" for ref in page_refs).encode("ascii")
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_refs))
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref_offset = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_offset)
+    return bytes(out)
+
+def make_bill_photo(pages, page_size=(1700, 2200), photo_size=(4032, 3024), font_px: int = 28,
+                    orientation: int = 6, noise: float = 6.0, quality: int = 95, seed: int = 0) -> bytes:
+    """
+    Builds a JPEG that looks like a phone photo of a paper bill: the first page
+    of `pages` rendered on a white sheet lying on a darker, noisy desk, stored
+    sideways with an EXIF orientation tag like a camera held upright.
+    Used as fixture photos for the image preprocessing stage.
+    """
+    import io
+    import numpy as np
+    from PIL import Image, ImageDraw, ImageFont
+
+    font = ImageFont.load_default(size=font_px)
+    sheet = Image.new("L", page_size, 245)
+    draw = ImageDraw.Draw(sheet)
+    margin = page_size[0] // 12
+    for i, line in enumerate(pages[0]):
+        draw.text((margin, margin + i * int(font_px * 1.6)), line, fill=20, font=font)
+
+    # The photo is taken upright (portrait); the sensor stores it landscape
+    width, height = photo_size[1], photo_size[0]
+    rnd = np.random.default_rng(seed)
+    desk = np.clip(rnd.normal(70, 12, (height, width)), 0, 255).astype(np.uint8)
+    photo = Image.fromarray(desk, "L").convert("RGB")
+    photo.paste(sheet.convert("RGB"), ((width - page_size[0]) // 2, (height - page_size[1]) // 2))
+    grain = rnd.normal(0, noise, (height, width, 1))
+    photo = Image.fromarray(np.clip(np.asarray(photo, dtype=np.float32) + grain, 0, 255).astype(np.uint8), "RGB")
+
+    # EXIF orientation 6 means "rotate 90 degrees clockwise to view"
+    stored = photo.transpose(Image.Transpose.ROTATE_90) if orientation == 6 else photo
+    exif = Image.Exif()
+    exif[0x0112] = orientation
+    buffer = io.BytesIO()
+    stored.save(buffer, format="JPEG", quality=quality, exif=exif)
+    return buffer.getvalue()
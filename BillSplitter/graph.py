@@ -1,154 +1,365 @@
 import os
+import sys
 import json
-from typing import TypedDict, Annotated, List, Dict, Any
-from langgraph.graph import StateGraph, END
+import operator
+from contextlib import ExitStack, closing
+from typing import TypedDict, Annotated, List, Dict, Any, Optional
 from dotenv import load_dotenv
 
 # Import our existing agents
+from agents import telemetry
 from agents.bill_parser import BillParserAgent, BillData
-from agents.split_calculator import SplitCalculatorAgent
+from agents.bill_record import BillRecord, as_bill_record
+from agents.contacts import get_contacts_store
+from agents.bill_history import BillHistory, account_of
+from agents.parse_cache import ParseCache
+from agents.split_calculator import SplitCalculatorAgent, ALLOCATION_LARGEST_REMAINDER
 from agents.whatsapp_notifier import WhatsAppNotifierAgent
 from agents.splitwise_agent import SplitwiseAgent
 
 load_dotenv()
 
 # 1. Define State
+# Reducers combine writes from nodes that run in the same step (parallel branches)
+def merge_errors(existing: Optional[List[str]], new: Optional[List[str]]) -> List[str]:
+    """Appends errors; an input of None clears them (a re-run of a checkpointed bill)."""
+    if new is None:
+        return []
+    if not new:
+        # Most node writes carry no errors; keep the existing list instead of copying it
+        return existing if existing is not None else []
+    return operator.add(existing or [], new)
+
+def merge_status(existing: Optional[Dict[str, str]], new: Optional[Dict[str, str]]) -> Dict[str, str]:
+    """Merges per-user notification statuses; later writes win for the same user."""
+    return {**(existing or {}), **(new or {})}
+
 class AgentState(TypedDict):
     bill_file_path: str
-    bill_data: Dict[str, Any] # Serialized BillData
-    contacts: Dict[str, str] # Email -> Phone (for Notifier)
-    phone_map: Dict[str, str] # Phone -> Email (for Calculator)
+    bill_data: BillRecord # Parsed bill, immutable and shared by reference between nodes
+    contacts: Dict[str, str] # Email -> E.164 Phone (for Notifier), only the bill's users
+    phone_map: Dict[str, str] # Bill Phone/Name -> Email (for Calculator), only the bill's lines
     splits: Dict[str, float]
     splitwise_expense_id: str
-    notification_status: Dict[str, str]
-    errors: List[str]
+    notification_status: Annotated[Dict[str, str], merge_status]
+    errors: Annotated[List[str], merge_errors]
 
 # 2. Define Nodes
 
 def load_config(state: AgentState) -> AgentState:
     print("--- Node: Load Config ---")
-    contacts_file = "contacts.json"
-    phone_map = {} # Phone -> Email
-    email_to_phone = {} # Email -> Phone
-    
-    if os.path.exists(contacts_file):
-        with open(contacts_file, "r") as f:
-            raw_contacts = json.load(f)
-            # Handle list of dicts
-            if isinstance(raw_contacts, list):
-                for c in raw_contacts:
-                    phone = c.get("phone")
-                    email = c.get("email_id")
-                    if phone and email:
-                        phone_map[phone] = email
-                        email_to_phone[email] = phone
-            elif isinstance(raw_contacts, dict):
-                # Legacy support - assume Name -> Phone, no email?
-                # Or maybe Phone -> Email?
-                # User said "created from contacts.json" which is list of dicts now.
-                pass
-    else:
-        print(f"Warning: {contacts_file} not found.")
-    
-    print(f"Loaded {len(phone_map)} contacts.")
-    return {"contacts": email_to_phone, "phone_map": phone_map, "errors": []}
+    # contacts.json is compiled into an indexed store (rebuilt only when the file changes);
+    # the bill's lines are resolved against it in calculate_splits
+    store = get_contacts_store()
+    if not os.path.exists(store.json_path):
+        print(f"Warning: {store.json_path} not found.")
+    print(f"Loaded {store.count()} contacts.")
+    return {}
 
 def parse_bill(state: AgentState) -> AgentState:
     print("--- Node: Parse Bill ---")
+    if state.get("bill_data"):
+        # Resumed from a checkpoint - reuse the stored parse instead of calling Gemini again
+        print("Reusing checkpointed bill data.")
+        return {}
     file_path = state["bill_file_path"]
     agent = BillParserAgent()
     try:
         bill_data_obj = agent.parse_bill(file_path)
-        # Convert Pydantic to dict for state serialization
-        return {"bill_data": bill_data_obj.dict()}
+        return {"bill_data": BillRecord.from_model(bill_data_obj)}
     except Exception as e:
-        return {"errors": state["errors"] + [f"Bill Parser Error: {str(e)}"]}
+        return {"errors": [f"Bill Parser Error: {str(e)}"]}
+
+async def aparse_bill(state: AgentState) -> AgentState:
+    # Used when the graph runs with ainvoke/astream (batch mode): the model call is awaited
+    # on the event loop instead of holding an executor thread for its whole duration
+    print("--- Node: Parse Bill ---")
+    if state.get("bill_data"):
+        print("Reusing checkpointed bill data.")
+        return {}
+    agent = BillParserAgent()
+    try:
+        bill_data_obj = await agent.aparse_bill(state["bill_file_path"])
+        return {"bill_data": BillRecord.from_model(bill_data_obj)}
+    except Exception as e:
+        return {"errors": [f"Bill Parser Error: {str(e)}"]}
 
 def calculate_splits(state: AgentState) -> AgentState:
     print("--- Node: Calculate Splits ---")
     if not state.get("bill_data"):
-        return {"errors": state["errors"] + ["No bill data found."]}
+        return {"errors": ["No bill data found."]}
+    if state.get("splits"):
+        print("Reusing checkpointed splits.")
+        return {}
         
     agent = SplitCalculatorAgent()
+    # Checkpoints written before bill records hold the bill as a dict
+    bill = as_bill_record(state["bill_data"])
     try:
-        # Pass phone map to agent
-        result = agent.calculate_split(state["bill_data"], state.get("phone_map"))
-        return {"splits": result.splits}
+        # Resolve the bill's lines to emails by normalized phone, falling back to name
+        store = get_contacts_store()
+        phone_map = store.user_map(bill.user_charges)
+        # Integer-cent allocation so splits always sum to the bill total
+        result = agent.calculate_split(bill, phone_map, allocation=ALLOCATION_LARGEST_REMAINDER)
     except Exception as e:
-        return {"errors": state["errors"] + [f"Split Calculator Error: {str(e)}"]}
+        return {"errors": [f"Split Calculator Error: {str(e)}"]}
+    record_history(bill, result, state.get("bill_file_path", ""))
+    return {"splits": result.splits, "phone_map": phone_map, "contacts": store.phones_for(result.splits)}
+
+def record_history(bill_data: dict, result, source: str) -> None:
+    # History is best-effort; a failure here must not stop the bill from being posted
+    try:
+        BillHistory().record(bill_data, result, account=account_of(bill_data), source=source)
+    except Exception as e:
+        print(f"Warning: could not record bill history: {e}")
 
 def add_to_splitwise(state: AgentState) -> AgentState:
     print("--- Node: Add to Splitwise ---")
+    if state.get("splitwise_expense_id"):
+        print("Expense already added in a previous run.")
+        return {}
     splits = state.get("splits")
-    bill_data = state.get("bill_data")
+    bill_data = as_bill_record(state.get("bill_data"))
     
     if not splits or not bill_data:
-        return {"errors": state["errors"] + ["Missing splits or bill data for Splitwise."]}
+        return {"errors": ["Missing splits or bill data for Splitwise."]}
 
-    total_amount = bill_data.get("total_amount", 0.0)
-    description = f"Wireless Bill for {bill_data.get('usage_period', '')}"
+    total_amount = bill_data.total_amount
+    description = f"Wireless Bill for {bill_data.usage_period}"
     
     agent = SplitwiseAgent()
     result = agent.add_expense(
         total_amount=total_amount,
         description=description,
-        splits=splits
+        splits=splits,
+        period=f"{bill_data.period_start}/{bill_data.period_end}"
     )
     
     if "expense_id" in result:
         return {"splitwise_expense_id": str(result["expense_id"])}
     else:
-        return {"errors": state["errors"] + [f"Splitwise Error: {result.get('error')}"]}
+        return {"errors": [f"Splitwise Error: {result.get('error')}"]}
 
-# def send_notifications(state: AgentState) -> AgentState:
-#     print("--- Node: Send Notifications ---")
-#     splits = state.get("splits")
-#     contacts = state.get("contacts") # Now Email -> Phone
+def send_notifications(state: AgentState) -> AgentState:
+    print("--- Node: Send Notifications ---")
+    splits = state.get("splits")
+    contacts = state.get("contacts") # Now Email -> Phone
     
-#     if not splits:
-#         return {"errors": state["errors"] + ["No splits to notify."]}
+    if not splits:
+        return {"errors": ["No splits to notify."]}
+
+    # Don't message anyone twice when a checkpointed bill is re-run
+    previous = state.get("notification_status") or {}
+    pending = {user: amount for user, amount in splits.items() if not _was_notified(previous.get(user))}
+    if not pending:
+        print("Everyone was already notified in a previous run.")
+        return {}
         
-#     agent = WhatsAppNotifierAgent()
-#     # Agent expects splits keys to match contacts keys.
-#     # Since splits are now Emails, and contacts is Email->Phone, this should match perfectly!
-#     results = agent.send_notifications(splits, contacts)
-#     return {"notification_status": results}
+    agent = WhatsAppNotifierAgent()
+    # Agent expects splits keys to match contacts keys.
+    # Since splits are now Emails, and contacts is Email->Phone, this should match perfectly!
+    results = agent.send_notifications(pending, contacts or {})
+    failed = [f"Notification Error: {user}: {status}" for user, status in results.items() if status.startswith("failed")]
+    return {"notification_status": results, "errors": failed}
+
+def _was_notified(status: Optional[str]) -> bool:
+    return bool(status) and (status.startswith("sent") or status == "mock_sent")
+
+def join_results(state: AgentState) -> AgentState:
+    # Runs once both branches have finished; their writes are already merged by the reducers
+    print("--- Node: Join Results ---")
+    statuses = state.get("notification_status") or {}
+    notified = sum(1 for status in statuses.values() if _was_notified(status))
+    expense_id = state.get("splitwise_expense_id") or "none"
+    print(f"Splitwise expense: {expense_id}; notified {notified}/{len(statuses)} users; {len(state.get('errors') or [])} errors.")
+    return {}
 
 # 3. Build Graph
-workflow = StateGraph(AgentState)
+# langgraph is imported and the workflow compiled on first use, so --help,
+# verify_splits.py and other imports of this module don't pay for them.
+def build_workflow():
+    from langgraph.graph import StateGraph, START, END
+    from langchain_core.runnables import RunnableLambda
+
+    workflow = StateGraph(AgentState)
+
+    # Every node is timed as a span under the bill's trace
+    for name, node in (("load_config", load_config),
+                       ("calculate_splits", calculate_splits), ("add_to_splitwise", add_to_splitwise),
+                       ("send_notifications", send_notifications), ("join_results", join_results)):
+        workflow.add_node(name, telemetry.traced_node(name, node))
+    # parse_bill has a sync and an async implementation; langgraph picks one per invoke/ainvoke
+    workflow.add_node("parse_bill", RunnableLambda(
+        telemetry.traced_node("parse_bill", parse_bill),
+        afunc=telemetry.traced_node("parse_bill", aparse_bill),
+        name="parse_bill"
+    ))
+
+    # load_config and parse_bill are independent, as are Splitwise posting and
+    # notifications; each pair runs in parallel and joins before the next step.
+    workflow.add_edge(START, "load_config")
+    workflow.add_edge(START, "parse_bill")
+    workflow.add_edge(["load_config", "parse_bill"], "calculate_splits")
+    workflow.add_edge("calculate_splits", "add_to_splitwise")
+    workflow.add_edge("calculate_splits", "send_notifications")
+    workflow.add_edge(["add_to_splitwise", "send_notifications"], "join_results")
+    workflow.add_edge("join_results", END)
+    return workflow
+
+def compile_app(checkpointer=None):
+    return build_workflow().compile(checkpointer=checkpointer)
 
-workflow.add_node("load_config", load_config)
-workflow.add_node("parse_bill", parse_bill)
-workflow.add_node("calculate_splits", calculate_splits)
-workflow.add_node("add_to_splitwise", add_to_splitwise)
-# workflow.add_node("send_notifications", send_notifications)
+_app = None
 
-workflow.set_entry_point("load_config")
+def get_app():
+    """Returns the default (un-checkpointed) app, compiling it on first call."""
+    global _app
+    if _app is None:
+        _app = compile_app()
+    return _app
 
-workflow.add_edge("load_config", "parse_bill")
-workflow.add_edge("parse_bill", "calculate_splits")
-workflow.add_edge("calculate_splits", "add_to_splitwise")
-workflow.add_edge("add_to_splitwise", END)
+def __getattr__(name):
+    # Keeps `graph.app` / `from graph import app` working without compiling at import time
+    if name == "app":
+        return get_app()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-app = workflow.compile()
+# 4. Checkpointing
+DEFAULT_CHECKPOINT_DB = os.path.join(".cache", "checkpoints.sqlite3")
+
+def checkpoint_config(bill_path: str) -> Dict[str, Any]:
+    """Config for a checkpointed run; the thread id is derived from the bill's content hash."""
+    return {"configurable": {"thread_id": f"bill-{ParseCache.hash_file(bill_path)}"}}
+
+# The record types the checkpoint may rebuild; anything else in a checkpoint is refused
+CHECKPOINT_TYPES = [("agents.bill_record", name) for name in ("BillRecord", "LineRecord", "ItemRecord")]
+
+def checkpoint_serde():
+    """Checkpoint serializer that restores the bill as a BillRecord."""
+    from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+    return JsonPlusSerializer(allowed_msgpack_modules=CHECKPOINT_TYPES)
+
+def resume_input(snapshot, bill_path: str):
+    """
+    Returns the input for a checkpointed invocation.
+
+    If the previous run stopped mid-graph (an exception escaped a node) the
+    snapshot has pending nodes and None resumes from them. Otherwise the run
+    restarts with a fresh input (clearing old errors), and nodes whose outputs
+    are already in the checkpointed state (bill_data, splits, expense id,
+    delivered notifications) are skipped.
+    """
+    if snapshot is not None and snapshot.next:
+        print(f"Resuming from checkpoint at: {', '.join(snapshot.next)}")
+        return None
+    return {"bill_file_path": bill_path, "errors": None}
+
+def run_single(bill_path: str, checkpoint_db: Optional[str] = DEFAULT_CHECKPOINT_DB, fresh: bool = False,
+               trace_prefix: Optional[str] = None) -> Dict[str, Any]:
+    with ExitStack() as stack:
+        run_app, config = get_app(), None
+        initial_state = {"bill_file_path": bill_path, "errors": []}
+
+        if checkpoint_db is not None:
+            import sqlite3
+            from langgraph.checkpoint.sqlite import SqliteSaver
+            os.makedirs(os.path.dirname(checkpoint_db) or ".", exist_ok=True)
+            # Built like SqliteSaver.from_conn_string, which takes no serializer
+            conn = stack.enter_context(closing(sqlite3.connect(checkpoint_db, check_same_thread=False)))
+            saver = SqliteSaver(conn, serde=checkpoint_serde())
+            run_app = compile_app(saver)
+            config = checkpoint_config(bill_path)
+            if fresh:
+                saver.delete_thread(config["configurable"]["thread_id"])
+            initial_state = resume_input(run_app.get_state(config), bill_path)
+
+        print("Starting Graph...")
+        final_state = {}
+        with telemetry.span("bill", telemetry.KIND_RUN, bill_path=bill_path) as bill_span:
+            for output in run_app.stream(initial_state, config, stream_mode=["updates", "values"]):
+                mode, chunk = output
+                if mode == "values":
+                    final_state = chunk
+                    continue
+                for key, value in chunk.items():
+                    print(f"Finished Node: {key}")
+                    # print(f"State Update: {value}")
+                
+        print("Graph Finished.")
+        spans = telemetry.tracer.spans(bill_span.trace_id)
+        for node_span in spans:
+            if node_span.kind == telemetry.KIND_NODE:
+                print(f"  {node_span.name}: {node_span.duration_seconds:.3f}s")
+        print(f"Bill cost: {telemetry.format_cost(telemetry.bill_cost(spans))}")
+        if trace_prefix:
+            telemetry.export_trace(bill_span.trace_id, trace_prefix)
+            print(f"Trace written to {trace_prefix}.jsonl and {trace_prefix}.otlp.json")
+        return final_state
+
+def run_batch_cli(pattern: str, concurrency: int, timeout: float, report_path: str,
+                  checkpoint_db: Optional[str] = DEFAULT_CHECKPOINT_DB, fresh: bool = False,
+                  trace_prefix: Optional[str] = None):
+    import time
+    import asyncio
+    from batch import collect_bill_paths, run_batch, write_report, summarize
+
+    bill_paths = collect_bill_paths(pattern)
+    if not bill_paths:
+        print(f"No bills found for {pattern}")
+        sys.exit(1)
+
+    print(f"Starting batch of {len(bill_paths)} bills (concurrency={concurrency}, timeout={timeout}s)...")
+    started = time.perf_counter()
+    async def _run():
+        if checkpoint_db is None:
+            return await run_batch(get_app(), bill_paths, concurrency=concurrency, timeout=timeout)
+
+        import aiosqlite
+        from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+        os.makedirs(os.path.dirname(checkpoint_db) or ".", exist_ok=True)
+        async with aiosqlite.connect(checkpoint_db) as conn:
+            saver = AsyncSqliteSaver(conn, serde=checkpoint_serde())
+            if fresh:
+                for path in bill_paths:
+                    await saver.adelete_thread(checkpoint_config(path)["configurable"]["thread_id"])
+            return await run_batch(
+                compile_app(saver), bill_paths, concurrency=concurrency, timeout=timeout,
+                config_for=checkpoint_config, input_for=resume_input
+            )
+
+    records = asyncio.run(_run())
+    summary = summarize(records, time.perf_counter() - started)
+
+    write_report(records, report_path)
+    if trace_prefix:
+        for record in records:
+            telemetry.export_trace(record["trace_id"], trace_prefix)
+        print(f"Traces written to {trace_prefix}.jsonl and {trace_prefix}.otlp.json")
+    print(f"Batch Finished: {json.dumps(summary)}")
+    print(f"Report written to {report_path}")
+    if summary["ok"] != summary["bills"]:
+        sys.exit(2)
 
 if __name__ == "__main__":
-    import sys
-    if len(sys.argv) < 2:
-        print("Usage: python graph.py <bill_path>")
+    import argparse
+
+    arg_parser = argparse.ArgumentParser(description="Run the bill splitter graph.")
+    arg_parser.add_argument("bill_path", nargs="?", help="Path to a single bill")
+    arg_parser.add_argument("--batch", metavar="DIR_OR_GLOB", help="Process every bill in a directory or glob concurrently")
+    arg_parser.add_argument("--concurrency", type=int, default=4, help="Max bills in flight in batch mode")
+    arg_parser.add_argument("--timeout", type=float, default=300.0, help="Per-bill timeout in seconds in batch mode")
+    arg_parser.add_argument("--report", default="batch_report.json", help="Batch report path (.json or .csv)")
+    arg_parser.add_argument("--checkpoint-db", default=DEFAULT_CHECKPOINT_DB, help="SQLite file for resumable runs")
+    arg_parser.add_argument("--no-checkpoint", action="store_true", help="Run without persistent checkpoints")
+    arg_parser.add_argument("--fresh", action="store_true", help="Discard any checkpoint for the bill(s) and start over")
+    arg_parser.add_argument("--trace", metavar="PREFIX", help="Write spans to PREFIX.jsonl and PREFIX.otlp.json (OpenTelemetry)")
+    args = arg_parser.parse_args()
+    checkpoint_db = None if args.no_checkpoint else args.checkpoint_db
+
+    if args.batch:
+        run_batch_cli(args.batch, args.concurrency, args.timeout, args.report, checkpoint_db, args.fresh, args.trace)
+    elif args.bill_path:
+        run_single(args.bill_path, checkpoint_db, args.fresh, args.trace)
+    else:
+        arg_parser.print_usage()
         sys.exit(1)
-        
-    bill_path = sys.argv[1]
-    
-    initial_state = {
-        "bill_file_path": bill_path,
-        "errors": []
-    }
-    
-    print("Starting Graph...")
-    for output in app.stream(initial_state):
-        for key, value in output.items():
-            print(f"Finished Node: {key}")
-            # print(f"State Update: {value}")
-            
-    print("Graph Finished.")
@@ -5,21 +5,23 @@ from dotenv import load_dotenv
 from agents.bill_parser import BillParserAgent
 from agents.split_calculator import SplitCalculatorAgent
 from agents.whatsapp_notifier import WhatsAppNotifierAgent
+from agents.contacts import get_contacts_store
+from agents.bill_history import BillHistory, account_of
 
 # Load environment variables
 load_dotenv()
 
-def main():
-    if len(sys.argv) < 2:
-        print("Usage: python main.py <path_to_bill_file>")
-        sys.exit(1)
+def run(bill_path, notify=None):
+    """
+    Parses, splits and (optionally) notifies for one bill.
 
-    bill_path = sys.argv[1]
-    
-    if not os.path.exists(bill_path):
-        print(f"Error: File not found at {bill_path}")
-        sys.exit(1)
+    Args:
+        bill_path: Path to the bill file.
+        notify: Send WhatsApp notifications; None asks interactively.
 
+    Returns:
+        Dict with 'splits' and 'notifications' (None if skipped), or None if parsing failed.
+    """
     print(f"--- Starting Bill Splitter Agentic System ---")
     print(f"Processing file: {bill_path}")
 
@@ -36,42 +38,56 @@ def main():
         # print(json.dumps(bill_data, indent=2)) # Debug
     except Exception as e:
         print(f"Error parsing bill: {e}")
-        sys.exit(1)
+        return None
 
     # 3. Calculate Splits
     print("\n[2/3] Calculating Splits...")
-    # TODO: Load user config from a file or env. For now, we'll infer from bill or use a dummy map.
-    # In a real app, we'd have a mapping of Name -> Phone.
-    # Let's try to load a 'contacts.json' if it exists, otherwise prompt or warn.
-    
-    contacts = {}
-    contacts_file = "contacts.json"
-    if os.path.exists(contacts_file):
-        with open(contacts_file, "r") as f:
-            contacts = json.load(f)
-    else:
-        print(f"Warning: {contacts_file} not found. Notifications might fail if phone numbers are missing.")
-        # Create a dummy contacts file for the user to fill
-        with open(contacts_file, "w") as f:
-            json.dump({"Alice": "+1234567890", "Bob": "+0987654321"}, f, indent=2)
-        print(f"Created template {contacts_file}. Please update it with real numbers.")
+    # contacts.json (list of {name, phone, email_id}) gives Phone/Name -> Email for the
+    # calculator and Email -> Phone for the notifier, same as the graph.
+    store = get_contacts_store()
+    bill_dict = bill_data.model_dump()
+    phone_map = store.user_map(bill_dict["user_charges"])
+    if not phone_map:
+        print("Warning: no contacts matched. Splits will be keyed by name and notifications skipped.")
 
-    split_result = calculator_agent.calculate_split(bill_data, contacts)
+    split_result = calculator_agent.calculate_split(bill_dict, phone_map)
+    try:
+        BillHistory().record(bill_dict, split_result, account=account_of(bill_dict), source=bill_path)
+    except Exception as e:
+        print(f"Warning: could not record bill history: {e}")
+    contacts = store.phones_for(split_result.splits)
     print("Splits calculated:")
-    print(json.dumps(split_result.user_splits, indent=2))
+    print(json.dumps(split_result.splits, indent=2))
 
     # 4. Notify Users
     print("\n[3/3] Sending Notifications...")
     # Ask for confirmation before sending?
-    confirm = input("Send WhatsApp notifications? (y/n): ")
-    if confirm.lower() == 'y':
-        results = notifier_agent.send_notifications(split_result.user_splits, contacts)
+    if notify is None:
+        notify = input("Send WhatsApp notifications? (y/n): ").lower() == 'y'
+    results = None
+    if notify:
+        results = notifier_agent.send_notifications(split_result.splits, contacts)
         print("Notification Results:")
         print(json.dumps(results, indent=2))
     else:
         print("Skipping notifications.")
 
     print("\n--- Process Complete ---")
+    return {"splits": split_result.splits, "notifications": results}
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python main.py <path_to_bill_file>")
+        sys.exit(1)
+
+    bill_path = sys.argv[1]
+    
+    if not os.path.exists(bill_path):
+        print(f"Error: File not found at {bill_path}")
+        sys.exit(1)
+
+    if run(bill_path) is None:
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,143 @@
+import os
+import time
+import threading
+from typing import Dict, List, Optional
+from requests import Request, sessions
+from splitwise import Splitwise
+from agents import resilience, telemetry
+
+class PooledSplitwise(Splitwise):
+    """
+    Splitwise client that reuses HTTP connections.
+
+    The SDK opens a new requests Session (and TLS connection) for every call.
+    This subclass keeps one Session per thread so keep-alive connections are reused.
+    SPLITWISE_BASE_URL points the client at another host (a proxy or a local fake).
+    """
+
+    def __init__(self, *args, base_url: Optional[str] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._local = threading.local()
+        self.base_url = base_url or os.environ.get("SPLITWISE_BASE_URL") or Splitwise.SPLITWISE_BASE_URL
+        if not self.base_url.endswith("/"):
+            self.base_url += "/"
+
+    def _session(self) -> sessions.Session:
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = sessions.Session()
+            self._local.session = session
+        return session
+
+    # Overrides the SDK's name-mangled private request method
+    def _Splitwise__makeRequest(self, url, method="GET", data=None, auth=None, files=None):
+        headers = {}
+
+        if auth is None:
+            if self.auth:
+                auth = self.auth
+            elif self.api_key:
+                headers = {'Authorization': 'Bearer {}'.format(self.api_key)}
+
+        data = Splitwise._Splitwise__handleUppercaseBoolean(data)
+
+        if self.base_url != Splitwise.SPLITWISE_BASE_URL and url.startswith(Splitwise.SPLITWISE_BASE_URL):
+            url = self.base_url + url[len(Splitwise.SPLITWISE_BASE_URL):]
+
+        prep_req = Request(method=method, url=url, headers=headers, data=data, auth=auth, files=files).prepare()
+        body = prep_req.body or b""
+        endpoint = url.split("/api/v3.0/", 1)[-1].split("/", 1)[0]
+        with telemetry.span(f"splitwise.http.{endpoint}", telemetry.KIND_SPLITWISE, method=method,
+                            bytes_sent=len(body.encode("utf-8") if isinstance(body, str) else body)) as call_span:
+            def send():
+                # Bounded by the bill's deadline and the "splitwise" policy's call_timeout
+                response = self._session().send(prep_req, timeout=resilience.request_timeout(
+                    resilience.policy_for("splitwise").call_timeout))
+                call_span.set(status=response.status_code, bytes_received=len(response.content))
+                return self._Splitwise__handleResponse(response)
+
+            if method == "GET":
+                # Reads are safe to repeat; writes are retried by their callers (see _create_expense)
+                return resilience.call("splitwise", send)
+            return send()
+
+_client_lock = threading.Lock()
+_client: Optional[PooledSplitwise] = None
+_client_credentials = None
+
+def get_pooled_client() -> PooledSplitwise:
+    """Returns the process-wide Splitwise client, rebuilt only if credentials or the base URL change."""
+    global _client, _client_credentials
+    credentials = (
+        os.environ.get("SPLITWISE_CONSUMER_KEY"),
+        os.environ.get("SPLITWISE_CONSUMER_SECRET"),
+        os.environ.get("SPLITWISE_API_KEY"),
+        os.environ.get("SPLITWISE_BASE_URL"),
+    )
+    with _client_lock:
+        if _client is None or _client_credentials != credentials:
+            _client = PooledSplitwise(credentials[0], credentials[1], api_key=credentials[2], base_url=credentials[3])
+            _client_credentials = credentials
+        return _client
+
+class ResolvedGroup:
+    """A Splitwise group with its member lookups precomputed."""
+    __slots__ = ("group", "current_user", "member_ids")
+
+    def __init__(self, group, current_user):
+        self.group = group
+        self.current_user = current_user
+        # Email (lowercased) -> Member ID
+        self.member_ids: Dict[str, int] = {
+            m.getEmail().lower(): m.getId() for m in group.getMembers() if m.getEmail()
+        }
+        if current_user.getEmail():
+            self.member_ids.setdefault(current_user.getEmail().lower(), current_user.getId())
+
+    def member_id(self, email: str) -> Optional[int]:
+        return self.member_ids.get(email.lower())
+
+class GroupCache:
+    """
+    TTL cache of Splitwise groups and the current user.
+
+    A single getGroups()/getCurrentUser() pair fills the cache; every
+    group_name_filter resolved within the TTL is then served from memory.
+    """
+
+    def __init__(self, ttl_seconds: float = 300.0):
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._groups: Optional[List] = None
+        self._current_user = None
+        self._fetched_at = 0.0
+        self._resolved: Dict[str, Optional[ResolvedGroup]] = {}
+
+    def _expired(self) -> bool:
+        return self._groups is None or time.monotonic() - self._fetched_at > self.ttl_seconds
+
+    def resolve(self, sObj: Splitwise, group_name_filter: str, refresh: bool = False) -> Optional[ResolvedGroup]:
+        """Returns the first group whose name contains the filter (case-insensitive), or None."""
+        key = group_name_filter.lower()
+        with self._lock:
+            if refresh or self._expired():
+                self._groups = sObj.getGroups()
+                self._current_user = sObj.getCurrentUser()
+                self._fetched_at = time.monotonic()
+                self._resolved = {}
+
+            if key not in self._resolved:
+                target_group = None
+                for group in self._groups:
+                    if key in group.getName().lower():
+                        target_group = group
+                        break
+                self._resolved[key] = ResolvedGroup(target_group, self._current_user) if target_group else None
+            return self._resolved[key]
+
+    def invalidate(self) -> None:
+        """Drops all cached groups so the next resolve refetches them."""
+        with self._lock:
+            self._groups = None
+            self._current_user = None
+            self._resolved = {}
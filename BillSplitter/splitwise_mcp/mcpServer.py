@@ -1,26 +1,84 @@
 from fastmcp import FastMCP
 from dotenv import load_dotenv
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse
 from splitwise import Splitwise
 from splitwise.expense import Expense
 from splitwise.user import ExpenseUser
+from splitwise.exception import SplitwiseException
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
 import os
+import threading
+from agents import resilience, telemetry
+from agents.bill_parser import BillParserAgent, BillData
+from agents.split_calculator import SplitCalculatorAgent, SplitResult
+from .client import get_pooled_client, GroupCache, ResolvedGroup
+from .metrics import ToolMetrics, ToolMetricsMiddleware
 from .model import (
     GetGroupInformationRequest, 
     GroupInfo, 
     GroupMember, 
     Balance,
     AddExpenseRequest, 
-    AddExpenseResponse
+    AddExpenseResponse,
+    AddExpensesBulkRequest,
+    ParseBillRequest,
+    CalculateSplitRequest
 )
 
 mcp = FastMCP("Bill Splitter 🚀")
 
-def get_splitwise_client():
-    return Splitwise(
-        os.environ.get("SPLITWISE_CONSUMER_KEY"),
-        os.environ.get("SPLITWISE_CONSUMER_SECRET"),
-        api_key=os.environ.get("SPLITWISE_API_KEY")
-    )
+# Per-tool latency histograms, served on /metrics
+tool_metrics = ToolMetrics()
+mcp.add_middleware(ToolMetricsMiddleware(tool_metrics))
+
+# Group name filter -> group, shared by all tools in this process
+group_cache = GroupCache(ttl_seconds=float(os.environ.get("SPLITWISE_GROUP_CACHE_TTL", 300)))
+
+# parse_bill only reads bills from under this directory
+DEFAULT_BILLS_DIR = "bills"
+
+def bill_path(file_path: str) -> str:
+    """Resolves a requested bill path (relative to the bills directory); refuses paths outside it."""
+    bills_dir = os.path.realpath(os.environ.get("BILL_SPLITTER_BILLS_DIR", DEFAULT_BILLS_DIR))
+    path = os.path.realpath(os.path.join(bills_dir, file_path))
+    if os.path.commonpath([bills_dir, path]) != bills_dir:
+        raise ValueError(f"'{file_path}' is outside the bills directory.")
+    return path
+
+def get_splitwise_client() -> Splitwise:
+    return get_pooled_client()
+
+# Agents kept warm for the life of the server (the parser holds the Gemini client)
+_agents_lock = threading.Lock()
+_bill_parser: Optional[BillParserAgent] = None
+split_calculator = SplitCalculatorAgent()
+warm_status: Dict[str, str] = {}
+
+def get_bill_parser() -> BillParserAgent:
+    global _bill_parser
+    with _agents_lock:
+        if _bill_parser is None:
+            _bill_parser = BillParserAgent()
+        return _bill_parser
+
+def warm_up(group_name_filter: str = "at&t") -> Dict[str, str]:
+    """
+    Builds the Splitwise client, group cache entry and Gemini client up front so
+    the first tool calls don't pay for them. Failures are reported, not raised.
+    """
+    try:
+        group_cache.resolve(get_splitwise_client(), group_name_filter)
+        warm_status["splitwise"] = "ok"
+    except Exception as e:
+        warm_status["splitwise"] = f"failed ({str(e)})"
+    try:
+        get_bill_parser().llm
+        warm_status["gemini"] = "ok"
+    except Exception as e:
+        warm_status["gemini"] = f"failed ({str(e)})"
+    return dict(warm_status)
 
 @mcp.tool
 def add(a: int, b: int) -> int:
@@ -35,14 +93,10 @@ def get_group_information(request: GetGroupInformationRequest) -> GroupInfo:
     sObj = get_splitwise_client()
     
     # 1. Find Group
-    target_group = None
-    for group in sObj.getGroups():
-        if request.group_name_filter.lower() in group.getName().lower():
-            target_group = group
-            break
-            
-    if not target_group:
+    resolved = group_cache.resolve(sObj, request.group_name_filter, refresh=request.refresh)
+    if not resolved:
         raise ValueError(f"Group matching '{request.group_name_filter}' not found.")
+    target_group = resolved.group
     
     # Map to Pydantic Model
     members = []
@@ -65,21 +119,21 @@ def get_group_information(request: GetGroupInformationRequest) -> GroupInfo:
         members=members
     )
 
-def _add_expense_to_splitwise_logic(request: AddExpenseRequest) -> AddExpenseResponse:
+def _resolve_group_for(sObj: Splitwise, request: AddExpenseRequest) -> Optional[ResolvedGroup]:
+    """Finds the request's group (cached; members are refetched once if an email is unknown)."""
+    resolved = group_cache.resolve(sObj, request.group_name_filter)
+    if request.splits and resolved and any(resolved.member_id(email) is None for email in request.splits):
+        resolved = group_cache.resolve(sObj, request.group_name_filter, refresh=True)
+    return resolved
+
+def _build_expense(request: AddExpenseRequest, resolved: Optional[ResolvedGroup]) -> Tuple[Optional[Expense], Optional[AddExpenseResponse]]:
     """
-    Internal logic for adding an expense.
+    Builds and validates the Expense for a request.
+    Returns (expense, None) on success or (None, failure response).
     """
-    sObj = get_splitwise_client()
-    
-    # 1. Find Group
-    target_group = None
-    for group in sObj.getGroups():
-        if request.group_name_filter.lower() in group.getName().lower():
-            target_group = group
-            break
-            
-    if not target_group:
-        return AddExpenseResponse(success=False, message=f"Group matching '{request.group_name_filter}' not found.")
+    if not resolved:
+        return None, AddExpenseResponse(success=False, message=f"Group matching '{request.group_name_filter}' not found.")
+    target_group = resolved.group
 
     # 2. Prepare Expense
     expense = Expense()
@@ -90,23 +144,17 @@ def _add_expense_to_splitwise_logic(request: AddExpenseRequest) -> AddExpenseRes
     
     # 3. Handle Splits
     users = []
-    current_user = sObj.getCurrentUser()
+    current_user = resolved.current_user
     group_members = target_group.getMembers()
 
     if request.splits:
-        # Map emails to Member IDs
-        member_map = {m.getEmail(): m.getId() for m in group_members if m.getEmail()}
-        
         total_owed_check = 0.0
         
         for email, amount in request.splits.items():
-            member_id = member_map.get(email)
+            # Precomputed Email -> Member ID index (includes the current user)
+            member_id = resolved.member_id(email)
             if not member_id:
-                 # Check if it's the current user?
-                 if email == current_user.getEmail():
-                     member_id = current_user.getId()
-                 else:
-                     return AddExpenseResponse(success=False, message=f"Member {email} not found.")
+                return None, AddExpenseResponse(success=False, message=f"Member {email} not found.")
             
             u = ExpenseUser()
             u.setId(member_id)
@@ -124,13 +172,13 @@ def _add_expense_to_splitwise_logic(request: AddExpenseRequest) -> AddExpenseRes
             
         # Validation
         if abs(total_owed_check - request.total_amount) > 0.05:
-            return AddExpenseResponse(success=False, message=f"Splits total ({total_owed_check}) does not match expense total ({request.total_amount}).")
+            return None, AddExpenseResponse(success=False, message=f"Splits total ({total_owed_check}) does not match expense total ({request.total_amount}).")
             
     else:
         # Equal Split Logic
         num_members = len(group_members)
         if num_members == 0:
-             return AddExpenseResponse(success=False, message="Group has no members.")
+             return None, AddExpenseResponse(success=False, message="Group has no members.")
              
         split_amount = round(request.total_amount / num_members, 2)
         
@@ -157,15 +205,92 @@ def _add_expense_to_splitwise_logic(request: AddExpenseRequest) -> AddExpenseRes
             users.append(u)
 
     expense.setUsers(users)
+    return expense, None
 
-    # 4. Create Expense
-    expense, errors = sObj.createExpense(expense)
+def _create_expense(sObj: Splitwise, expense: Expense) -> AddExpenseResponse:
+    """
+    Submits an expense, backing off on rate limits (429) and connection
+    failures. Timeouts and 5xx replies are not retried: the expense may
+    already have been created.
+    """
+    def submit():
+        # createExpense rewrites the object's __dict__, so submit a copy each attempt
+        attempt_expense = Expense()
+        attempt_expense.__dict__.update(expense.__dict__)
+        return sObj.createExpense(attempt_expense)
+
+    with telemetry.span("splitwise.create_expense", telemetry.KIND_SPLITWISE) as expense_span:
+        try:
+            created, errors = resilience.call("splitwise", submit, classify=resilience.not_delivered)
+        except (SplitwiseException, resilience.CircuitOpenError, resilience.DeadlineExceeded) as e:
+            expense_span.error = str(e)
+            return AddExpenseResponse(success=False, message=f"Error creating expense: {str(e)}")
     
     if errors:
         error_msg = str(errors.getErrors()) if hasattr(errors, 'getErrors') else str(errors)
         return AddExpenseResponse(success=False, message=f"Error creating expense: {error_msg}")
         
-    return AddExpenseResponse(success=True, expense_id=expense.getId(), message="Expense created successfully!")
+    return AddExpenseResponse(success=True, expense_id=created.getId(), message="Expense created successfully!")
+
+def _add_expense_to_splitwise_logic(request: AddExpenseRequest) -> AddExpenseResponse:
+    """
+    Internal logic for adding an expense.
+    """
+    sObj = get_splitwise_client()
+    
+    # 1. Find Group
+    resolved = _resolve_group_for(sObj, request)
+
+    # 2-3. Prepare Expense and Splits
+    expense, failure = _build_expense(request, resolved)
+    if failure:
+        return failure
+
+    # 4. Create Expense
+    return _create_expense(sObj, expense)
+
+def _add_expenses_bulk_logic(request: AddExpensesBulkRequest) -> List[AddExpenseResponse]:
+    """
+    Internal logic for adding many expenses.
+    Groups are resolved once per distinct filter, then expenses are submitted in parallel.
+    """
+    sObj = get_splitwise_client()
+    results: List[Optional[AddExpenseResponse]] = [None] * len(request.expenses)
+
+    # 1. Resolve each distinct group once (refreshing at most once if any email is unknown)
+    resolved_by_filter: Dict[str, Optional[ResolvedGroup]] = {}
+    refreshed = set()
+    for item in request.expenses:
+        key = item.group_name_filter.lower()
+        if key not in resolved_by_filter:
+            resolved_by_filter[key] = group_cache.resolve(sObj, item.group_name_filter)
+        resolved = resolved_by_filter[key]
+        if key not in refreshed and resolved and item.splits and any(
+            resolved.member_id(email) is None for email in item.splits
+        ):
+            # Unknown emails after this are rejected by _build_expense without another fetch
+            refreshed.add(key)
+            resolved_by_filter[key] = group_cache.resolve(sObj, item.group_name_filter, refresh=True)
+
+    # 2. Build and validate every expense before anything is submitted
+    pending = []
+    for i, item in enumerate(request.expenses):
+        expense, failure = _build_expense(item, resolved_by_filter[item.group_name_filter.lower()])
+        if failure:
+            results[i] = failure
+        else:
+            pending.append((i, expense))
+
+    # 3. Submit with bounded parallelism
+    with ThreadPoolExecutor(max_workers=max(1, request.max_parallel)) as executor:
+        futures = {executor.submit(telemetry.run_in_context(_create_expense), sObj, expense): i for i, expense in pending}
+        for future, i in futures.items():
+            try:
+                results[i] = future.result()
+            except Exception as e:
+                results[i] = AddExpenseResponse(success=False, message=f"Error creating expense: {str(e)}")
+
+    return results
 
 @mcp.tool
 def add_expense_to_splitwise(request: AddExpenseRequest) -> AddExpenseResponse:
@@ -173,12 +298,61 @@ def add_expense_to_splitwise(request: AddExpenseRequest) -> AddExpenseResponse:
     Adds an expense to a Splitwise group.
     """
     return _add_expense_to_splitwise_logic(request)
+
+@mcp.tool
+def add_expenses_bulk(request: AddExpensesBulkRequest) -> List[AddExpenseResponse]:
     """
-    Adds an expense to a Splitwise group.
+    Adds many expenses in one call. Returns one result per expense, in order.
     """
+    return _add_expenses_bulk_logic(request)
 
+@mcp.tool
+async def parse_bill(request: ParseBillRequest) -> BillData:
+    """
+    Parses a bill file in the server's bills directory into structured data (cached by file content).
+    """
+    path = bill_path(request.file_path)
+    # Awaited on the server's loop; concurrent requests for the same bill share one model call
+    return await get_bill_parser().aparse_bill(path, bypass_cache=request.bypass_cache)
+
+@mcp.tool
+def calculate_split(request: CalculateSplitRequest) -> SplitResult:
+    """
+    Splits a parsed bill between users (emails when a user map is given).
+    """
+    return split_calculator.calculate_split(
+        request.bill_data, request.user_map,
+        allocation=request.allocation, shared_weights=request.shared_weights
+    )
+
+@mcp.tool
+def invalidate_splitwise_cache() -> str:
+    """
+    Clears the cached Splitwise groups, members and current user.
+    Use after group membership changes in Splitwise.
+    """
+    group_cache.invalidate()
+    return "Splitwise group cache cleared."
+
+
+@mcp.custom_route("/metrics", methods=["GET"])
+async def metrics(request: Request) -> PlainTextResponse:
+    return PlainTextResponse(tool_metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+@mcp.custom_route("/health", methods=["GET"])
+async def health(request: Request) -> JSONResponse:
+    return JSONResponse({"status": "ok", "warm": warm_status, "tools": tool_metrics.snapshot()})
 
 if __name__ == "__main__":
+    import argparse
     load_dotenv()
-    port = int(os.environ.get("MCP_PORT", 8000))
-    mcp.run(transport="http", port=port)
\ No newline at end of file
+
+    arg_parser = argparse.ArgumentParser(description="Run the Bill Splitter MCP server (HTTP).")
+    arg_parser.add_argument("--host", default=os.environ.get("MCP_HOST", "127.0.0.1"))
+    arg_parser.add_argument("--port", type=int, default=int(os.environ.get("MCP_PORT", 8000)))
+    arg_parser.add_argument("--no-warm", action="store_true", help="Don't build the Splitwise/Gemini clients before serving")
+    args = arg_parser.parse_args()
+
+    if not args.no_warm:
+        print(f"Warm-up: {warm_up()}")
+    mcp.run(transport="http", host=args.host, port=args.port)
\ No newline at end of file
@@ -0,0 +1,108 @@
+import time
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+from fastmcp.server.middleware import Middleware
+
+# Upper bounds in seconds; Splitwise calls are ~0.2-1s, Gemini parses several seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+class LatencyHistogram:
+    """Cumulative latency histogram (Prometheus style buckets) for one tool."""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+
+    def observe(self, seconds: float, error: bool = False) -> None:
+        for i, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                self.counts[i] += 1
+        self.count += 1
+        self.total_seconds += seconds
+        if error:
+            self.errors += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-quantile (None if empty or beyond the last bucket)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        for bound, cumulative in zip(self.buckets, self.counts):
+            if cumulative >= rank:
+                return bound
+        return None
+
+class ToolMetrics:
+    """Thread-safe per-tool latency histograms, rendered in the Prometheus text format."""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        self._tools: Dict[str, LatencyHistogram] = {}
+
+    def observe(self, tool: str, seconds: float, error: bool = False) -> None:
+        with self._lock:
+            histogram = self._tools.get(tool)
+            if histogram is None:
+                histogram = self._tools[tool] = LatencyHistogram(self.buckets)
+            histogram.observe(seconds, error)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._tools.clear()
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """Per-tool count, errors, mean and approximate p50/p99 latency in seconds."""
+        with self._lock:
+            return {
+                tool: {
+                    "count": h.count,
+                    "errors": h.errors,
+                    "mean_seconds": h.total_seconds / h.count if h.count else None,
+                    "p50_seconds": h.quantile(0.5),
+                    "p99_seconds": h.quantile(0.99),
+                }
+                for tool, h in sorted(self._tools.items())
+            }
+
+    def render_prometheus(self) -> str:
+        lines: List[str] = [
+            "# HELP mcp_tool_latency_seconds Tool call latency.",
+            "# TYPE mcp_tool_latency_seconds histogram",
+        ]
+        errors: List[Tuple[str, int]] = []
+        with self._lock:
+            for tool, h in sorted(self._tools.items()):
+                for bound, cumulative in zip(h.buckets, h.counts):
+                    lines.append(f'mcp_tool_latency_seconds_bucket{{tool="{tool}",le="{bound}"}} {cumulative}')
+                lines.append(f'mcp_tool_latency_seconds_bucket{{tool="{tool}",le="+Inf"}} {h.count}')
+                lines.append(f'mcp_tool_latency_seconds_sum{{tool="{tool}"}} {h.total_seconds:.6f}')
+                lines.append(f'mcp_tool_latency_seconds_count{{tool="{tool}"}} {h.count}')
+                errors.append((tool, h.errors))
+        lines.append("# HELP mcp_tool_errors_total Tool calls that raised.")
+        lines.append("# TYPE mcp_tool_errors_total counter")
+        lines.extend(f'mcp_tool_errors_total{{tool="{tool}"}} {count}' for tool, count in errors)
+        lines.append("# HELP mcp_uptime_seconds Seconds since the server started.")
+        lines.append("# TYPE mcp_uptime_seconds gauge")
+        lines.append(f"mcp_uptime_seconds {time.time() - self.started_at:.1f}")
+        return "\n".join(lines) + "\n"
+
+class ToolMetricsMiddleware(Middleware):
+    """Records the latency of every tool call into a ToolMetrics registry."""
+
+    def __init__(self, metrics: ToolMetrics):
+        self.metrics = metrics
+
+    async def on_call_tool(self, context, call_next):
+        started = time.perf_counter()
+        try:
+            result = await call_next(context)
+        except Exception:
+            self.metrics.observe(context.message.name, time.perf_counter() - started, error=True)
+            raise
+        self.metrics.observe(context.message.name, time.perf_counter() - started)
+        return result
@@ -21,6 +21,7 @@ class GroupInfo(BaseModel):
 
 class GetGroupInformationRequest(BaseModel):
     group_name_filter: str = Field("at&t", description="Substring to find the group")
+    refresh: bool = Field(False, description="Bypass the group cache to get up-to-date balances")
 
 class AddExpenseRequest(BaseModel):
     total_amount: float = Field(..., description="The total cost")
@@ -32,3 +33,17 @@ class AddExpenseResponse(BaseModel):
     success: bool
     expense_id: Optional[int] = None
     message: str
+
+class AddExpensesBulkRequest(BaseModel):
+    expenses: List[AddExpenseRequest] = Field(..., description="Expenses to create")
+    max_parallel: int = Field(4, description="Maximum number of expenses submitted concurrently")
+
+class ParseBillRequest(BaseModel):
+    file_path: str = Field(..., description="Path of the bill (PDF or image) in the server's bills directory")
+    bypass_cache: bool = Field(False, description="Ignore the parse cache and parse again")
+
+class CalculateSplitRequest(BaseModel):
+    bill_data: Dict[str, Any] = Field(..., description="Parsed bill (BillData as a dict)")
+    user_map: Optional[Dict[str, str]] = Field(None, description="Phone number -> Splitwise email")
+    allocation: str = Field("round", description="'round' or 'largest_remainder'")
+    shared_weights: Optional[Dict[str, float]] = Field(None, description="Per-user weights for shared costs")
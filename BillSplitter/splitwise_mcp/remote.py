@@ -0,0 +1,70 @@
+import asyncio
+import threading
+from typing import Any, Dict, Optional
+
+class MCPRemote:
+    """
+    Synchronous wrapper around a fastmcp Client connected to a running server.
+
+    The client runs on a private event loop thread and its session is opened
+    once and reused, so each call is a single request on a warm connection
+    instead of a new handshake. Safe to use from several threads.
+    """
+
+    def __init__(self, target: Any, timeout: float = 120.0):
+        # target: server URL (e.g. "http://127.0.0.1:8000/mcp") or a FastMCP instance (in-memory)
+        self.target = target
+        self.timeout = timeout
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._client = None
+        self._lock = threading.Lock()
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="mcp-remote", daemon=True).start()
+            return self._loop
+
+    async def _connected_client(self):
+        if self._client is None:
+            from fastmcp import Client
+            client = Client(self.target, timeout=self.timeout)
+            await client.__aenter__()
+            self._client = client
+        return self._client
+
+    async def _call(self, name: str, arguments: Dict[str, Any]) -> Any:
+        client = await self._connected_client()
+        result = await client.call_tool(name, arguments)
+        structured = result.structured_content
+        # Non-object return values are wrapped as {"result": ...}
+        if isinstance(structured, dict) and set(structured) == {"result"}:
+            return structured["result"]
+        return structured
+
+    def call_tool(self, name: str, arguments: Dict[str, Any]) -> Any:
+        """Calls a tool and returns its structured result (a dict for model results)."""
+        future = asyncio.run_coroutine_threadsafe(self._call(name, arguments), self._ensure_loop())
+        return future.result(self.timeout)
+
+    def close(self) -> None:
+        with self._lock:
+            loop, client = self._loop, self._client
+            self._loop, self._client = None, None
+        if loop is None:
+            return
+        if client is not None:
+            asyncio.run_coroutine_threadsafe(client.__aexit__(None, None, None), loop).result(self.timeout)
+        loop.call_soon_threadsafe(loop.stop)
+
+_remotes_lock = threading.Lock()
+_remotes: Dict[str, MCPRemote] = {}
+
+def get_remote(url: str) -> MCPRemote:
+    """Returns the process-wide remote for a server URL."""
+    with _remotes_lock:
+        remote = _remotes.get(url)
+        if remote is None:
+            remote = _remotes[url] = MCPRemote(url)
+        return remote
@@ -0,0 +1,146 @@
+import unittest
+import sys
+import os
+import asyncio
+import tempfile
+import threading
+from unittest import mock
+
+# Add parent directory to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import graph
+from agents import bill_parser
+from agents.bill_parser import BillParserAgent, BillData
+from agents.single_flight import SingleFlight
+from benchmarks.fakes import FakeChatModel
+
+PAYLOAD = {
+    "total_amount": 100.0,
+    "period_start": "2025-11-01",
+    "period_end": "2025-12-01",
+    "usage_period": "Nov 2025",
+    "shared_costs": [{"description": "Base Plan", "amount": 20.0, "category": "Plan"}],
+    "user_charges": [
+        {"name": "Alice", "phone_number": None, "items": [], "total": 30.0},
+        {"name": "Bob", "phone_number": None, "items": [], "total": 50.0}
+    ]
+}
+
+class TestSharedParse(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.llm = FakeChatModel(PAYLOAD, latency_seconds=0.3)
+        patcher = mock.patch.object(bill_parser, "shared_llm", return_value=self.llm)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def bill(self, name: str, content: bytes) -> str:
+        path = os.path.join(self.tmp.name, name)
+        with open(path, "wb") as f:
+            f.write(content)
+        return path
+
+    def test_concurrent_threads_share_one_llm_call(self):
+        path = self.bill("bill.png", b"same bytes")
+        copy = self.bill("copy.png", b"same bytes")
+        agents = [BillParserAgent(use_cache=False) for _ in range(4)]
+        results = [None] * 4
+
+        def parse(i):
+            results[i] = agents[i].parse_bill(path if i % 2 else copy)
+        threads = [threading.Thread(target=parse, args=(i,)) for i in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(self.llm.calls, 1)
+        self.assertTrue(all(r == BillData(**PAYLOAD) for r in results))
+        self.assertEqual(sorted(a.last_source for a in agents), ["coalesced"] * 3 + ["llm"])
+        # Each caller owns its result
+        self.assertEqual(len({id(r) for r in results}), 4)
+
+    def test_async_parses_coalesce_per_content(self):
+        first = self.bill("a.png", b"bill a")
+        second = self.bill("b.png", b"bill b")
+        agent = BillParserAgent(use_cache=False)
+
+        async def run():
+            return await asyncio.gather(*(agent.aparse_bill(p) for p in (first, first, second, first)))
+        results = asyncio.run(run())
+
+        self.assertEqual(self.llm.calls, 2)
+        self.assertEqual(len(results), 4)
+
+    def test_failures_reach_every_waiter_and_are_not_kept(self):
+        flights = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+        errors = []
+
+        def fail():
+            started.set()
+            release.wait(5)
+            raise ValueError("model down")
+
+        def call():
+            try:
+                flights.do("key", fail)
+            except ValueError as e:
+                errors.append(e)
+        leader = threading.Thread(target=call)
+        leader.start()
+        started.wait(5)
+        follower = threading.Thread(target=call)
+        follower.start()
+        release.set()
+        leader.join()
+        follower.join()
+
+        self.assertEqual(len(errors), 2)
+        self.assertEqual(flights.in_flight(), 0)
+        self.assertEqual(flights.do("key", lambda: "retried"), "retried")
+
+    def test_cancelled_leader_does_not_cancel_followers(self):
+        flights = SingleFlight()
+        calls = []
+
+        async def work():
+            calls.append(True)
+            await asyncio.sleep(0.2)
+            return "parsed"
+
+        async def run():
+            # The leader times out (as batch's per-bill wait_for does); the follower keeps waiting
+            leader = asyncio.create_task(asyncio.wait_for(flights.ado("key", work), timeout=0.05))
+            await asyncio.sleep(0.01)
+            follower = asyncio.create_task(flights.ado("key", work))
+            with self.assertRaises(asyncio.TimeoutError):
+                await leader
+            return await follower
+
+        self.assertEqual(asyncio.run(run()), "parsed")
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(flights.in_flight(), 0)
+
+class TestAsyncGraphNode(unittest.TestCase):
+    def test_ainvoke_awaits_the_async_parser(self):
+        parser = mock.Mock()
+        parser.return_value.aparse_bill = mock.AsyncMock(return_value=BillData(**PAYLOAD))
+        notifier = mock.Mock()
+        notifier.return_value.send_notifications.return_value = {}
+        splitwise = mock.Mock()
+        splitwise.return_value.add_expense.return_value = {"expense_id": 1}
+        with mock.patch.object(graph, "BillParserAgent", parser), \
+                mock.patch.object(graph, "WhatsAppNotifierAgent", notifier), \
+                mock.patch.object(graph, "SplitwiseAgent", splitwise):
+            final = asyncio.run(graph.get_app().ainvoke({"bill_file_path": "bill.pdf", "errors": []}))
+
+        parser.return_value.aparse_bill.assert_awaited_once_with("bill.pdf")
+        parser.return_value.parse_bill.assert_not_called()
+        self.assertEqual(final["splits"], {"Alice": 40.0, "Bob": 60.0})
+
+if __name__ == '__main__':
+    unittest.main()
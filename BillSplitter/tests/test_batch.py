@@ -0,0 +1,35 @@
+import unittest
+import sys
+import os
+import time
+import asyncio
+
+# Add parent directory to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from batch import run_batch
+
+class FakeApp:
+    """Stands in for the compiled graph: sleeps, then fails or hangs for selected bills."""
+    async def ainvoke(self, state):
+        path = state["bill_file_path"]
+        await asyncio.sleep(5 if path == "slow.pdf" else 0.2)
+        if path == "bad.pdf":
+            raise RuntimeError("parse failed")
+        return {"splits": {"alice@example.com": 10.0}, "splitwise_expense_id": "42", "errors": []}
+
+class TestBatch(unittest.TestCase):
+    def test_concurrent_with_isolated_failures(self):
+        paths = ["a.pdf", "bad.pdf", "b.pdf", "slow.pdf"]
+        started = time.perf_counter()
+        records = asyncio.run(run_batch(FakeApp(), paths, concurrency=4, timeout=0.5))
+        elapsed = time.perf_counter() - started
+
+        self.assertEqual([r["status"] for r in records], ["ok", "error", "ok", "timeout"])
+        self.assertEqual(records[0]["splitwise_expense_id"], "42")
+        self.assertIn("parse failed", records[1]["errors"][0])
+        # Bounded by the slowest bill (the timeout), not the sum
+        self.assertLess(elapsed, 1.0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import unittest
+import sys
+import os
+import json
+import subprocess
+
+# Add parent directory to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.bench_e2e import ROOT, percentile
+
+def run_child(target: str) -> dict:
+    # Scenarios change the working directory and environment, so run them in a fresh interpreter
+    result = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_e2e", "--child", "--targets", target, "--lines", "3",
+         "--concurrency", "2", "--bills", "2", "--llm-latency", "0", "--service-latency", "0"],
+        cwd=ROOT, capture_output=True, text=True, timeout=120
+    )
+    if result.returncode != 0:
+        raise AssertionError(result.stderr[-2000:])
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+class TestEndToEndHarness(unittest.TestCase):
+    def test_graph_against_fakes(self):
+        result = run_child("graph")
+        self.assertEqual(result["errors"], [])
+        self.assertEqual(result["ok"], 2)
+        self.assertEqual(result["llm_calls"], 2)
+        self.assertEqual(result["splitwise_expenses"], 2)
+        self.assertEqual(result["twilio_messages"], 6)
+        self.assertGreater(result["peak_rss_mb"], 0)
+
+    def test_main_against_fakes(self):
+        result = run_child("main")
+        self.assertEqual(result["errors"], [])
+        self.assertEqual(result["twilio_messages"], 6)
+        self.assertEqual(result["splitwise_expenses"], 0)
+
+    def test_percentile(self):
+        values = [float(v) for v in range(1, 101)]
+        self.assertEqual(percentile(values, 50), 50.0)
+        self.assertEqual(percentile(values, 99), 99.0)
+        self.assertEqual(percentile([3.0], 99), 3.0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+import unittest
+import sys
+import os
+import re
+import json
+import asyncio
+import tempfile
+from unittest import mock
+
+# Add parent directory to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from agents.bill_parser import BillParserAgent, BillData
+from agents.bill_chunks import merge_bill_parts, page_chunks
+from benchmarks.fakes import make_text_pdf
+
+def part(total, users, shared=()):
+    return BillData(
+        total_amount=total, period_start="2025-11-01" if total else "", period_end="2025-11-30" if total else "",
+        usage_period="", shared_costs=[{"description": d, "amount": a, "category": "Plan"} for d, a in shared],
+        user_charges=[{"name": n, "phone_number": p, "items": [{"description": "Plan", "amount": t, "category": "Plan"}], "total": t}
+                      for n, p, t in users]
+    )
+
+class TestBillChunks(unittest.TestCase):
+    def test_page_chunks(self):
+        self.assertEqual(page_chunks([0, 2, 3, 5, 6], 2), [[0, 2], [3, 5], [6]])
+
+    def test_merge_joins_users_by_phone(self):
+        merged = merge_bill_parts([
+            part(100.0, [("ALICE", "469.882.5794", 30.0)], [("Base plan", 20.0)]),
+            part(0, [("Alice", "(469) 882-5794", 10.0), ("BOB", None, 40.0)], [("Base plan", 20.0)]),
+        ])
+        self.assertEqual(merged.total_amount, 100.0)
+        self.assertEqual(merged.period_start, "2025-11-01")
+        self.assertEqual([(u.name, u.total, len(u.items)) for u in merged.user_charges],
+                         [("ALICE", 40.0, 2), ("BOB", 40.0, 1)])
+        # The account summary repeated on the second chunk is only counted once
+        self.assertEqual([c.amount for c in merged.shared_costs], [20.0])
+
+    def test_merge_keeps_lines_from_different_countries_apart(self):
+        merged = merge_bill_parts([
+            part(80.0, [("UK line", "+44 20 7946 0958", 30.0)]),
+            part(0, [("US line", "+1 207 946 0958", 50.0), ("UK line", "00 44 20 7946 0958", 0.0)]),
+        ])
+        self.assertEqual([(u.name, u.total) for u in merged.user_charges], [("UK line", 30.0), ("US line", 50.0)])
+
+    def test_merge_keeps_the_same_fee_on_two_chunks_when_the_total_needs_it(self):
+        merged = merge_bill_parts([
+            part(120.0, [("ALICE", "469.882.5794", 30.0)], [("Base plan", 20.0), ("Line access", 10.0)]),
+            part(0, [("BOB", None, 50.0)], [("Line access", 10.0)]),
+        ])
+        self.assertEqual([c.description for c in merged.shared_costs], ["Base plan", "Line access", "Line access"])
+
+        unknown_total = merge_bill_parts([
+            part(0, [("ALICE", None, 30.0)], [("Line access", 10.0)]),
+            part(0, [("BOB", None, 50.0)], [("Line access", 10.0)]),
+        ])
+        self.assertEqual(unknown_total.total_amount, 100.0)
+
+    def test_parse_bill_in_chunks(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "bill.pdf")
+            pages = [["Account Summary", "Total due $100.00"]]
+            pages += [[f"LINE {i} 555.000.000{i} Plan $10.00 Device $0.00"] for i in range(9)]
+            with open(path, "wb") as f:
+                f.write(make_text_pdf(pages))
+
+            def fake_invoke(messages):
+                blocks = messages[0].content
+                text = blocks[-1]["text"]
+                phones = re.findall(r"555\.000\.000\d", text)
+                first = "Total due" in text
+                return mock.Mock(content=json.dumps({
+                    "total_amount": 100.0 if first else 0, "period_start": "2025-11-01" if first else "",
+                    "period_end": "2025-11-30" if first else "", "usage_period": "",
+                    "shared_costs": [{"description": "Base plan", "amount": 10.0, "category": "Plan"}] if first else [],
+                    "user_charges": [{"name": p, "phone_number": p, "items": [], "total": 10.0} for p in phones],
+                }))
+
+            agent = BillParserAgent(use_cache=False, use_templates=False, chunk_pages=3, max_chunk_workers=2)
+            agent._llm = mock.Mock()
+            agent._llm.invoke.side_effect = fake_invoke
+            bill = agent.parse_bill(path)
+
+        self.assertEqual(agent.last_source, "llm:chunked")
+        self.assertEqual(agent._llm.invoke.call_count, 4)
+        self.assertEqual(len(bill.user_charges), 9)
+        self.assertEqual(bill.total_amount, 100.0)
+        notes = sorted(call[0][0][0].content[2]["text"] for call in agent._llm.invoke.call_args_list)
+        self.assertIn("pages 1-3 of 10", notes[0])
+
+    def test_failed_chunk_cancels_the_others(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "bill.pdf")
+            pages = [["Account Summary", "Total due $100.00"]]
+            pages += [[f"LINE {i} 555.000.000{i} Plan $10.00 Device $0.00"] for i in range(9)]
+            with open(path, "wb") as f:
+                f.write(make_text_pdf(pages))
+
+            finished = []
+            async def fake_ainvoke(messages):
+                if "Total due" in messages[0].content[-1]["text"]:
+                    await asyncio.sleep(0.05)
+                    raise ValueError("bad chunk")
+                await asyncio.sleep(0.5)
+                finished.append(messages)
+
+            async def parse():
+                agent = BillParserAgent(use_cache=False, use_templates=False, chunk_pages=3, max_chunk_workers=4)
+                agent._llm = mock.Mock()
+                agent._llm.ainvoke = fake_ainvoke
+                with self.assertRaises(ValueError):
+                    await agent.aparse_bill(path)
+                left = asyncio.all_tasks() - {asyncio.current_task()}
+                await asyncio.sleep(0.6)
+                return left
+
+            self.assertEqual(asyncio.run(parse()), set())
+        self.assertEqual(finished, [])
+
+if __name__ == '__main__':
+    unittest.main()
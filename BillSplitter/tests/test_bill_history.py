@@ -0,0 +1,104 @@
+import unittest
+import sys
+import os
+import sqlite3
+import tempfile
+
+# Add parent directory to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import graph
+from unittest import mock
+from agents.bill_history import BillHistory, account_of, period_of, shift_period
+from agents.bill_record import BillRecord
+from agents.split_calculator import SplitCalculatorAgent, ALLOCATION_LARGEST_REMAINDER
+
+def make_bill(period_end: str, alice: float, bob: float, shared: float = 20.0) -> dict:
+    return {
+        "total_amount": round(alice + bob + shared, 2),
+        "period_start": "",
+        "period_end": period_end,
+        "usage_period": "",
+        "shared_costs": [{"description": "Base Plan", "amount": shared, "category": "Plan"}],
+        "user_charges": [
+            {"name": "Alice", "phone_number": None, "total": alice,
+             "items": [{"description": "Device", "amount": alice, "category": "Device"}]},
+            {"name": "Bob", "phone_number": None, "total": bob,
+             "items": [{"description": "Usage", "amount": bob, "category": "Usage"}]},
+        ]
+    }
+
+def split(bill: dict):
+    return SplitCalculatorAgent().calculate_split(bill, allocation=ALLOCATION_LARGEST_REMAINDER)
+
+class TestBillHistory(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.history = BillHistory(os.path.join(self.tmp.name, "history.sqlite3"))
+        for month, (alice, bob) in enumerate([(10.0, 30.0), (12.5, 30.0), (10.0, 0.0)], start=10):
+            bill = make_bill(f"2025-{month:02d}-05", alice, bob)
+            self.history.record(bill, split(bill), source=f"bill_{month}.pdf")
+
+    def test_balances_trend_and_categories(self):
+        self.assertEqual(self.history.periods(), ["2025-10", "2025-11", "2025-12"])
+        self.assertEqual(self.history.balances(), {"Bob": 90.0, "Alice": 62.5})
+        self.assertEqual(self.history.balances(since=self.history.since_months(2)), {"Bob": 50.0, "Alice": 42.5})
+        self.assertEqual(self.history.trend("Alice"), [("2025-10", 20.0), ("2025-11", 22.5), ("2025-12", 20.0)])
+        categories = self.history.categories(since="2025-11")
+        self.assertEqual(categories["Plan"], {"2025-11": 20.0, "2025-12": 20.0})
+        self.assertEqual(categories["Device"], {"2025-11": 12.5, "2025-12": 10.0})
+
+    def test_rerecording_a_bill_replaces_it(self):
+        bill = make_bill("2025-12-05", 10.0, 0.0)
+        bill["user_charges"][0]["name"] = "Carol"
+        self.history.record(bill, split(bill))
+
+        self.assertEqual(self.history.balances(), {"Bob": 90.0, "Alice": 42.5, "Carol": 20.0})
+        self.assertEqual(len(self.history.reconcile("2025-12")), 1)
+
+    def test_accounts_with_the_same_period_and_total_are_kept_apart(self):
+        family = make_bill("2026-01-05", 10.0, 30.0)
+        work = make_bill("2026-01-05", 10.0, 30.0)
+        family["user_charges"][0]["phone_number"] = "469.882.5794"
+        work["user_charges"][0]["phone_number"] = "(214) 555-0100"
+        self.assertNotEqual(account_of(family), account_of(work))
+        # The same lines written differently are the same account
+        self.assertEqual(account_of(family), account_of({"user_charges": [{"phone_number": "+1 469 882 5794"}]}))
+
+        with mock.patch.dict(os.environ, {"BILL_HISTORY_PATH": self.history.db_path}):
+            for bill in (family, work):
+                graph.record_history(BillRecord.from_dict(bill), split(bill), "bill.pdf")
+
+        self.assertEqual(len(self.history.reconcile("2026-01")), 2)
+        self.assertEqual(self.history.trend("Alice", since="2026-01"), [("2026-01", 40.0)])
+
+    def test_aggregates_match_a_full_recompute(self):
+        self.history.forget(BillHistory.make_bill_id(make_bill("2025-11-05", 12.5, 30.0)))
+        with sqlite3.connect(self.history.db_path) as conn:
+            incremental = dict(conn.execute("SELECT user_key, amount_cents FROM agg_user"))
+            recomputed = dict(conn.execute("SELECT user_key, SUM(amount_cents) FROM shares GROUP BY user_key"))
+        self.assertEqual(incremental, recomputed)
+        self.assertEqual(self.history.periods(), ["2025-10", "2025-12"])
+
+    def test_reconcile_flags_mismatched_bills(self):
+        bill = make_bill("2026-01-05", 10.0, 30.0)
+        result = split(bill)
+        bill["total_amount"] += 5.0  # charges no longer add up to the total
+        self.history.record(bill, result)
+
+        report = {r["period"]: r for r in self.history.reconcile()}
+        self.assertEqual(report["2025-10"]["charges_difference"], 0.0)
+        self.assertEqual(report["2026-01"]["charges_difference"], 5.0)
+        self.assertEqual(report["2026-01"]["split_difference"], 5.0)
+
+class TestPeriods(unittest.TestCase):
+    def test_period_of(self):
+        self.assertEqual(period_of({"period_end": "Dec 05, 2025"}), "2025-12")
+        self.assertEqual(period_of({"period_end": "Dec 05", "usage_period": "Nov 06 - Dec 05, 2025"}), "2025-12")
+        self.assertEqual(period_of({"period_end": "12/05/2025"}), "2025-12")
+        self.assertEqual(period_of({"period_end": "soon"}), "unknown")
+        self.assertEqual(shift_period("2025-02", -11), "2024-03")
+
+if __name__ == '__main__':
+    unittest.main()
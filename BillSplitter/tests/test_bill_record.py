@@ -0,0 +1,86 @@
+import unittest
+import sys
+import os
+from unittest import mock
+
+# Add parent directory to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import graph
+from agents.bill_parser import BillData
+from agents.bill_record import BillRecord, as_bill_record
+from agents.split_calculator import SplitCalculatorAgent, SplitResult, ALLOCATION_LARGEST_REMAINDER
+
+BILL = {
+    "total_amount": 100.0,
+    "period_start": "2025-11-01",
+    "period_end": "2025-12-01",
+    "usage_period": "Nov 2025",
+    "shared_costs": [{"description": "Base Plan", "amount": 20.0, "category": "Plan"}],
+    "user_charges": [
+        {"name": "Alice", "phone_number": "555.111.2222",
+         "items": [{"description": "Plan", "amount": 30.0, "category": "Plan"}], "total": 30.0},
+        {"name": "Bob", "phone_number": None, "items": [], "total": 50.0}
+    ]
+}
+
+class TestBillRecord(unittest.TestCase):
+    def test_round_trips_bill_data(self):
+        record = BillRecord.from_model(BillData(**BILL))
+        self.assertEqual(record, BillRecord.from_dict(BILL))
+        self.assertEqual(record.to_dict(), BillData(**BILL).model_dump())
+        self.assertEqual(record.user_charges[0].get("phone_number"), "555.111.2222")
+        self.assertEqual(record.get("missing", "default"), "default")
+        with self.assertRaises(AttributeError):
+            record.total_amount = 0
+
+    def test_restores_tuples_from_checkpointed_lists(self):
+        record = BillRecord.from_dict(BILL)
+        restored = record._replace(shared_costs=list(record.shared_costs),
+                                   user_charges=[u._replace(items=list(u.items)) for u in record.user_charges])
+        self.assertEqual(as_bill_record(restored), record)
+        self.assertIsInstance(as_bill_record(restored).user_charges[0].items, tuple)
+
+    def test_splits_match_the_dict_form(self):
+        agent = SplitCalculatorAgent()
+        user_map = {"555.111.2222": "alice@example.com"}
+        for allocation in ("round", ALLOCATION_LARGEST_REMAINDER):
+            from_record = agent.calculate_split(BillRecord.from_dict(BILL), user_map, allocation=allocation)
+            from_dict = agent.calculate_split(BILL, user_map, allocation=allocation)
+            self.assertEqual(from_record.splits, from_dict.splits)
+            for key, detail in from_record.details.items():
+                # Records share the bill's item records instead of copying dicts
+                items = [item._asdict() for item in detail["items"]]
+                self.assertEqual({**detail, "items": items}, from_dict.details[key])
+
+class TestLazyDetails(unittest.TestCase):
+    def test_details_built_once_on_first_read(self):
+        build = mock.Mock(return_value={"a": {"items": []}})
+        result = SplitResult.lazy(build, splits={"a": 1.0}, total_bill=1.0, description="d")
+        build.assert_not_called()
+        self.assertEqual(result.model_dump()["details"], {"a": {"items": []}})
+        self.assertEqual(result.details, {"a": {"items": []}})
+        build.assert_called_once()
+
+    def test_validating_a_dump_leaves_it_intact(self):
+        dumped = SplitResult(splits={"a": 1.0}, total_bill=1.0, description="d").model_dump()
+        restored = SplitResult.model_validate(dumped)
+        self.assertIn("details", dumped)
+        self.assertEqual(restored.details, dumped["details"])
+
+    def test_items_are_shared_not_copied(self):
+        record = BillRecord.from_dict(BILL)
+        result = SplitCalculatorAgent().calculate_split(record, allocation=ALLOCATION_LARGEST_REMAINDER)
+        self.assertIs(result.details["Alice"]["items"][0], record.user_charges[0].items[0])
+        self.assertEqual(result.details["Bob"], {"individual_charges": 50.0, "shared_portion": 10.0, "items": []})
+
+class TestErrorReducer(unittest.TestCase):
+    def test_empty_writes_keep_the_list(self):
+        errors = ["first"]
+        self.assertIs(graph.merge_errors(errors, []), errors)
+        self.assertEqual(graph.merge_errors(errors, ["second"]), ["first", "second"])
+        self.assertEqual(errors, ["first"])
+        self.assertEqual(graph.merge_errors(errors, None), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import unittest
+import sys
+import os
+import json
+import tempfile
+from unittest import mock
+
+# Add parent directory to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from agents.bill_parser import BillParserAgent
+from benchmarks.fakes import make_text_pdf
+
+def att_bill(total_due: str):
+    return [
+        [
+            "AT&T Wireless Statement",
+            "Billing period: Nov 06 - Dec 05, 2025",
+            f"Total due ${total_due}",
+        ],
+        [
+            "Charges by line",
+            "SRAVYA REKAPALLI 469.882.5794 $25.50",
+            "NITHIN ROY 704.605.2812 $40.25",
+            "Account charges $60.00",
+            "Discounts -$10.00",
+            "Taxes & fees $4.25",
+        ],
+    ]
+
+class TestBillTemplates(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def write_pdf(self, pages):
+        path = os.path.join(self.tmp.name, "bill.pdf")
+        with open(path, "wb") as f:
+            f.write(make_text_pdf(pages))
+        return path
+
+    def test_att_bill_parses_without_llm(self):
+        agent = BillParserAgent(use_cache=False)
+        agent._llm = mock.Mock(side_effect=AssertionError("LLM called"))
+
+        bill = agent.parse_bill(self.write_pdf(att_bill("120.00")))
+
+        self.assertEqual(agent.last_source, "template:att_wireless")
+        self.assertEqual(bill.total_amount, 120.0)
+        self.assertEqual(bill.period_start, "Nov 06")
+        self.assertEqual(bill.period_end, "Dec 05, 2025")
+        self.assertEqual([(u.name, u.phone_number, u.total) for u in bill.user_charges], [
+            ("SRAVYA REKAPALLI", "469.882.5794", 25.5),
+            ("NITHIN ROY", "704.605.2812", 40.25),
+        ])
+        self.assertEqual([c.amount for c in bill.shared_costs], [60.0, -10.0, 4.25])
+
+    def test_unreconciled_template_falls_back_to_llm(self):
+        agent = BillParserAgent(use_cache=False)
+        agent._llm = mock.Mock()
+        agent._llm.invoke.return_value.content = json.dumps({
+            "total_amount": 999.0, "period_start": "a", "period_end": "b",
+            "usage_period": "c", "shared_costs": [], "user_charges": []
+        })
+
+        bill = agent.parse_bill(self.write_pdf(att_bill("999.00")))
+
+        self.assertEqual(agent.last_source, "llm")
+        self.assertEqual(bill.total_amount, 999.0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+import unittest
+import sys
+import os
+import json
+import asyncio
+import tempfile
+import importlib.util
+from unittest import mock
+
+# Add parent directory to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from agents import bill_parser, cascade, resilience, telemetry
+from agents.bill_parser import BillParserAgent, BillData
+from agents.cascade import CascadeStats, validate_reply
+from benchmarks.bench_e2e import make_fixture, write_bills
+from benchmarks.fakes import FakeChatModel, FakeOllamaServer
+
+PAYLOAD, _ = make_fixture(6)
+
+class TestCascade(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.bill_path = write_bills(self.tmp.name, PAYLOAD, 1)[0]
+        self.gemini = FakeChatModel(PAYLOAD, latency_seconds=0)
+        self.local = FakeChatModel(PAYLOAD, latency_seconds=0)
+        self.stats = CascadeStats()
+        for patcher in (mock.patch.object(bill_parser, "shared_llm", return_value=self.gemini),
+                        mock.patch.object(cascade, "cascade_stats", self.stats)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        resilience.reset_breakers()
+        self.addCleanup(resilience.reset_breakers)
+
+    def agent(self, local_model=None) -> BillParserAgent:
+        return BillParserAgent(use_cache=False, use_templates=False, cascade=True,
+                               local_model=local_model or self.local)
+
+    def test_valid_local_parse_skips_gemini(self):
+        agent = self.agent()
+        with telemetry.span("bill", telemetry.KIND_RUN) as root:
+            result = agent.parse_bill(self.bill_path)
+
+        self.assertEqual(result, BillData(**PAYLOAD))
+        self.assertEqual((self.local.calls, self.gemini.calls), (1, 0))
+        self.assertEqual(agent.last_source, "local:FakeChatModel")
+        cost = telemetry.bill_cost(telemetry.tracer.spans(root.trace_id))
+        self.assertEqual((cost["llm_calls"], cost["local_llm_calls"], cost["llm_cost_usd"]), (0, 1, 0))
+        self.assertEqual(self.stats.summary()["local"]["hit_rate"], 1.0)
+
+    def test_unreconciled_local_parse_escalates(self):
+        self.local.wrong_rate = 1.0
+        agent = self.agent()
+        result = agent.parse_bill(self.bill_path)
+
+        self.assertEqual(result, BillData(**PAYLOAD))
+        self.assertEqual((self.local.calls, self.gemini.calls), (1, 1))
+        self.assertEqual(agent.last_source, "llm")
+        summary = self.stats.summary()
+        self.assertEqual(summary["local"]["escalations"], {"unreconciled": 1})
+        self.assertEqual((summary["gemini"]["attempts"], summary["gemini"]["served"]), (1, 1))
+
+    def test_invented_amounts_escalate(self):
+        # Adds up, but none of these totals are on the bill
+        doubled = json.loads(json.dumps(PAYLOAD))
+        doubled["total_amount"] = round(doubled["total_amount"] * 2, 2)
+        for item in doubled["user_charges"] + doubled["shared_costs"]:
+            item["total" if "total" in item else "amount"] *= 2
+        self.assertEqual(validate_reply(json.dumps(doubled), "Total due $1.00")[1], cascade.REASON_UNGROUNDED)
+        self.assertEqual(validate_reply("Sorry, I can't read this bill.", "")[1], cascade.REASON_INVALID)
+
+    def test_images_and_failures_go_to_gemini(self):
+        image_path = os.path.join(self.tmp.name, "bill.png")
+        with open(image_path, "wb") as f:
+            f.write(b"not really a png")
+        failing = mock.Mock()
+        failing.invoke.side_effect = ConnectionError("connection refused")
+
+        self.agent().parse_bill(image_path)
+        self.agent(local_model=failing).parse_bill(self.bill_path)
+
+        self.assertEqual(self.local.calls, 0)
+        self.assertEqual(self.gemini.calls, 2)
+        self.assertEqual(self.stats.summary()["local"]["escalations"], {"no_text": 1, "unavailable": 1})
+
+    def test_async_parse_uses_the_local_model(self):
+        agent = self.agent()
+        result = asyncio.run(agent.aparse_bill(self.bill_path))
+        self.assertEqual(result, BillData(**PAYLOAD))
+        self.assertEqual((self.local.calls, self.gemini.calls), (1, 0))
+
+    def test_cascade_results_are_cached_separately(self):
+        plain = BillParserAgent(use_cache=False)
+        self.assertNotEqual(plain.cache_key(self.bill_path), self.agent().cache_key(self.bill_path))
+        self.assertNotEqual(BillParserAgent(use_cache=False, cascade=True, local_model="qwen2.5:7b").cache_key(self.bill_path),
+                            BillParserAgent(use_cache=False, cascade=True).cache_key(self.bill_path))
+
+    @unittest.skipUnless(importlib.util.find_spec("langchain_ollama"), "langchain-ollama is not installed")
+    def test_ollama_client_against_local_server(self):
+        with FakeOllamaServer(PAYLOAD, latency_seconds=0) as server:
+            from langchain_ollama import ChatOllama
+            model = ChatOllama(model=server.model, base_url=server.base_url, temperature=0, format="json")
+            agent = self.agent(local_model=model)
+            self.assertEqual(agent.parse_bill(self.bill_path), BillData(**PAYLOAD))
+            self.assertEqual(server.chats(), 1)
+        self.assertEqual(self.gemini.calls, 0)
+        self.assertEqual(agent.last_source, f"local:{server.model}")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import unittest
+import sys
+import os
+import tempfile
+from unittest import mock
+
+# Add parent directory to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import graph
+from agents.bill_parser import BillData
+from agents.bill_record import BillRecord, LineRecord, as_bill_record
+
+BILL = BillData(**{
+    "total_amount": 100.0,
+    "period_start": "2025-11-01",
+    "period_end": "2025-12-01",
+    "usage_period": "Nov 2025",
+    "shared_costs": [{"description": "Base Plan", "amount": 20.0, "category": "Plan"}],
+    "user_charges": [
+        {"name": "Alice", "phone_number": None, "items": [], "total": 30.0},
+        {"name": "Bob", "phone_number": None, "items": [], "total": 50.0}
+    ]
+})
+
+class TestCheckpointedRuns(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.db = os.path.join(self.tmp.name, "checkpoints.sqlite3")
+        self.bill_path = os.path.join(self.tmp.name, "bill.pdf")
+        with open(self.bill_path, "wb") as f:
+            f.write(b"%PDF-1.4 fake bill")
+
+        self.parser = mock.Mock()
+        self.parser.return_value.parse_bill.return_value = BILL
+        self.splitwise = mock.Mock()
+        self.splitwise.return_value.add_expense.side_effect = [
+            {"error": "503 Service Unavailable"},
+            {"expense_id": 777},
+        ]
+        self.notifier = mock.Mock()
+        self.notifier.return_value.send_notifications.side_effect = lambda splits, contacts: {u: "mock_sent" for u in splits}
+        for name, fake in (("BillParserAgent", self.parser), ("SplitwiseAgent", self.splitwise),
+                           ("WhatsAppNotifierAgent", self.notifier)):
+            patcher = mock.patch.object(graph, name, fake)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_rerun_resumes_without_reparsing(self):
+        first = graph.run_single(self.bill_path, checkpoint_db=self.db)
+        self.assertIn("Splitwise Error: 503 Service Unavailable", first["errors"])
+
+        with self.assertNoLogs(level="WARNING"):
+            second = graph.run_single(self.bill_path, checkpoint_db=self.db)
+        self.assertEqual(second["splitwise_expense_id"], "777")
+        self.assertEqual(second["errors"], [])
+        self.assertEqual(second["splits"], {"Alice": 40.0, "Bob": 60.0})
+        # The bill is restored from the checkpoint as the same immutable record
+        self.assertIsInstance(second["bill_data"], BillRecord)
+        self.assertEqual(as_bill_record(second["bill_data"]), BillRecord.from_model(BILL))
+
+        self.assertEqual(self.parser.return_value.parse_bill.call_count, 1)
+        self.assertEqual(self.splitwise.return_value.add_expense.call_count, 2)
+        # Notifications went out on the first run and are not repeated
+        self.assertEqual(self.notifier.return_value.send_notifications.call_count, 1)
+        self.assertEqual(second["notification_status"], {"Alice": "mock_sent", "Bob": "mock_sent"})
+
+    def test_serde_restores_records_without_warning(self):
+        serde = graph.checkpoint_serde()
+        record = BillRecord.from_model(BILL)
+        # An unregistered type is logged now and will be refused by later langgraph versions
+        with self.assertNoLogs(level="WARNING"):
+            restored = serde.loads_typed(serde.dumps_typed({"bill_data": record}))["bill_data"]
+        self.assertIsInstance(restored, BillRecord)
+        self.assertIsInstance(restored.user_charges[0], LineRecord)
+        self.assertEqual(as_bill_record(restored), record)
+
+    def test_fresh_discards_checkpoint(self):
+        graph.run_single(self.bill_path, checkpoint_db=self.db)
+        graph.run_single(self.bill_path, checkpoint_db=self.db, fresh=True)
+        self.assertEqual(self.parser.return_value.parse_bill.call_count, 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import unittest
+import sys
+import os
+import json
+import time
+import tempfile
+
+# Add parent directory to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from agents.contacts import ContactsStore, normalize_phone, name_keys
+from agents.split_calculator import SplitCalculatorAgent
+
+CONTACTS = [
+    {"name": "SRAVYA REKAPALLI", "phone": "469.882.5794", "email_id": "sravya@example.com"},
+    {"name": "Jayashree (NEW LINE)", "phone": "669.288.3455", "email_id": "jaya@example.com"},
+    {"name": "ANANDRAJ RAVI", "phone": "704.605.2812", "email_id": "Anand@Example.com"},
+]
+
+class TestNormalization(unittest.TestCase):
+    def test_phone_formats_normalize_to_e164(self):
+        for raw in ("469.882.5794", "(469) 882-5794", "+14698825794", "1-469-882-5794", " +1 469 882 5794 "):
+            self.assertEqual(normalize_phone(raw), "+14698825794", raw)
+        self.assertEqual(normalize_phone("+44 20 7946 0958"), "+442079460958")
+        self.assertEqual(normalize_phone("0044 20 7946 0958"), "+442079460958")
+        self.assertIsNone(normalize_phone("12345"))
+        self.assertIsNone(normalize_phone(None))
+
+    def test_name_keys(self):
+        self.assertIn("JAYASHREE", name_keys("Jayashree (NEW LINE)"))
+        self.assertIn("ANANDRAJ RAVI", name_keys("ravi, anandraj"))
+
+class TestContactsStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.json_path = os.path.join(self.tmp.name, "contacts.json")
+        self.write(CONTACTS)
+        self.store = ContactsStore(self.json_path, os.path.join(self.tmp.name, "contacts.sqlite3"))
+
+    def write(self, contacts):
+        with open(self.json_path, "w") as f:
+            json.dump(contacts, f)
+
+    def test_lookup_by_phone_email_and_name(self):
+        self.assertEqual(self.store.lookup(phone="(469) 882-5794").email, "sravya@example.com")
+        self.assertEqual(self.store.lookup(email="anand@example.COM").phone, "+17046052812")
+        self.assertEqual(self.store.lookup(name="JAYASHREE").email, "jaya@example.com")
+        self.assertEqual(self.store.lookup(name="Sravya Rekapali").email, "sravya@example.com")
+        self.assertIsNone(self.store.lookup(name="Sravya Rekapali", fuzzy=False))
+        self.assertIsNone(self.store.lookup(phone="+15550001111", name="Someone Else"))
+
+    def test_user_map_feeds_calculator(self):
+        bill = {
+            "total_amount": 90.0,
+            "shared_costs": [],
+            "user_charges": [
+                {"name": "SRAVYA R", "phone_number": "+14698825794", "total": 30.0},
+                {"name": "ANANDRAJ RAVI", "phone_number": None, "total": 30.0},
+                {"name": "UNKNOWN", "phone_number": "(555) 000-1111", "total": 30.0},
+            ]
+        }
+        user_map = self.store.user_map(bill["user_charges"])
+        self.assertEqual(user_map, {"+14698825794": "sravya@example.com", "ANANDRAJ RAVI": "Anand@Example.com"})
+
+        splits = SplitCalculatorAgent().calculate_split(bill, user_map).splits
+        self.assertEqual(set(splits), {"sravya@example.com", "Anand@Example.com", "UNKNOWN"})
+        self.assertEqual(self.store.phones_for(splits), {"sravya@example.com": "+14698825794",
+                                                          "Anand@Example.com": "+17046052812"})
+
+    def test_index_rebuilt_only_when_json_changes(self):
+        self.assertTrue(self.store.refresh())
+        self.assertFalse(self.store.refresh())
+        # A second process opening the same files reuses the compiled index
+        other = ContactsStore(self.store.json_path, self.store.db_path)
+        self.assertFalse(other.refresh())
+
+        self.write(CONTACTS + [{"name": "NEW PERSON", "phone": "214-555-0100", "email_id": "new@example.com"}])
+        os.utime(self.json_path, ns=(time.time_ns(), time.time_ns() + 10**9))
+        self.assertTrue(self.store.refresh())
+        self.assertEqual(self.store.count(), 4)
+        self.assertEqual(self.store.lookup(phone="2145550100").email, "new@example.com")
+
+    def test_missing_file_is_empty(self):
+        store = ContactsStore(os.path.join(self.tmp.name, "nope.json"), os.path.join(self.tmp.name, "x.sqlite3"))
+        self.assertEqual(store.count(), 0)
+        self.assertEqual(store.user_map([{"name": "A", "phone_number": "4698825794"}]), {})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+import unittest
+import sys
+import os
+import tempfile
+from unittest import mock
+
+# Add parent directory to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from agents import splitwise_agent
+from agents.splitwise_agent import SplitwiseAgent
+from agents.expense_ledger import ExpenseLedger
+from splitwise_mcp.model import AddExpenseResponse
+
+class TestExpenseLedger(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.ledger = ExpenseLedger(os.path.join(self.tmp.name, "ledger.sqlite3"))
+        self.addCleanup(self.tmp.cleanup)
+
+    def test_repeat_run_skips_network(self):
+        agent = SplitwiseAgent(ledger=self.ledger)
+        post = mock.Mock(return_value=AddExpenseResponse(success=True, expense_id=123, message="ok"))
+        splits = {"alice@example.com": 40.0, "bob@example.com": 60.0}
+
+        with mock.patch.object(splitwise_agent, "add_expense_to_splitwise", post):
+            first = agent.add_expense(100.0, "Wireless Bill", splits, period="2025-11-01/2025-12-01")
+            second = agent.add_expense(100.0, "Wireless Bill", dict(reversed(list(splits.items()))), period="2025-11-01/2025-12-01")
+
+        self.assertEqual(first, {"expense_id": 123})
+        self.assertEqual(second, {"expense_id": "123", "duplicate": True})
+        self.assertEqual(post.call_count, 1)
+
+    def test_failed_post_is_not_recorded(self):
+        agent = SplitwiseAgent(ledger=self.ledger)
+        post = mock.Mock(return_value=AddExpenseResponse(success=False, message="Member not found."))
+
+        with mock.patch.object(splitwise_agent, "add_expense_to_splitwise", post):
+            agent.add_expense(10.0, "Bill", {"alice@example.com": 10.0})
+            agent.add_expense(10.0, "Bill", {"alice@example.com": 10.0})
+
+        self.assertEqual(post.call_count, 2)
+
+    def test_key_changes_with_amounts(self):
+        key = ExpenseLedger.make_key("p", "at&t", 100.0, {"a@x.com": 100.0})
+        self.assertEqual(key, ExpenseLedger.make_key("p", "AT&T", 100.0, {"A@x.com": 100.0}))
+        self.assertNotEqual(key, ExpenseLedger.make_key("p", "at&t", 100.01, {"a@x.com": 100.01}))
+
+if __name__ == '__main__':
+    unittest.main()
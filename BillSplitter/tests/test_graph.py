@@ -0,0 +1,73 @@
+import unittest
+import sys
+import os
+import threading
+from unittest import mock
+
+# Add parent directory to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import graph
+from agents.bill_parser import BillData
+
+BILL = BillData(**{
+    "total_amount": 100.0,
+    "period_start": "2025-11-01",
+    "period_end": "2025-12-01",
+    "usage_period": "Nov 2025",
+    "shared_costs": [{"description": "Base Plan", "amount": 20.0, "category": "Plan"}],
+    "user_charges": [
+        {"name": "Alice", "phone_number": None, "items": [], "total": 30.0},
+        {"name": "Bob", "phone_number": None, "items": [], "total": 50.0}
+    ]
+})
+
+class TestParallelBranches(unittest.TestCase):
+    def setUp(self):
+        # Both branches must be in flight at the same time to get past the barrier
+        barrier = threading.Barrier(2, timeout=5)
+
+        def add_expense(**kwargs):
+            barrier.wait()
+            return {"error": "503 Service Unavailable"}
+
+        def send_notifications(splits, contacts):
+            barrier.wait()
+            return {"Alice": "sent (sid: SM1)", "Bob": "failed (429)"}
+
+        self.parser = mock.Mock()
+        self.parser.return_value.parse_bill.return_value = BILL
+        self.splitwise = mock.Mock()
+        self.splitwise.return_value.add_expense.side_effect = add_expense
+        self.notifier = mock.Mock()
+        self.notifier.return_value.send_notifications.side_effect = send_notifications
+        for name, fake in (("BillParserAgent", self.parser), ("SplitwiseAgent", self.splitwise),
+                           ("WhatsAppNotifierAgent", self.notifier)):
+            patcher = mock.patch.object(graph, name, fake)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_branches_run_concurrently_and_merge(self):
+        final = graph.app.invoke({"bill_file_path": "bill.pdf", "errors": []})
+
+        self.assertEqual(final["notification_status"], {"Alice": "sent (sid: SM1)", "Bob": "failed (429)"})
+        self.assertCountEqual(final["errors"], [
+            "Splitwise Error: 503 Service Unavailable",
+            "Notification Error: Bob: failed (429)",
+        ])
+
+    def test_independent_nodes_share_a_step(self):
+        steps = {}
+        for event in graph.app.stream({"bill_file_path": "bill.pdf", "errors": []}, stream_mode="debug"):
+            if event["type"] == "task":
+                steps[event["payload"]["name"]] = event["step"]
+        self.assertEqual(steps["load_config"], steps["parse_bill"])
+        self.assertEqual(steps["add_to_splitwise"], steps["send_notifications"])
+        self.assertLess(steps["add_to_splitwise"], steps["join_results"])
+
+    def test_merge_errors_resets_on_none(self):
+        self.assertEqual(graph.merge_errors(["old"], None), [])
+        self.assertEqual(graph.merge_errors(["a"], ["b"]), ["a", "b"])
+
+if __name__ == '__main__':
+    unittest.main()
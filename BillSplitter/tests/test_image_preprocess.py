@@ -0,0 +1,88 @@
+import unittest
+import sys
+import os
+import io
+import json
+import tempfile
+from unittest import mock
+from PIL import Image
+
+# Add parent directory to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from agents.bill_parser import BillParserAgent
+from agents.image_preprocess import preprocess_image
+from benchmarks.bench_image import field_accuracy
+from benchmarks.fakes import make_bill_photo
+
+PAGE = ["Account Summary", "ALICE 469.882.5794 Unlimited plan $30.00", "Total due $100.00"] * 8
+
+class TestImagePreprocess(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def write(self, name: str, data: bytes) -> str:
+        path = os.path.join(self.tmp.name, name)
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+
+    def test_photo_is_oriented_cropped_and_shrunk(self):
+        # A 340x440 sheet in the middle of an 800x600 photo stored sideways
+        photo = make_bill_photo([PAGE], page_size=(340, 440), photo_size=(800, 600), font_px=12)
+        path = self.write("photo.jpg", photo)
+
+        result = preprocess_image(path, long_edge=300)
+
+        self.assertEqual(result.original_size, (800, 600))
+        self.assertTrue(result.cropped)
+        self.assertEqual(result.mime_type, "image/jpeg")
+        image = Image.open(io.BytesIO(result.data))
+        self.assertEqual(image.mode, "L")
+        self.assertEqual(image.size, result.size)
+        # Upright and cropped to the sheet: portrait, with the sheet's aspect ratio
+        self.assertEqual(image.height, 300)
+        self.assertAlmostEqual(image.width / image.height, 340 / 440, delta=0.04)
+        self.assertLess(result.payload_bytes, len(photo) / 4)
+
+    def test_small_screenshot_is_sent_unchanged(self):
+        buffer = io.BytesIO()
+        Image.new("L", (40, 30), 255).save(buffer, format="PNG")
+        path = self.write("shot.png", buffer.getvalue())
+
+        result = preprocess_image(path)
+
+        self.assertEqual(result.data, buffer.getvalue())
+        self.assertEqual(result.mime_type, "image/png")
+        self.assertEqual(result.bytes_saved, 0)
+
+    def test_parse_bill_sends_normalized_image(self):
+        path = self.write("photo.jpg", make_bill_photo([PAGE], page_size=(340, 440), photo_size=(800, 600), font_px=12))
+        agent = BillParserAgent(use_cache=False)
+        agent._llm = mock.Mock()
+        agent._llm.invoke.return_value.content = json.dumps({
+            "total_amount": 100.0, "period_start": "2025-11-01", "period_end": "2025-11-30",
+            "usage_period": "Nov 2025", "shared_costs": [], "user_charges": []
+        })
+
+        agent.parse_bill(path)
+
+        block = agent._llm.invoke.call_args[0][0][0].content[-1]
+        self.assertEqual(block["mime_type"], "image/jpeg")
+        self.assertEqual(block["data"], agent.last_preprocess.data)
+        self.assertTrue(agent.last_preprocess.cropped)
+
+    def test_field_accuracy(self):
+        expected = {"total_amount": 100.0, "period_start": "Nov 1", "period_end": "Nov 30", "user_charges": [
+            {"phone_number": "469.882.5794", "total": 30.0}, {"phone_number": "704.605.2812", "total": 40.0}]}
+        actual = {"total_amount": 100.0, "period_start": "nov 1", "period_end": "Dec 1", "user_charges": [
+            {"phone_number": "(469) 882-5794", "total": 30.0}, {"phone_number": "704.605.2812", "total": 41.0}]}
+
+        scored = field_accuracy(expected, actual)
+
+        self.assertEqual(scored["accuracy"], 0.6)
+        self.assertEqual(scored["wrong"], ["period_end", "line +17046052812"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,23 @@
+import unittest
+import sys
+import os
+
+# Add parent directory to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.bench_import import forbidden_imports
+
+class TestLazyImports(unittest.TestCase):
+    # Each check imports the module in a fresh interpreter
+
+    def test_calculator_does_not_import_sdks(self):
+        self.assertEqual(forbidden_imports("agents.split_calculator"), [])
+
+    def test_graph_import_defers_sdks_and_compile(self):
+        self.assertEqual(forbidden_imports("graph"), [])
+
+    def test_verify_splits_does_not_import_sdks(self):
+        self.assertEqual(forbidden_imports("verify_splits"), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,7 +5,7 @@ import os
 # Add parent directory to path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from agents.split_calculator import SplitCalculatorAgent
+from agents.split_calculator import SplitCalculatorAgent, allocate_cents, ALLOCATION_LARGEST_REMAINDER
 
 class TestSplitCalculator(unittest.TestCase):
     def setUp(self):
@@ -27,8 +27,8 @@ class TestSplitCalculator(unittest.TestCase):
         # Alice: 30 + 10 = 40
         # Bob: 50 + 10 = 60
         
-        self.assertEqual(result.user_splits["Alice"], 40.0)
-        self.assertEqual(result.user_splits["Bob"], 60.0)
+        self.assertEqual(result.splits["Alice"], 40.0)
+        self.assertEqual(result.splits["Bob"], 60.0)
         self.assertEqual(result.total_bill, 100.0)
 
     def test_no_shared_costs(self):
@@ -43,8 +43,57 @@ class TestSplitCalculator(unittest.TestCase):
         
         result = self.agent.calculate_split(bill_data)
         
-        self.assertEqual(result.user_splits["Alice"], 30.0)
-        self.assertEqual(result.user_splits["Bob"], 50.0)
+        self.assertEqual(result.splits["Alice"], 30.0)
+        self.assertEqual(result.splits["Bob"], 50.0)
+
+class TestLargestRemainder(unittest.TestCase):
+    def setUp(self):
+        self.agent = SplitCalculatorAgent()
+
+    def test_allocate_cents_is_exact_and_deterministic(self):
+        self.assertEqual(allocate_cents(100, [1, 1, 1]), [34, 33, 33])
+        self.assertEqual(allocate_cents(-100, [1, 1, 1]), [-33, -33, -34])
+        self.assertEqual(allocate_cents(1000, [0.5, 0.25, 0.25]), [500, 250, 250])
+        self.assertEqual(sum(allocate_cents(9999, [0.1, 0.2, 0.3, 0.4, 0.7])), 9999)
+
+    def test_splits_sum_to_total(self):
+        bill_data = {
+            "total_amount": 100.0,
+            "shared_costs": [{"description": "Base Plan", "amount": 10.0, "category": "Plan"}],
+            "user_charges": [
+                {"name": "Alice", "total": 30.0, "items": []},
+                {"name": "Bob", "total": 30.0, "items": []},
+                {"name": "Carol", "total": 30.0, "items": []}
+            ]
+        }
+
+        rounded = self.agent.calculate_split(bill_data)
+        self.assertNotEqual(round(sum(rounded.splits.values()), 2), 100.0)
+
+        result = self.agent.calculate_split(bill_data, allocation=ALLOCATION_LARGEST_REMAINDER)
+        self.assertEqual(result.splits, {"Alice": 33.34, "Bob": 33.33, "Carol": 33.33})
+        self.assertEqual(sum(round(v * 100) for v in result.splits.values()), 10000)
+
+    def test_weighted_shared_costs(self):
+        bill_data = {
+            "total_amount": 100.0,
+            "shared_costs": [{"description": "Base Plan", "amount": 40.0, "category": "Plan"}],
+            "user_charges": [
+                {"name": "Alice", "total": 30.0, "items": []},
+                {"name": "Bob", "total": 30.0, "items": []}
+            ]
+        }
+        result = self.agent.calculate_split(bill_data, allocation=ALLOCATION_LARGEST_REMAINDER, shared_weights={"Alice": 3})
+        self.assertEqual(result.splits, {"Alice": 60.0, "Bob": 40.0})
+
+    def test_unreconciled_total_is_rejected(self):
+        bill_data = {
+            "total_amount": 150.0,
+            "shared_costs": [],
+            "user_charges": [{"name": "Alice", "total": 30.0, "items": []}]
+        }
+        with self.assertRaises(ValueError):
+            self.agent.calculate_split(bill_data, allocation=ALLOCATION_LARGEST_REMAINDER)
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,91 @@
+import unittest
+import sys
+import os
+import tempfile
+from unittest import mock
+from starlette.testclient import TestClient
+
+# Add parent directory to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from splitwise_mcp import mcpServer
+from agents.bill_parser import BillData
+from splitwise_mcp.metrics import LatencyHistogram
+from splitwise_mcp.model import AddExpenseResponse
+from splitwise_mcp.remote import MCPRemote
+from agents.splitwise_agent import SplitwiseAgent
+
+BILL = {
+    "total_amount": 100.0,
+    "period_start": "2025-11-01",
+    "period_end": "2025-12-01",
+    "usage_period": "Nov 2025",
+    "shared_costs": [{"description": "Base Plan", "amount": 20.0, "category": "Plan"}],
+    "user_charges": [
+        {"name": "Alice", "phone_number": "555.111.2222", "items": [], "total": 30.0},
+        {"name": "Bob", "phone_number": "555.333.4444", "items": [], "total": 50.0}
+    ]
+}
+
+class TestMCPServer(unittest.TestCase):
+    def setUp(self):
+        self.metrics = mcpServer.tool_metrics
+        self.metrics.reset()
+
+        self.remote = MCPRemote(mcpServer.mcp)  # in-memory transport
+        self.addCleanup(self.remote.close)
+
+    def test_calculate_split_tool(self):
+        result = self.remote.call_tool("calculate_split", {"request": {
+            "bill_data": BILL, "user_map": {"555.111.2222": "alice@example.com"}
+        }})
+        self.assertEqual(result["splits"], {"alice@example.com": 40.0, "Bob": 60.0})
+        self.assertEqual(self.metrics.snapshot()["calculate_split"]["count"], 1)
+
+    def test_splitwise_agent_posts_through_server(self):
+        post = mock.Mock(return_value=AddExpenseResponse(success=True, expense_id=42, message="ok"))
+        with mock.patch.object(mcpServer, "_add_expense_to_splitwise_logic", post):
+            agent = SplitwiseAgent(use_ledger=False, remote=self.remote)
+            result = agent.add_expense(100.0, "Wireless Bill", {"alice@example.com": 100.0})
+
+        self.assertEqual(result, {"expense_id": 42})
+        self.assertEqual(post.call_args[0][0].splits, {"alice@example.com": 100.0})
+
+    def test_parse_bill_only_reads_the_bills_directory(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            bills = os.path.join(tmp, "bills")
+            os.makedirs(bills)
+            os.symlink(os.path.join(tmp, "secret.pdf"), os.path.join(bills, "link.pdf"))
+            parser = mock.Mock()
+            parser.aparse_bill = mock.AsyncMock(return_value=BillData(**BILL))
+            with mock.patch.dict(os.environ, {"BILL_SPLITTER_BILLS_DIR": bills}), \
+                    mock.patch.object(mcpServer, "get_bill_parser", return_value=parser):
+                result = self.remote.call_tool("parse_bill", {"request": {"file_path": "nov.pdf"}})
+                for outside in ("../secret.pdf", os.path.join(tmp, "secret.pdf"), "link.pdf"):
+                    with self.assertRaisesRegex(Exception, "outside the bills directory"):
+                        self.remote.call_tool("parse_bill", {"request": {"file_path": outside}})
+
+        self.assertEqual(result["total_amount"], 100.0)
+        parser.aparse_bill.assert_awaited_once_with(os.path.join(os.path.realpath(bills), "nov.pdf"), bypass_cache=False)
+
+    def test_metrics_endpoint(self):
+        self.remote.call_tool("calculate_split", {"request": {"bill_data": BILL}})
+        with TestClient(mcpServer.mcp.http_app()) as client:
+            body = client.get("/metrics").text
+            health = client.get("/health").json()
+
+        self.assertIn('mcp_tool_latency_seconds_count{tool="calculate_split"} 1', body)
+        self.assertIn('mcp_tool_latency_seconds_bucket{tool="calculate_split",le="+Inf"} 1', body)
+        self.assertEqual(health["tools"]["calculate_split"]["count"], 1)
+
+class TestLatencyHistogram(unittest.TestCase):
+    def test_buckets_are_cumulative(self):
+        histogram = LatencyHistogram(buckets=(0.1, 1.0))
+        for seconds in (0.05, 0.5, 0.7, 5.0):
+            histogram.observe(seconds)
+        self.assertEqual(histogram.counts, [1, 3])
+        self.assertEqual(histogram.quantile(0.5), 1.0)
+        self.assertIsNone(histogram.quantile(0.99))
+
+if __name__ == '__main__':
+    unittest.main()
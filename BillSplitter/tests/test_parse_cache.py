@@ -0,0 +1,81 @@
+import unittest
+import sys
+import os
+import tempfile
+import subprocess
+from unittest import mock
+
+# Add parent directory to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from agents.bill_parser import BillParserAgent, BillData
+from agents.parse_cache import ParseCache
+
+SAMPLE_BILL = {
+    "total_amount": 100.0,
+    "period_start": "2025-11-01",
+    "period_end": "2025-12-01",
+    "usage_period": "Nov 2025",
+    "shared_costs": [{"description": "Base Plan", "amount": 20.0, "category": "Plan"}],
+    "user_charges": [
+        {"name": "Alice", "phone_number": "555.111.2222", "items": [], "total": 30.0},
+        {"name": "Bob", "phone_number": "555.333.4444", "items": [], "total": 50.0}
+    ]
+}
+
+class TestParseCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = ParseCache(cache_dir=os.path.join(self.tmp.name, "cache"))
+        self.bill_path = os.path.join(self.tmp.name, "bill.pdf")
+        with open(self.bill_path, "wb") as f:
+            f.write(b"%PDF-1.4 fake bill")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_hit_skips_llm_construction(self):
+        agent = BillParserAgent(cache=self.cache)
+        self.cache.put(agent.cache_key(self.bill_path), SAMPLE_BILL)
+
+        with mock.patch("langchain_google_genai.ChatGoogleGenerativeAI", side_effect=AssertionError("LLM constructed")):
+            result = agent.parse_bill(self.bill_path)
+
+        self.assertIsNone(agent._llm)
+        self.assertIsNone(agent._parser)
+        self.assertIsInstance(result, BillData)
+        self.assertEqual(result.total_amount, 100.0)
+
+    def test_key_depends_on_content_and_model(self):
+        key = BillParserAgent(cache=self.cache).cache_key(self.bill_path)
+        self.assertNotEqual(key, BillParserAgent(model_name="other-model", cache=self.cache).cache_key(self.bill_path))
+
+        with open(self.bill_path, "ab") as f:
+            f.write(b" changed")
+        self.assertNotEqual(key, BillParserAgent(cache=self.cache).cache_key(self.bill_path))
+
+    def test_key_does_not_import_langchain(self):
+        script = ("import sys; from agents.bill_parser import BillParserAgent; "
+                  f"BillParserAgent().cache_key({self.bill_path!r}); "
+                  "print(any(m.startswith('langchain') for m in sys.modules))")
+        root = os.path.join(os.path.dirname(__file__), '..')
+        result = subprocess.run([sys.executable, "-c", script], cwd=root, capture_output=True, text=True, check=True)
+        self.assertEqual(result.stdout.strip(), "False")
+
+        # Format instructions and structured output still get different keys
+        self.assertNotEqual(BillParserAgent(cache=self.cache, structured_output=False).cache_key(self.bill_path),
+                            BillParserAgent(cache=self.cache, structured_output=True).cache_key(self.bill_path))
+
+    def test_eviction_by_count_and_age(self):
+        cache = ParseCache(cache_dir=self.cache.cache_dir, max_entries=2)
+        for i in range(3):
+            cache.put(f"key{i}", SAMPLE_BILL)
+            os.utime(cache._path(f"key{i}"), (1000 + i, 1000 + i))
+        cache.evict()
+        self.assertIsNone(cache.get("key0"))
+
+        expiring = ParseCache(cache_dir=self.cache.cache_dir, max_age_seconds=60)
+        self.assertIsNone(expiring.get("key1"))
+
+if __name__ == '__main__':
+    unittest.main()
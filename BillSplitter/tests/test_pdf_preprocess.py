@@ -0,0 +1,64 @@
+import unittest
+import sys
+import os
+import io
+import json
+import tempfile
+from unittest import mock
+from pypdf import PdfReader
+
+# Add parent directory to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from agents.bill_parser import BillParserAgent
+from agents.pdf_preprocess import preprocess_pdf
+from benchmarks.fakes import make_text_pdf
+
+SUMMARY_PAGE = ["Account Summary", "Billing period Nov 1 - Nov 30, 2025", "Total due $100.00"]
+CHARGE_PAGE = [
+    "Charges by line",
+    "ALICE 469.882.5794 Unlimited plan $30.00 Device $10.00",
+    "BOB (704) 605-2812 Unlimited plan $40.00 Insurance $0.00",
+    "Account charges: Base plan $20.00 Taxes and fees $0.00",
+]
+FILLER_PAGE = ["Legal terms and conditions apply to your service agreement. " * 2] * 20
+
+class TestPdfPreprocess(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.bill_path = os.path.join(self.tmp.name, "bill.pdf")
+        pages = [SUMMARY_PAGE] + [FILLER_PAGE] * 4 + [CHARGE_PAGE] + [FILLER_PAGE] * 4
+        with open(self.bill_path, "wb") as f:
+            f.write(make_text_pdf(pages))
+
+    def test_keeps_summary_and_charge_pages(self):
+        result = preprocess_pdf(self.bill_path)
+        self.assertEqual(result.pages_kept, [0, 5])
+        self.assertEqual(result.pages_total, 10)
+        self.assertIn("469.882.5794", result.text)
+        self.assertNotIn("Legal terms", result.text)
+        self.assertGreater(result.bytes_saved, 0)
+
+    def test_pruned_pdf_when_text_not_preferred(self):
+        result = preprocess_pdf(self.bill_path, prefer_text=False)
+        self.assertIsNone(result.text)
+        self.assertEqual(len(PdfReader(io.BytesIO(result.data)).pages), 2)
+        self.assertLess(result.payload_bytes, result.original_bytes)
+
+    def test_parse_bill_sends_text_block(self):
+        agent = BillParserAgent(use_cache=False)
+        agent._llm = mock.Mock()
+        agent._llm.invoke.return_value.content = json.dumps({
+            "total_amount": 100.0, "period_start": "2025-11-01", "period_end": "2025-11-30",
+            "usage_period": "Nov 2025", "shared_costs": [], "user_charges": []
+        })
+
+        agent.parse_bill(self.bill_path)
+
+        blocks = agent._llm.invoke.call_args[0][0][0].content
+        self.assertEqual([b["type"] for b in blocks], ["text", "text", "text"])
+        self.assertIn("pages 1, 6 of 10", blocks[2]["text"])
+
+if __name__ == '__main__':
+    unittest.main()
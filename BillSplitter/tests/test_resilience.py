@@ -0,0 +1,181 @@
+import unittest
+import sys
+import os
+import time
+from unittest import mock
+
+# Add parent directory to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from agents import resilience
+from agents.resilience import CircuitBreaker, CircuitOpenError, DeadlineExceeded, RetryPolicy
+from benchmarks.fakes import FakeSplitwiseServer
+
+class HTTPError(Exception):
+    def __init__(self, status, headers=None):
+        super().__init__(f"HTTP {status}")
+        self.status_code = status
+        self.headers = headers or {}
+
+def flaky(*errors, result="ok"):
+    """A callable that raises each error in turn, then returns result."""
+    calls = []
+    def fn():
+        calls.append(time.monotonic())
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return result
+    fn.calls = calls
+    return fn
+
+POLICY = RetryPolicy(max_attempts=4, base_delay=1.0, max_delay=10.0, failure_threshold=2, reset_timeout=60.0)
+
+class TestCall(unittest.TestCase):
+    def setUp(self):
+        resilience.reset_breakers()
+        self.addCleanup(resilience.reset_breakers)
+        self.sleeps = []
+
+    def call(self, fn, service="test", policy=POLICY):
+        return resilience.call(service, fn, policy=policy, sleep=self.sleeps.append)
+
+    def test_retries_transient_errors_honoring_retry_after(self):
+        fn = flaky(HTTPError(429, {"Retry-After": "7"}), HTTPError(503), ConnectionResetError())
+        self.assertEqual(self.call(fn), "ok")
+        self.assertEqual(len(fn.calls), 4)
+        self.assertEqual(self.sleeps[0], 7.0)
+        self.assertLessEqual(self.sleeps[1], 2.0)  # full jitter up to base * 2
+
+    def test_client_errors_are_not_retried(self):
+        fn = flaky(HTTPError(400))
+        with self.assertRaises(HTTPError):
+            self.call(fn)
+        self.assertEqual(len(fn.calls), 1)
+        self.assertEqual(resilience.get_breaker("test").state, CircuitBreaker.CLOSED)
+
+    def test_breaker_opens_after_consecutive_failed_calls(self):
+        down = flaky(*[HTTPError(500)] * 100)
+        for _ in range(2):
+            with self.assertRaises(HTTPError):
+                self.call(down)
+        self.assertEqual(len(down.calls), 8)
+        with self.assertRaises(CircuitOpenError):
+            self.call(down)
+        self.assertEqual(len(down.calls), 8)  # failed fast, service not called
+
+        # After the reset timeout one trial call goes through and closes the breaker
+        breaker = resilience.get_breaker("test")
+        breaker._opened_at -= POLICY.reset_timeout
+        self.assertEqual(self.call(flaky()), "ok")
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_failed_posts_open_the_breaker(self):
+        post = flaky(*[HTTPError(503)] * 100)
+        for _ in range(2):
+            with self.assertRaises(HTTPError):
+                resilience.call("test", post, policy=POLICY, classify=resilience.not_delivered)
+        self.assertEqual(len(post.calls), 2)  # never resent
+        with self.assertRaises(CircuitOpenError):
+            resilience.call("test", post, policy=POLICY, classify=resilience.not_delivered)
+
+        # A failed half-open trial reopens it; a rejected request (400) does not count
+        breaker = resilience.get_breaker("test")
+        breaker._opened_at -= POLICY.reset_timeout
+        with self.assertRaises(HTTPError):
+            resilience.call("test", post, policy=POLICY, classify=resilience.not_delivered)
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        resilience.reset_breakers()
+        for _ in range(3):
+            with self.assertRaises(HTTPError):
+                resilience.call("test", flaky(HTTPError(400)), policy=POLICY, classify=resilience.not_delivered)
+        self.assertEqual(resilience.get_breaker("test").state, CircuitBreaker.CLOSED)
+
+    def test_deadline_stops_retries(self):
+        fn = flaky(*[HTTPError(503, {"Retry-After": "5"})] * 3)
+        with resilience.deadline(1.0):
+            with self.assertRaises(HTTPError):
+                self.call(fn)
+        self.assertEqual((len(fn.calls), self.sleeps), (1, []))
+
+        with resilience.deadline(0.0):
+            with self.assertRaises(DeadlineExceeded):
+                self.call(flaky())
+
+    def test_status_code_of_wrapped_errors(self):
+        try:
+            try:
+                raise HTTPError(429)
+            except HTTPError as inner:
+                raise RuntimeError("model call failed") from inner
+        except RuntimeError as e:
+            self.assertTrue(resilience.is_transient(e))
+        splitwise_style = Exception("rate limited")
+        splitwise_style.http_status = (429,)
+        self.assertEqual(resilience.status_code(splitwise_style), 429)
+
+    def test_posts_are_only_retried_when_not_delivered(self):
+        import socket
+        import requests
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            port = s.getsockname()[1]
+        try:
+            requests.post(f"http://127.0.0.1:{port}/create_expense", timeout=2)
+        except requests.exceptions.ConnectionError as e:
+            refused = e
+        self.assertTrue(resilience.not_delivered(refused))
+        self.assertTrue(resilience.not_delivered(HTTPError(429)))
+        # The server may have created the expense before any of these
+        self.assertFalse(resilience.not_delivered(HTTPError(503)))
+        self.assertFalse(resilience.not_delivered(requests.exceptions.ReadTimeout("read timed out")))
+        self.assertFalse(resilience.not_delivered(requests.exceptions.ConnectionError("Connection aborted.")))
+
+    def test_requests_time_out_at_the_call_budget(self):
+        seen = []
+        self.call(lambda: seen.append(resilience.request_timeout()), policy=RetryPolicy(call_timeout=5.0))
+        with resilience.deadline(2.0):
+            self.call(lambda: seen.append(resilience.request_timeout()), policy=RetryPolicy(call_timeout=5.0))
+        self.assertTrue(4.0 < seen[0] <= 5.0 and 1.0 < seen[1] <= 2.0, seen)
+        self.assertEqual(resilience.request_timeout(30.0), 30.0)
+
+class TestSplitwiseRetries(unittest.TestCase):
+    def test_rate_limited_expense_is_retried(self):
+        from splitwise_mcp import mcpServer
+        from splitwise_mcp.model import AddExpenseRequest
+        resilience.reset_breakers()
+        self.addCleanup(resilience.reset_breakers)
+
+        with FakeSplitwiseServer(["owner@example.com", "a@example.com"], latency_seconds=0.0, error_rate=0.6,
+                                 seed=3) as server, \
+                mock.patch.dict(os.environ, {"SPLITWISE_BASE_URL": server.base_url + "/",
+                                             "SPLITWISE_CONSUMER_KEY": "k", "SPLITWISE_CONSUMER_SECRET": "s",
+                                             "SPLITWISE_API_KEY": "key"}):
+            mcpServer.group_cache.invalidate()
+            request = AddExpenseRequest(total_amount=10.0, description="Bill", group_name_filter="at&t",
+                                        splits={"a@example.com": 10.0})
+            result = mcpServer._add_expense_to_splitwise_logic(request)
+            mcpServer.group_cache.invalidate()
+
+        self.assertTrue(result.success, result.message)
+        self.assertGreater(len([p for p, _ in server.requests if p.endswith("/create_expense")]), 1)
+
+    def test_hung_server_is_bounded_by_call_timeout(self):
+        import socket
+        from splitwise_mcp.client import PooledSplitwise
+        resilience.reset_breakers()
+        self.addCleanup(resilience.reset_breakers)
+        # Accepts connections but never answers
+        listener = socket.socket()
+        listener.bind(("127.0.0.1", 0))
+        listener.listen()
+        self.addCleanup(listener.close)
+        client = PooledSplitwise("k", "s", api_key="key", base_url=f"http://127.0.0.1:{listener.getsockname()[1]}/")
+
+        started = time.monotonic()
+        with mock.patch.dict(os.environ, {"RESILIENCE_SPLITWISE_CALL_TIMEOUT": "0.5"}):
+            with self.assertRaises(Exception):
+                client.getCurrentUser()
+        self.assertLess(time.monotonic() - started, 5.0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+import unittest
+import sys
+import os
+import random
+import numpy as np
+
+# Add parent directory to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from agents.split_calculator import SplitCalculatorAgent
+from agents.split_engine import round_2dp
+
+class TestSplitEngine(unittest.TestCase):
+    def test_round_matches_builtin(self):
+        values = np.array([0.125, 0.375, 2.675, 1.005, 10.0 / 3, -0.125, 1e6 + 0.005, 0.0])
+        self.assertEqual(round_2dp(values).tolist(), [round(v, 2) for v in values.tolist()])
+
+    def test_bulk_matches_per_bill_loop(self):
+        rnd = random.Random(7)
+        bills = []
+        for _ in range(50):
+            bills.append({
+                "total_amount": 0.0,
+                "period_start": "2025-11-01",
+                "period_end": "2025-12-01",
+                "shared_costs": [{"amount": round(rnd.uniform(0, 40), 2)} for _ in range(rnd.randint(0, 3))],
+                "user_charges": [
+                    {"name": f"User {i % 4}", "phone_number": rnd.choice([None, f"555.000.000{i}"]),
+                     "total": round(rnd.uniform(0, 90), 3), "items": []}
+                    for i in range(rnd.randint(1, 8))
+                ],
+            })
+        user_map = {f"555.000.000{i}": f"user{i}@example.com" for i in range(0, 8, 2)}
+
+        agent = SplitCalculatorAgent()
+        expected = [agent.calculate_split(bill, user_map) for bill in bills]
+        self.assertEqual(agent.calculate_splits_bulk(bills, user_map), expected)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+import unittest
+import sys
+import os
+from unittest import mock
+
+# Add parent directory to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from splitwise_mcp import mcpServer
+from splitwise_mcp.model import AddExpenseRequest, AddExpensesBulkRequest
+from splitwise.exception import SplitwiseException
+
+def make_user(user_id, email):
+    user = mock.Mock()
+    user.getId.return_value = user_id
+    user.getEmail.return_value = email
+    return user
+
+class FakeSplitwise:
+    """Counts SDK calls; returns one 'AT&T Family' group."""
+    def __init__(self):
+        self.calls = []
+        self.rate_limited = 0
+        self.me = make_user(1, "me@example.com")
+        self.group = mock.Mock()
+        self.group.getId.return_value = 99
+        self.group.getName.return_value = "AT&T Family"
+        self.group.getMembers.return_value = [self.me, make_user(2, "Alice@Example.com")]
+
+    def getGroups(self):
+        self.calls.append("getGroups")
+        return [self.group]
+
+    def getCurrentUser(self):
+        self.calls.append("getCurrentUser")
+        return self.me
+
+    def createExpense(self, expense):
+        self.calls.append("createExpense")
+        if self.rate_limited:
+            self.rate_limited -= 1
+            e = SplitwiseException("Unknown error happened")
+            e.http_status = (429,)
+            e.http_headers = {"Retry-After": "0"}
+            raise e
+        created = mock.Mock()
+        created.getId.return_value = 1000 + len(self.calls)
+        return created, None
+
+class TestSplitwiseCache(unittest.TestCase):
+    def setUp(self):
+        self.fake = FakeSplitwise()
+        mcpServer.group_cache.invalidate()
+        patcher = mock.patch.object(mcpServer, "get_splitwise_client", return_value=self.fake)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_repeat_posts_cost_one_call_each(self):
+        req = AddExpenseRequest(
+            total_amount=30.0,
+            description="Bill",
+            splits={"me@example.com": 10.0, "alice@example.com": 20.0}
+        )
+        for _ in range(3):
+            self.assertTrue(mcpServer._add_expense_to_splitwise_logic(req).success)
+
+        self.assertEqual(self.fake.calls.count("getGroups"), 1)
+        self.assertEqual(self.fake.calls.count("getCurrentUser"), 1)
+        self.assertEqual(self.fake.calls.count("createExpense"), 3)
+
+    def test_invalidate_refetches(self):
+        req = AddExpenseRequest(total_amount=10.0, description="Bill", splits={"me@example.com": 10.0})
+        mcpServer._add_expense_to_splitwise_logic(req)
+        mcpServer.group_cache.invalidate()
+        mcpServer._add_expense_to_splitwise_logic(req)
+        self.assertEqual(self.fake.calls.count("getGroups"), 2)
+
+    def test_unknown_member_fails_after_single_refresh(self):
+        req = AddExpenseRequest(total_amount=10.0, description="Bill", splits={"bob@example.com": 10.0})
+        response = mcpServer._add_expense_to_splitwise_logic(req)
+        self.assertFalse(response.success)
+        self.assertEqual(self.fake.calls.count("getGroups"), 2)
+        self.assertNotIn("createExpense", self.fake.calls)
+
+    def test_bulk_resolves_once_and_validates_each_item(self):
+        good = AddExpenseRequest(total_amount=30.0, description="Bill", splits={"me@example.com": 10.0, "alice@example.com": 20.0})
+        bad_sum = AddExpenseRequest(total_amount=99.0, description="Bill", splits={"me@example.com": 10.0})
+        self.fake.rate_limited = 2
+
+        results = mcpServer._add_expenses_bulk_logic(
+            AddExpensesBulkRequest(expenses=[good, bad_sum, good, good], max_parallel=2)
+        )
+
+        self.assertEqual([r.success for r in results], [True, False, True, True])
+        self.assertIn("does not match", results[1].message)
+        self.assertEqual(self.fake.calls.count("getGroups"), 1)
+        # Three successful posts plus two rate limited attempts
+        self.assertEqual(self.fake.calls.count("createExpense"), 5)
+
+    def test_bulk_refreshes_unknown_members_once_per_group(self):
+        gone = AddExpenseRequest(total_amount=10.0, description="Bill", splits={"gone@example.com": 10.0})
+
+        results = mcpServer._add_expenses_bulk_logic(AddExpensesBulkRequest(expenses=[gone] * 12))
+
+        self.assertFalse(any(r.success for r in results))
+        self.assertEqual(self.fake.calls.count("getGroups"), 2)
+        self.assertEqual(self.fake.calls.count("getCurrentUser"), 2)
+        self.assertNotIn("createExpense", self.fake.calls)
+
+if __name__ == '__main__':
+    unittest.main()
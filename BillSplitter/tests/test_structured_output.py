@@ -0,0 +1,138 @@
+import unittest
+import sys
+import os
+import json
+import asyncio
+import tempfile
+from types import SimpleNamespace
+from unittest import mock
+
+# Add parent directory to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from agents import bill_parser, telemetry
+from agents.bill_parser import BillParserAgent, BillData, EXTRACTION_PROMPT
+from agents.context_cache import ContextCache
+
+PAYLOAD = {
+    "total_amount": 100.0, "period_start": "2025-11-01", "period_end": "2025-11-30",
+    "usage_period": "Nov 2025", "shared_costs": [], "user_charges": []
+}
+USAGE = {"input_tokens": 1200, "output_tokens": 90, "input_token_details": {"cache_read": 1000}}
+
+def structured_llm(parsed=None, error=None):
+    llm = mock.Mock()
+    response = {"raw": SimpleNamespace(content="", usage_metadata=USAGE),
+                "parsed": parsed, "parsing_error": error}
+    llm.with_structured_output.return_value.invoke.return_value = response
+    llm.with_structured_output.return_value.ainvoke = mock.AsyncMock(return_value=response)
+    return llm
+
+class TestStructuredOutput(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.bill_path = os.path.join(self.tmp.name, "bill.png")
+        with open(self.bill_path, "wb") as f:
+            f.write(b"not really a png")
+
+    def test_schema_goes_to_the_model_not_the_prompt(self):
+        agent = BillParserAgent(use_cache=False, structured_output=True, context_cache=False)
+        agent._llm = structured_llm(parsed=BillData(**PAYLOAD))
+
+        with telemetry.span("bill", telemetry.KIND_RUN) as root:
+            result = agent.parse_bill(self.bill_path)
+
+        self.assertEqual(result, BillData(**PAYLOAD))
+        agent._llm.with_structured_output.assert_called_once_with(BillData, method="json_schema", include_raw=True)
+        agent._llm.invoke.assert_not_called()
+        content = agent._llm.with_structured_output.return_value.invoke.call_args[0][0][0].content
+        texts = [b["text"] for b in content if b["type"] == "text"]
+        self.assertEqual(texts, [EXTRACTION_PROMPT])
+        cost = telemetry.bill_cost(telemetry.tracer.spans(root.trace_id))
+        self.assertEqual((cost["input_tokens"], cost["cached_tokens"]), (1200, 1000))
+
+    def test_structured_and_legacy_results_are_cached_separately(self):
+        structured = BillParserAgent(use_cache=False, structured_output=True)
+        legacy = BillParserAgent(use_cache=False, structured_output=False)
+        self.assertNotEqual(structured.cache_key(self.bill_path), legacy.cache_key(self.bill_path))
+        self.assertLess(len(structured.instructions()), len(legacy.instructions()))
+
+    def test_unparseable_reply_raises(self):
+        agent = BillParserAgent(use_cache=False, structured_output=True, context_cache=False)
+        agent._llm = structured_llm(error=ValueError("bad json"))
+        with self.assertRaises(ValueError):
+            agent.parse_bill(self.bill_path)
+
+    def test_async_parse_uses_structured_output(self):
+        agent = BillParserAgent(use_cache=False, structured_output=True, context_cache=False)
+        agent._llm = structured_llm(parsed=PAYLOAD)
+        result = asyncio.run(agent.aparse_bill(self.bill_path))
+        self.assertEqual(result, BillData(**PAYLOAD))
+
+    def test_cached_instructions_are_not_resent(self):
+        cached_llm = structured_llm(parsed=BillData(**PAYLOAD))
+        registry = mock.Mock()
+        registry.name_for.return_value = "cachedContents/abc"
+        agent = BillParserAgent(use_cache=False, structured_output=True, context_cache=True)
+        with mock.patch("agents.context_cache.get_context_cache", return_value=registry), \
+                mock.patch.object(bill_parser, "shared_llm", return_value=cached_llm) as shared:
+            agent.parse_bill(self.bill_path)
+
+        registry.name_for.assert_called_once_with(agent.model_name, EXTRACTION_PROMPT)
+        shared.assert_called_with(agent.model_name, cached_content="cachedContents/abc")
+        content = cached_llm.with_structured_output.return_value.invoke.call_args[0][0][0].content
+        self.assertEqual([b["type"] for b in content], ["media"])
+
+    def test_renewed_cache_replaces_its_client(self):
+        with mock.patch.dict(bill_parser._shared_llms, clear=True), \
+                mock.patch("langchain_google_genai.ChatGoogleGenerativeAI", side_effect=lambda **kw: mock.Mock(**kw)):
+            plain = bill_parser.shared_llm("gemini-2.0-flash")
+            for i in range(5):
+                cached = bill_parser.shared_llm("gemini-2.0-flash", cached_content=f"cachedContents/{i}")
+                self.assertIs(bill_parser.shared_llm("gemini-2.0-flash", cached_content=f"cachedContents/{i}"), cached)
+            self.assertEqual(len(bill_parser._shared_llms), 2)
+            self.assertIs(bill_parser.shared_llm("gemini-2.0-flash"), plain)
+            self.assertEqual(cached.cached_content, "cachedContents/4")
+
+    def test_structured_requests_are_smaller(self):
+        from benchmarks.bench_e2e import make_fixture, write_bills
+        from benchmarks.bench_structured import request_size
+        path = write_bills(self.tmp.name, make_fixture(10)[0], 1)[0]
+        legacy, structured = request_size("instructions", path), request_size("structured", path)
+        self.assertLess(structured["est_input_tokens"], legacy["est_input_tokens"])
+        self.assertEqual(request_size("structured+cache", path)["est_cached_tokens"], len(EXTRACTION_PROMPT) // 4)
+
+class TestContextCache(unittest.TestCase):
+    def test_creates_once_and_reuses(self):
+        client = mock.Mock()
+        client.caches.create.return_value.name = "cachedContents/abc"
+        cache = ContextCache(ttl_seconds=3600, client=client)
+
+        names = [cache.name_for("gemini-2.0-flash", "instructions") for _ in range(3)]
+
+        self.assertEqual(names, ["cachedContents/abc"] * 3)
+        self.assertEqual(client.caches.create.call_count, 1)
+        config = client.caches.create.call_args.kwargs["config"]
+        self.assertEqual((config.system_instruction, config.ttl), ("instructions", "3600s"))
+
+    def test_renews_before_expiry(self):
+        client = mock.Mock()
+        cache = ContextCache(ttl_seconds=3600, client=client)
+        with mock.patch("agents.context_cache.time.time", return_value=1000.0):
+            cache.name_for("gemini-2.0-flash", "instructions")
+        with mock.patch("agents.context_cache.time.time", return_value=1000.0 + 3600 - 30):
+            cache.name_for("gemini-2.0-flash", "instructions")
+        self.assertEqual(client.caches.create.call_count, 2)
+
+    def test_unavailable_cache_is_remembered(self):
+        client = mock.Mock()
+        client.caches.create.side_effect = ValueError("400 Cached content is too small")
+        cache = ContextCache(client=client)
+
+        self.assertIsNone(cache.name_for("gemini-2.0-flash", "short"))
+        self.assertIsNone(cache.name_for("gemini-2.0-flash", "short"))
+        self.assertEqual(client.caches.create.call_count, 1)
+
+if __name__ == '__main__':
+    unittest.main()
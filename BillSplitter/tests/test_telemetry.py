@@ -0,0 +1,121 @@
+import unittest
+import sys
+import os
+import json
+import asyncio
+import tempfile
+from types import SimpleNamespace
+from unittest import mock
+
+# Add parent directory to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import graph
+from batch import run_batch
+from agents import telemetry
+from agents.bill_parser import BillParserAgent, BillData
+
+BILL = BillData(**{
+    "total_amount": 100.0,
+    "period_start": "2025-11-01",
+    "period_end": "2025-12-01",
+    "usage_period": "Nov 2025",
+    "shared_costs": [{"description": "Base Plan", "amount": 20.0, "category": "Plan"}],
+    "user_charges": [
+        {"name": "Alice", "phone_number": None, "items": [], "total": 30.0},
+        {"name": "Bob", "phone_number": None, "items": [], "total": 50.0}
+    ]
+})
+
+NODES = {"load_config", "parse_bill", "calculate_splits", "add_to_splitwise", "send_notifications", "join_results"}
+
+class TestGraphTracing(unittest.TestCase):
+    def setUp(self):
+        telemetry.tracer.clear()
+        self.parser = mock.Mock()
+        self.parser.return_value.parse_bill.return_value = BILL
+        self.parser.return_value.aparse_bill = mock.AsyncMock(return_value=BILL)
+        self.splitwise = mock.Mock()
+        self.splitwise.return_value.add_expense.return_value = {"id": 42}
+        self.notifier = mock.Mock()
+        self.notifier.return_value.send_notifications.return_value = {"Alice": "sent (sid: SM1)"}
+        for name, fake in (("BillParserAgent", self.parser), ("SplitwiseAgent", self.splitwise),
+                           ("WhatsAppNotifierAgent", self.notifier)):
+            patcher = mock.patch.object(graph, name, fake)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_nodes_nest_under_one_bill_trace(self):
+        with telemetry.span("bill", telemetry.KIND_RUN) as bill_span:
+            graph.get_app().invoke({"bill_file_path": "bill.pdf", "errors": []})
+
+        spans = telemetry.tracer.spans(bill_span.trace_id)
+        nodes = [s for s in spans if s.kind == telemetry.KIND_NODE]
+        self.assertEqual({s.name for s in nodes}, NODES)
+        self.assertTrue(all(s.parent_id == bill_span.span_id for s in nodes))
+
+    def test_batch_records_cost_per_bill(self):
+        records = asyncio.run(run_batch(graph.get_app(), ["a.pdf", "b.pdf"], concurrency=2, timeout=30))
+
+        trace_ids = {r["trace_id"] for r in records}
+        self.assertEqual(len(trace_ids), 2)
+        for record in records:
+            names = {s.name for s in telemetry.tracer.spans(record["trace_id"])}
+            self.assertEqual(names, NODES | {"bill"})
+            self.assertGreater(record["cost"]["wall_seconds"], 0)
+            self.assertFalse([e for e in record["errors"] if "parse" in e.lower()])
+
+class TestCost(unittest.TestCase):
+    def setUp(self):
+        telemetry.tracer.clear()
+
+    def test_llm_tokens_and_messages_are_priced(self):
+        fake_llm = mock.Mock()
+        fake_llm.invoke.return_value = SimpleNamespace(
+            content=BILL.model_dump_json(), usage_metadata={"input_tokens": 2000, "output_tokens": 500})
+        agent = BillParserAgent(use_cache=False)
+        agent._llm = fake_llm
+
+        with telemetry.span("bill", telemetry.KIND_RUN) as bill_span:
+            agent._invoke_llm({"type": "text", "text": "bill"})
+            with telemetry.span("twilio.messages.create", telemetry.KIND_TWILIO, status="sent"):
+                pass
+            with telemetry.span("twilio.messages.create", telemetry.KIND_TWILIO, status="failed"):
+                pass
+
+        cost = telemetry.bill_cost(telemetry.tracer.spans(bill_span.trace_id))
+        self.assertEqual((cost["llm_calls"], cost["input_tokens"], cost["output_tokens"]), (1, 2000, 500))
+        self.assertEqual(cost["twilio_messages"], 1)
+        expected = (2000 * telemetry.LLM_INPUT_PRICE_PER_MTOK + 500 * telemetry.LLM_OUTPUT_PRICE_PER_MTOK) / 1e6 \
+            + telemetry.TWILIO_PRICE_PER_MESSAGE
+        self.assertAlmostEqual(cost["total_cost_usd"], expected, places=6)
+
+    def test_export_writes_json_lines_and_otlp(self):
+        with telemetry.span("bill", telemetry.KIND_RUN) as bill_span:
+            with telemetry.span("splitwise.http.create_expense", telemetry.KIND_SPLITWISE, bytes_sent=120):
+                pass
+            try:
+                with telemetry.span("parse_bill"):
+                    raise ValueError("bad pdf")
+            except ValueError:
+                pass
+
+        with tempfile.TemporaryDirectory() as tmp:
+            prefix = os.path.join(tmp, "trace")
+            telemetry.export_trace(bill_span.trace_id, prefix)
+            with open(prefix + ".jsonl") as f:
+                lines = [json.loads(line) for line in f]
+            with open(prefix + ".otlp.json") as f:
+                otlp = json.loads(f.read())
+
+        self.assertEqual(len(lines), 3)
+        spans = {s["name"]: s for s in otlp["resourceSpans"][0]["scopeSpans"][0]["spans"]}
+        self.assertEqual(spans["splitwise.http.create_expense"]["parentSpanId"], bill_span.span_id)
+        self.assertEqual(spans["splitwise.http.create_expense"]["kind"], 3)
+        self.assertIn({"key": "bytes_sent", "value": {"intValue": "120"}},
+                      spans["splitwise.http.create_expense"]["attributes"])
+        self.assertEqual(spans["parse_bill"]["status"], {"code": 2, "message": "ValueError: bad pdf"})
+        self.assertNotIn("parentSpanId", spans["bill"])
+
+if __name__ == '__main__':
+    unittest.main()
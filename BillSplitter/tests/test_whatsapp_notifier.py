@@ -0,0 +1,57 @@
+import unittest
+import sys
+import os
+import time
+from unittest import mock
+
+# Add parent directory to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from twilio.rest import Client
+from twilio.base.exceptions import TwilioRestException
+from agents import resilience
+from agents.whatsapp_notifier import WhatsAppNotifierAgent
+from benchmarks.fakes import FakeTwilioServer
+
+class TestWhatsAppNotifier(unittest.TestCase):
+    def test_concurrent_send_keeps_statuses(self):
+        splits = {f"user{i}@example.com": 10.0 for i in range(6)}
+        splits["nophone@example.com"] = 5.0
+        contacts = {email: f"+1555000000{i}" for i, email in enumerate(list(splits)[:6])}
+
+        with FakeTwilioServer(latency_seconds=0.2) as server:
+            client = Client("ACfake", "token", http_client=server.http_client())
+            agent = WhatsAppNotifierAgent(client=client, max_in_flight=6, messages_per_second=100)
+            started = time.perf_counter()
+            results = agent.send_notifications(splits, contacts)
+            elapsed = time.perf_counter() - started
+
+        self.assertEqual(list(results), list(splits))
+        self.assertTrue(all(results[e].startswith("sent (sid: SM") for e in list(splits)[:6]))
+        self.assertEqual(results["nophone@example.com"], "skipped (no phone number)")
+        # Six 0.2s requests in parallel, not 1.2s serially
+        self.assertLess(elapsed, 0.8)
+
+    def test_rate_limited_requests_are_retried(self):
+        with FakeTwilioServer(latency_seconds=0.0, error_rate=0.5, seed=1) as server:
+            client = Client("ACfake", "token", http_client=server.http_client())
+            agent = WhatsAppNotifierAgent(client=client, max_in_flight=4, messages_per_second=100, max_retries=10)
+            results = agent.send_notifications({"a": 1.0, "b": 2.0, "c": 3.0}, {"a": "+1", "b": "+2", "c": "+3"})
+
+        self.assertTrue(all(status.startswith("sent") for status in results.values()))
+        self.assertGreater(len(server.requests), 3)
+
+    def test_server_errors_are_not_resent(self):
+        resilience.reset_breakers()
+        self.addCleanup(resilience.reset_breakers)
+        client = mock.Mock()
+        # The message may have been queued before the 503, so sending again could deliver it twice
+        client.messages.create.side_effect = TwilioRestException(503, "/Messages.json", "Service Unavailable")
+        agent = WhatsAppNotifierAgent(client=client, messages_per_second=100, max_retries=3)
+        results = agent.send_notifications({"a": 1.0}, {"a": "+1"})
+
+        self.assertTrue(results["a"].startswith("failed"))
+        self.assertEqual(client.messages.create.call_count, 1)
+
+if __name__ == '__main__':
+    unittest.main()